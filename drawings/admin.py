@@ -1,9 +1,11 @@
+from django import forms
 from django.contrib import admin
 from .models import (
     ShipType, Role, Person, Permission, RolePermission, PersonRole,
-    TypicalSection, WorkType, WorkProcess, Project, Section, Pallet,
-    StandardProcessFlow, ProcessFlowStep
+    TypicalSection, WorkType, WorkProcess, Project, Section, Pallet, PalletItem, MaterialRequirement,
+    StandardProcessFlow, ProcessFlowStep, SectionWorkOrder, SectionWorkStep, ImportJob
 )
+from .flow_validation import validate_prerequisite_links
 
 # Register your models here.
 
@@ -56,7 +58,7 @@ class TypicalSectionAdmin(admin.ModelAdmin):
 
 @admin.register(WorkType)
 class WorkTypeAdmin(admin.ModelAdmin):
-    list_display = ['work_type_name', 'work_type_code', 'standard_hours', 'is_active', 'created_at']
+    list_display = ['work_type_name', 'work_type_code', 'standard_hours', 'crew_size', 'is_active', 'created_at']
     search_fields = ['work_type_name', 'work_type_code']
     list_filter = ['is_active', 'created_at']
 
@@ -77,9 +79,21 @@ class ProjectAdmin(admin.ModelAdmin):
 
 @admin.register(Section)
 class SectionAdmin(admin.ModelAdmin):
-    list_display = ['section_number', 'project', 'section_type', 'planned_start_date', 'is_active']
+    list_display = ['section_number', 'project', 'section_type', 'planned_start_date', 'is_ready', 'is_active']
     search_fields = ['section_number', 'project__project_name']
-    list_filter = ['project', 'section_type', 'is_active', 'created_at']
+    list_filter = ['project', 'section_type', 'is_ready', 'is_active', 'created_at']
+
+
+class PalletItemInline(admin.TabularInline):
+    """明细条目由托盘明细解析生成，只读展示"""
+    model = PalletItem
+    extra = 0
+    can_delete = False
+    fields = ['part_code', 'quantity', 'kind']
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Pallet)
@@ -87,6 +101,16 @@ class PalletAdmin(admin.ModelAdmin):
     list_display = ['pallet_code', 'pallet_name', 'project', 'section', 'required_date', 'is_received']
     search_fields = ['pallet_code', 'pallet_name', 'project__project_name']
     list_filter = ['project', 'section', 'is_received', 'is_active', 'created_at']
+    inlines = [PalletItemInline]
+
+
+@admin.register(MaterialRequirement)
+class MaterialRequirementAdmin(admin.ModelAdmin):
+    list_display = ['week_start', 'project', 'part_code', 'kind', 'required_quantity', 'received_quantity', 'pallet_count']
+    search_fields = ['part_code', 'project__project_name']
+    list_filter = ['project', 'kind', 'week_start']
+    readonly_fields = ['project', 'week_start', 'part_code', 'kind', 'required_quantity', 'received_quantity',
+                       'pallet_count', 'updated_at']
 
 
 class ProcessFlowStepInline(admin.TabularInline):
@@ -97,15 +121,58 @@ class ProcessFlowStepInline(admin.TabularInline):
 
 @admin.register(StandardProcessFlow)
 class StandardProcessFlowAdmin(admin.ModelAdmin):
-    list_display = ['name', 'ship_type', 'typical_section', 'estimated_total_hours', 'is_active', 'created_at']
+    list_display = ['name', 'ship_type', 'typical_section', 'estimated_total_hours', 'critical_path_hours', 'is_active', 'created_at']
     search_fields = ['name', 'ship_type__ship_type', 'typical_section__section_name']
     list_filter = ['ship_type', 'typical_section', 'is_active', 'created_at']
     inlines = [ProcessFlowStepInline]
 
 
+class ProcessFlowStepAdminForm(forms.ModelForm):
+    class Meta:
+        model = ProcessFlowStep
+        fields = '__all__'
+
+    def clean_prerequisites(self):
+        prerequisites = self.cleaned_data['prerequisites']
+        if self.instance.pk:
+            existing = set(self.instance.prerequisites.values_list('id', flat=True))
+            try:
+                validate_prerequisite_links(
+                    (self.instance.pk, prerequisite.pk) for prerequisite in prerequisites
+                    if prerequisite.pk not in existing
+                )
+            except ValueError as e:
+                raise forms.ValidationError(str(e))
+        return prerequisites
+
+
 @admin.register(ProcessFlowStep)
 class ProcessFlowStepAdmin(admin.ModelAdmin):
+    form = ProcessFlowStepAdminForm
     list_display = ['step_name', 'process_flow', 'work_process', 'step_order', 'parallel_group', 'estimated_hours']
     search_fields = ['step_name', 'process_flow__name', 'work_process__process_name']
     list_filter = ['process_flow', 'work_process', 'parallel_group', 'is_active']
     ordering = ['process_flow', 'step_order', 'parallel_group']
+
+
+class SectionWorkStepInline(admin.TabularInline):
+    model = SectionWorkStep
+    extra = 0
+    fields = ['step_order', 'step_name', 'work_process', 'parallel_group', 'estimated_hours', 'status']
+
+
+@admin.register(SectionWorkOrder)
+class SectionWorkOrderAdmin(admin.ModelAdmin):
+    list_display = ['section', 'process_flow', 'estimated_total_hours', 'critical_path_hours', 'created_at']
+    search_fields = ['section__section_number', 'process_flow__name']
+    list_filter = ['section__project', 'process_flow']
+    inlines = [SectionWorkStepInline]
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['original_name', 'kind', 'status', 'processed_rows', 'created_count', 'updated_count',
+                    'error_count', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['original_name']
+    readonly_fields = ['started_at', 'finished_at', 'updated_at']
@@ -0,0 +1,210 @@
+"""标准工艺流程图（SVG）
+
+由编译后的工艺流程在服务端完成布局：按拓扑层级自上而下分层，同层内相同并行组的步骤相邻排列并加框标注，
+依赖关系画成带箭头的连线（按执行顺序推导的阶段依赖经一个汇合点连接，避免两个大并行阶段之间画出 m*n 条线）。
+
+生成的 SVG 以步骤内容的摘要命名保存在磁盘上，URL 中带摘要，内容不变时浏览器可长期缓存；
+流程变更后摘要随之变化，旧文件在生成新图时清理。
+"""
+import hashlib
+import json
+import os
+import tempfile
+from html import escape
+from pathlib import Path
+
+from django.conf import settings
+
+# 布局或样式调整时递增，使已缓存的流程图全部失效
+DIAGRAM_VERSION = 1
+
+NODE_WIDTH = 200
+NODE_HEIGHT = 64
+H_GAP = 30
+V_GAP = 70
+MARGIN = 30
+GROUP_PADDING = 10
+FONT_FAMILY = "'Microsoft YaHei', 'PingFang SC', sans-serif"
+
+
+def diagram_dir():
+    return Path(getattr(settings, 'FLOW_DIAGRAM_CACHE_DIR', Path(settings.BASE_DIR) / 'cache' / 'flow_diagrams'))
+
+
+def diagram_digest(compiled):
+    """流程图内容摘要：只包含影响绘图的字段"""
+    payload = [DIAGRAM_VERSION, compiled.cycle_error] + [
+        [step['id'], step['step_order'], step['parallel_group'], step['step_name'], step['process_name'],
+         str(step['estimated_hours']), step['prerequisite_orders'], step['level'], step['is_critical']]
+        for step in compiled.steps
+    ]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def diagram_path(process_flow_id, digest):
+    return diagram_dir() / f'{process_flow_id}-{digest}.svg'
+
+
+def ensure_flow_diagram(process_flow_id, compiled, digest=None):
+    """确保流程图文件存在并返回路径；生成新图时删除该流程的旧图"""
+    digest = digest or diagram_digest(compiled)
+    path = diagram_path(process_flow_id, digest)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    svg = render_flow_svg(compiled)
+    # 先写临时文件再原子替换，避免并发请求读到写了一半的文件
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(svg)
+    os.replace(tmp_name, path)
+
+    for stale in path.parent.glob(f'{process_flow_id}-*.svg'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def _stages(steps):
+    """按执行顺序划分阶段（与 process_flow.build_dependency_graph 的推导规则一致）"""
+    stages = []
+    for step in steps:
+        group = step['parallel_group']
+        if stages and group and stages[-1][0]['parallel_group'] == group:
+            stages[-1].append(step)
+        else:
+            stages.append([step])
+    return stages
+
+
+def _layers(compiled, stages):
+    """分层：优先使用拓扑层级，存在循环依赖时按阶段分层；同层内相同并行组的步骤相邻"""
+    layers = [list(level) for level in compiled.levels] if compiled.levels else [list(stage) for stage in stages]
+    for layer in layers:
+        first_order = {}
+        for step in layer:
+            key = step['parallel_group'] or -step['id']
+            first_order.setdefault(key, step['step_order'])
+        layer.sort(key=lambda step: (first_order[step['parallel_group'] or -step['id']], step['step_order']))
+    return layers
+
+
+def _truncate(text, limit):
+    text = text or ''
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def render_flow_svg(compiled):
+    """生成流程图 SVG 文本"""
+    stages = _stages(compiled.steps)
+    layers = _layers(compiled, stages)
+    if not layers:
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="300" height="60" viewBox="0 0 300 60">'
+                f'<text x="20" y="35" font-family="{FONT_FAMILY}" font-size="14" fill="#6c757d">暂无工艺流程步骤</text></svg>')
+
+    layer_widths = [len(layer) * NODE_WIDTH + (len(layer) - 1) * H_GAP for layer in layers]
+    width = max(layer_widths) + 2 * MARGIN
+    height = len(layers) * NODE_HEIGHT + (len(layers) - 1) * V_GAP + 2 * MARGIN
+
+    position = {}
+    for index, layer in enumerate(layers):
+        x = MARGIN + (max(layer_widths) - layer_widths[index]) / 2
+        y = MARGIN + index * (NODE_HEIGHT + V_GAP)
+        for step in layer:
+            position[step['id']] = (x, y)
+            x += NODE_WIDTH + H_GAP
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="{FONT_FAMILY}">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" '
+        'orient="auto-start-reverse"><path d="M 0 0 L 10 5 L 0 10 z" fill="#3498db"/></marker></defs>',
+    ]
+
+    # 并行组底框
+    for layer in layers:
+        run = []
+        for step in layer + [None]:
+            if run and (step is None or step['parallel_group'] != run[0]['parallel_group']):
+                group = run[0]['parallel_group']
+                if group:
+                    x0, y0 = position[run[0]['id']]
+                    x1 = position[run[-1]['id']][0] + NODE_WIDTH
+                    parts.append(
+                        f'<rect x="{x0 - GROUP_PADDING:.0f}" y="{y0 - GROUP_PADDING - 14:.0f}" '
+                        f'width="{x1 - x0 + 2 * GROUP_PADDING:.0f}" height="{NODE_HEIGHT + 2 * GROUP_PADDING + 14:.0f}" '
+                        f'rx="8" fill="none" stroke="#f39c12" stroke-dasharray="6 4"/>'
+                        f'<text x="{x0:.0f}" y="{y0 - 12:.0f}" font-size="11" fill="#f39c12">并行组 {group}</text>'
+                    )
+                run = []
+            if step is not None:
+                run.append(step)
+
+    # 依赖连线
+    by_order = {step['step_order']: step for step in compiled.steps}
+
+    def line(x1, y1, x2, y2, arrow=True):
+        marker = ' marker-end="url(#arrow)"' if arrow else ''
+        return (f'<path d="M {x1:.0f} {y1:.0f} C {x1:.0f} {(y1 + y2) / 2:.0f}, {x2:.0f} {(y1 + y2) / 2:.0f}, '
+                f'{x2:.0f} {y2:.0f}" fill="none" stroke="#3498db" stroke-width="1.5"{marker}/>')
+
+    def top(step):
+        x, y = position[step['id']]
+        return x + NODE_WIDTH / 2, y
+
+    def bottom(step):
+        x, y = position[step['id']]
+        return x + NODE_WIDTH / 2, y + NODE_HEIGHT
+
+    for index, stage in enumerate(stages):
+        implicit = []
+        for step in stage:
+            if step['prerequisite_orders']:
+                for order in step['prerequisite_orders']:
+                    if order in by_order:
+                        parts.append(line(*bottom(by_order[order]), *top(step)))
+            elif index > 0:
+                implicit.append(step)
+        if not implicit:
+            continue
+        previous = stages[index - 1]
+        if len(previous) == 1 or len(implicit) == 1:
+            for pred in previous:
+                for step in implicit:
+                    parts.append(line(*bottom(pred), *top(step)))
+            continue
+        # 多对多的阶段依赖经汇合点连接
+        jx = sum(bottom(pred)[0] for pred in previous) / len(previous)
+        jy = max(bottom(pred)[1] for pred in previous) + V_GAP / 2
+        for pred in previous:
+            parts.append(line(*bottom(pred), jx, jy, arrow=False))
+        parts.append(f'<circle cx="{jx:.0f}" cy="{jy:.0f}" r="4" fill="#3498db"/>')
+        for step in implicit:
+            parts.append(line(jx, jy, *top(step)))
+
+    # 步骤节点
+    for step in compiled.steps:
+        x, y = position[step['id']]
+        if step['is_critical']:
+            fill, stroke = '#fdecea', '#e74c3c'
+        elif step['parallel_group']:
+            fill, stroke = '#fff3cd', '#f39c12'
+        else:
+            fill, stroke = '#f8f9fa', '#6c757d'
+        hours = f"{float(step['estimated_hours'] or 0):.1f}小时"
+        title = f"步骤{step['step_order']}：{step['step_name']}（{step['process_name'] or ''}，{hours}）"
+        parts.append(
+            f'<g><title>{escape(title)}</title>'
+            f'<rect x="{x:.0f}" y="{y:.0f}" width="{NODE_WIDTH}" height="{NODE_HEIGHT}" rx="8" '
+            f'fill="{fill}" stroke="{stroke}" stroke-width="2"/>'
+            f'<text x="{x + NODE_WIDTH / 2:.0f}" y="{y + 22:.0f}" text-anchor="middle" font-size="13" '
+            f'font-weight="bold" fill="#2c3e50">{step["step_order"]}. {escape(_truncate(step["step_name"], 13))}</text>'
+            f'<text x="{x + NODE_WIDTH / 2:.0f}" y="{y + 40:.0f}" text-anchor="middle" font-size="11" '
+            f'fill="#6c757d">{escape(_truncate(step["process_name"], 16))}</text>'
+            f'<text x="{x + NODE_WIDTH / 2:.0f}" y="{y + 56:.0f}" text-anchor="middle" font-size="11" '
+            f'fill="#3498db">{hours}</text></g>'
+        )
+
+    parts.append('</svg>')
+    return ''.join(parts)
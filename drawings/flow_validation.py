@@ -0,0 +1,280 @@
+"""工艺流程前置关系校验
+
+每个流程的步骤按依赖图的拓扑顺序编号，保存在 ProcessFlowStep.topo_index 中（从 1 开始，0 表示未计算），
+重算关键路径时一并刷新。新增前置关系（步骤 s 以 p 为前置）时：
+- p 的编号小于 s：现有顺序仍然成立，无需读取流程图；
+- 否则只在编号介于两者之间的区域内从 s 向后继方向搜索（Pearce-Kelly 算法），能到达 p 即构成循环，
+  不构成循环时在该区域内调整编号并立即回写，供同一批次及同一事务内后续的前置关系继续校验。
+
+全量检查（check_process_flows 命令）一次读取全部流程，报告循环依赖、跨流程/自引用的前置关系以及并行组冲突。
+"""
+from collections import defaultdict, deque
+from dataclasses import dataclass
+
+from .models import ProcessFlowStep
+from .process_flow import ProcessFlowCycleError, build_dependency_graph, load_flow_graph, topological_order
+
+
+@dataclass
+class FlowIssue:
+    """流程检查发现的问题"""
+    process_flow_id: int
+    kind: str  # cycle / orphan / parallel_group
+    message: str
+
+
+class _FlowGraph:
+    """单个流程的依赖图及拓扑编号，支持逐条插入前置关系"""
+
+    def __init__(self, steps, edges):
+        _, self.predecessors = build_dependency_graph(steps, edges)
+        self.steps = steps
+        self.explicit = {step_id for step_id, _ in edges}
+        self.successors = defaultdict(list)
+        for node, preds in self.predecessors.items():
+            for pred in preds:
+                self.successors[pred].append(node)
+
+        self.index = {step['id']: step['topo_index'] for step in steps}
+        if not self._index_is_valid():
+            order, _ = topological_order(self.predecessors, steps)
+            self.index = {step_id: position for position, step_id in enumerate(
+                (node for node in order if node > 0), start=1)}
+
+    def _index_is_valid(self):
+        """已保存的编号是否互不相同且满足所有（经虚拟阶段节点传递的）依赖"""
+        values = list(self.index.values())
+        if 0 in values or len(set(values)) != len(values):
+            return False
+        return all(
+            self.index[pred] < self.index[step_id]
+            for step_id, pred in self._step_dependencies()
+        )
+
+    def _step_dependencies(self):
+        for node, preds in self.predecessors.items():
+            if node < 0:
+                continue
+            for pred in preds:
+                if pred > 0:
+                    yield node, pred
+                else:
+                    # 虚拟阶段节点的前置即上一阶段的全部步骤
+                    for stage_step in self.predecessors[pred]:
+                        yield node, stage_step
+
+    def _search(self, start, neighbours, inside):
+        """从 start 出发沿 neighbours 搜索 inside 范围内的步骤（虚拟节点直接穿过），返回 {步骤: 来源}"""
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for nxt in neighbours[node]:
+                if nxt in parents or (nxt > 0 and not inside(self.index[nxt])):
+                    continue
+                parents[nxt] = node
+                queue.append(nxt)
+        return parents
+
+    def add(self, step_id, prerequisite_id):
+        """插入前置关系 step_id <- prerequisite_id，构成循环时抛出 ProcessFlowCycleError"""
+        lower, upper = self.index[step_id], self.index[prerequisite_id]
+        if upper > lower:
+            forward = self._search(step_id, self.successors, lambda index: index <= upper)
+            if prerequisite_id in forward:
+                path, node = [], prerequisite_id
+                while node is not None:
+                    if node > 0:
+                        path.append(node)
+                    node = forward[node]
+                raise ProcessFlowCycleError(path, self.steps)
+            backward = self._search(prerequisite_id, self.predecessors, lambda index: index >= lower)
+
+            # 受影响区域内：能到达前置步骤的节点排在前，步骤的后继排在后，沿用区域内原有的编号
+            affected_back = sorted((node for node in backward if node > 0), key=self.index.get)
+            affected_forward = sorted((node for node in forward if node > 0), key=self.index.get)
+            slots = sorted(self.index[node] for node in affected_back + affected_forward)
+            for node, slot in zip(affected_back + affected_forward, slots):
+                self.index[node] = slot
+
+        if step_id not in self.explicit:
+            # 首次配置前置步骤后不再按执行顺序推导依赖
+            for pred in self.predecessors[step_id]:
+                self.successors[pred].remove(step_id)
+            self.predecessors[step_id] = []
+            self.explicit.add(step_id)
+        self.predecessors[step_id].append(prerequisite_id)
+        self.successors[prerequisite_id].append(step_id)
+
+
+def validate_prerequisite_links(links):
+    """校验待新增的前置关系 [(步骤ID, 前置步骤ID), ...]
+
+    跨流程或自引用时抛出 ValueError，构成循环依赖时抛出 ProcessFlowCycleError。
+    满足已有拓扑顺序的前置关系只需一次查询；其余按流程读取依赖图后做局部搜索。
+    """
+    links = list(links)
+    step_ids = {step_id for link in links for step_id in link}
+    info = {
+        step_id: (process_flow_id, step_order, topo_index)
+        for step_id, process_flow_id, step_order, topo_index in ProcessFlowStep.objects.filter(
+            id__in=step_ids
+        ).values_list('id', 'process_flow_id', 'step_order', 'topo_index')
+    }
+
+    pending = defaultdict(list)
+    for step_id, prerequisite_id in links:
+        flow_id, step_order, step_index = info[step_id]
+        prerequisite_flow_id, prerequisite_order, prerequisite_index = info[prerequisite_id]
+        if step_id == prerequisite_id:
+            raise ValueError(f'步骤{step_order}不能以自身作为前置步骤')
+        if flow_id != prerequisite_flow_id:
+            raise ValueError(f'步骤{step_order}的前置步骤必须属于同一工艺流程')
+        if not 0 < prerequisite_index < step_index:
+            pending[flow_id].append((step_id, prerequisite_id))
+
+    for flow_id, flow_links in pending.items():
+        graph = _FlowGraph(*load_flow_graph(flow_id, extra_fields=('topo_index', 'work_process__process_name')))
+        for step_id, prerequisite_id in flow_links:
+            graph.add(step_id, prerequisite_id)
+        # 关键路径在事务提交时才重算，先回写调整过的编号，同一事务内后续的校验仍以其为准
+        saved = {step['id']: step['topo_index'] for step in graph.steps}
+        ProcessFlowStep.objects.bulk_update(
+            [ProcessFlowStep(id=step_id, topo_index=index)
+             for step_id, index in graph.index.items() if saved[step_id] != index],
+            ['topo_index'], batch_size=1000,
+        )
+
+
+def strongly_connected_components(successors):
+    """Tarjan 强连通分量（迭代实现），返回包含多个节点的分量列表"""
+    index, low, on_stack = {}, {}, set()
+    stack, components = [], []
+    counter = 0
+    for root in list(successors):
+        if root in index:
+            continue
+        work = [(root, iter(successors[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1:
+                    components.append(component)
+    return components
+
+
+def check_process_flows(process_flow_ids=None):
+    """一次读取全部（或指定）流程的步骤和前置关系并逐个检查
+
+    返回 (问题列表, {流程ID: (steps, 拓扑顺序)})，后者只包含无循环的流程，可用于回写拓扑序号。
+    """
+    steps = ProcessFlowStep.objects.order_by('process_flow_id', 'step_order', 'parallel_group', 'id')
+    if process_flow_ids is not None:
+        steps = steps.filter(process_flow_id__in=process_flow_ids)
+    steps_by_flow = defaultdict(list)
+    flow_by_step = {}
+    order_by_step = {}
+    for step in steps.values('id', 'process_flow_id', 'step_order', 'parallel_group', 'estimated_hours', 'topo_index'):
+        steps_by_flow[step['process_flow_id']].append(step)
+        flow_by_step[step['id']] = step['process_flow_id']
+        order_by_step[step['id']] = step['step_order']
+
+    through = ProcessFlowStep.prerequisites.through
+    links = through.objects.values_list('from_processflowstep_id', 'to_processflowstep_id')
+    if process_flow_ids is not None:
+        links = links.filter(from_processflowstep__process_flow_id__in=process_flow_ids)
+
+    issues = []
+    edges_by_flow = defaultdict(list)
+    for step_id, prerequisite_id in links:
+        flow_id = flow_by_step[step_id]
+        if step_id == prerequisite_id:
+            issues.append(FlowIssue(flow_id, 'orphan', f'步骤{order_by_step[step_id]}以自身作为前置步骤'))
+        elif flow_by_step.get(prerequisite_id) != flow_id:
+            prerequisite = ProcessFlowStep.objects.filter(id=prerequisite_id).values(
+                'step_order', 'process_flow__name').first()
+            issues.append(FlowIssue(
+                flow_id, 'orphan',
+                f'步骤{order_by_step[step_id]}的前置步骤属于其他工艺流程'
+                f'（{prerequisite["process_flow__name"]} 步骤{prerequisite["step_order"]}）',
+            ))
+        else:
+            edges_by_flow[flow_id].append((step_id, prerequisite_id))
+
+    orders = {}
+    for flow_id, flow_steps in steps_by_flow.items():
+        flow_edges = edges_by_flow[flow_id]
+        issues.extend(_parallel_group_issues(flow_id, flow_steps, flow_edges, order_by_step))
+
+        _, predecessors = build_dependency_graph(flow_steps, flow_edges)
+        successors = {node: [] for node in predecessors}
+        for node, preds in predecessors.items():
+            for pred in preds:
+                successors[pred].append(node)
+        cycles = strongly_connected_components(successors)
+        for component in cycles:
+            step_orders = sorted(order_by_step[node] for node in component if node > 0)
+            issues.append(FlowIssue(
+                flow_id, 'cycle', f'步骤{"、".join(map(str, step_orders))}之间存在循环依赖'))
+        if not cycles:
+            order, _ = topological_order(predecessors)
+            orders[flow_id] = (flow_steps, [node for node in order if node > 0])
+    return issues, orders
+
+
+def _parallel_group_issues(flow_id, steps, edges, order_by_step):
+    """并行组冲突：同一组号被其他步骤隔开，或同一并行阶段内的步骤互为前置"""
+    issues = []
+    stage_of = {}
+    seen_groups = {}
+    stage = -1
+    previous_group = None
+    for step in steps:
+        group = step['parallel_group']
+        if not group or group != previous_group:
+            stage += 1
+            if group and group in seen_groups:
+                issues.append(FlowIssue(
+                    flow_id, 'parallel_group',
+                    f'并行组{group}被其他步骤隔开（步骤{seen_groups[group]}与步骤{step["step_order"]}），'
+                    f'将拆分为多个阶段依次执行',
+                ))
+            seen_groups.setdefault(group, step['step_order'])
+        stage_of[step['id']] = (stage, group)
+        previous_group = group
+
+    for step_id, prerequisite_id in edges:
+        stage, group = stage_of[step_id]
+        if group and stage_of[prerequisite_id] == (stage, group):
+            issues.append(FlowIssue(
+                flow_id, 'parallel_group',
+                f'步骤{order_by_step[step_id]}与其前置步骤{order_by_step[prerequisite_id]}'
+                f'属于同一并行组{group}，实际无法并行',
+            ))
+    return issues
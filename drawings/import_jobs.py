@@ -0,0 +1,146 @@
+"""后台导入任务
+
+大文件上传后先保存到 IMPORT_JOB_DIR 并登记为 ImportJob（排队中），请求立即返回；
+run_import_jobs 命令轮询排队的任务，用进程池在请求之外执行导入，不依赖消息队列。
+导入过程中每批写入后把进度和计数写回任务行，导入页面通过 JSON 接口轮询显示进度。
+
+任务的领取通过 "status=pending 的条件更新" 完成，多个 worker 同时运行时同一任务只会被一个领取。
+worker 异常退出时任务会停留在导入中，run_import_jobs 启动时按 updated_at 回收超时未更新的任务。
+"""
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .importers import MAX_ERRORS, estimate_rows, import_pallets, import_sections
+from .models import ImportJob
+
+IMPORTERS = {
+    'section': import_sections,
+    'pallet': import_pallets,
+}
+
+
+def import_job_dir():
+    return Path(getattr(settings, 'IMPORT_JOB_DIR', Path(settings.BASE_DIR) / 'uploads' / 'imports'))
+
+
+def background_threshold():
+    """超过该大小（字节）的上传文件转为后台导入"""
+    return getattr(settings, 'IMPORT_BACKGROUND_SIZE', 512 * 1024)
+
+
+def create_import_job(kind, uploaded_file, upsert=False):
+    """保存上传文件并登记排队中的导入任务"""
+    directory = import_job_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{uuid.uuid4().hex}{Path(uploaded_file.name).suffix.lower()}'
+    with open(path, 'wb') as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+    return ImportJob.objects.create(
+        kind=kind, file_path=str(path), original_name=uploaded_file.name, upsert=upsert,
+    )
+
+
+def pending_job_ids(limit=None):
+    job_ids = ImportJob.objects.filter(status='pending').order_by('created_at', 'id').values_list('id', flat=True)
+    return list(job_ids[:limit] if limit else job_ids)
+
+
+def stale_timeout():
+    """导入中的任务超过该秒数未更新进度，视为 worker 已异常退出"""
+    return getattr(settings, 'IMPORT_JOB_STALE_TIMEOUT', 30 * 60)
+
+
+def claim_job(job_id):
+    """领取排队中的任务，已被其他 worker 领取时返回 False"""
+    now = timezone.now()
+    return ImportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=now, updated_at=now) == 1
+
+
+def requeue_job(job_id):
+    ImportJob.objects.filter(pk=job_id, status='running').update(
+        status='pending', started_at=None, updated_at=timezone.now())
+
+
+def fail_job(job_id, message):
+    ImportJob.objects.filter(pk=job_id, status='running').update(
+        status='failed', message=message, finished_at=timezone.now())
+
+
+def recover_stale_jobs(timeout=None):
+    """回收超时未更新的导入中任务，返回 (重新排队数, 标记失败数)
+
+    更新模式的导入可重复执行，上传文件仍在时重新排队；其余任务已写入的行重新导入会报重复，标记为失败。
+    """
+    timeout = stale_timeout() if timeout is None else timeout
+    stale = ImportJob.objects.filter(
+        status='running', updated_at__lt=timezone.now() - timedelta(seconds=timeout))
+    requeued = failed = 0
+    for job_id, upsert, file_path in stale.values_list('id', 'upsert', 'file_path'):
+        if upsert and Path(file_path).exists():
+            requeue_job(job_id)
+            requeued += 1
+        else:
+            fail_job(job_id, '导入进程异常退出，任务未完成，请检查已导入的数据后重新上传')
+            Path(file_path).unlink(missing_ok=True)
+            failed += 1
+    return requeued, failed
+
+
+def _counts(result):
+    return {
+        'updated_at': timezone.now(),
+        'processed_rows': result.total_rows,
+        'created_count': result.created,
+        'updated_count': result.updated,
+        'unchanged_count': result.unchanged,
+        'error_count': result.error_count,
+    }
+
+
+def run_import_job(job_id):
+    """执行一个已领取的导入任务（在 worker 进程中调用），返回最终状态"""
+    job = ImportJob.objects.get(pk=job_id)
+    jobs = ImportJob.objects.filter(pk=job_id)
+    path = Path(job.file_path)
+    try:
+        with open(path, 'rb') as f:
+            jobs.update(total_rows=estimate_rows(f, job.original_name), updated_at=timezone.now())
+            result = IMPORTERS[job.kind](
+                f, job.original_name, upsert=job.upsert,
+                progress=lambda result: jobs.update(**_counts(result)),
+            )
+    except Exception as e:
+        fail_job(job_id, str(e))
+        return 'failed'
+    finally:
+        path.unlink(missing_ok=True)
+
+    jobs.update(status='success', errors=result.errors[:MAX_ERRORS], finished_at=timezone.now(), **_counts(result))
+    return 'success'
+
+
+def job_status(job):
+    """任务状态（JSON 接口和页面共用）"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'original_name': job.original_name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'percent': job.percent,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'created_count': job.created_count,
+        'updated_count': job.updated_count,
+        'unchanged_count': job.unchanged_count,
+        'error_count': job.error_count,
+        'errors': job.errors,
+        'message': job.message,
+        'finished': job.status in ('success', 'failed'),
+    }
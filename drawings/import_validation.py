@@ -0,0 +1,258 @@
+"""分段导入预校验（不写入数据库）
+
+整份文件读入后按列用 NumPy 一次性校验：必填、日期格式、日期先后顺序、项目/分段类型是否存在、
+文件内分段号重复、与数据库中已有分段号重复、胎架占用冲突（文件内互相冲突以及与已有分段冲突）。
+外键和已有分段号各用一次（分批的）查询，不逐行查询数据库。
+校验结果可导出为错误工作簿：保留原始列并附加行号和错误信息，改完后重新导入即可。
+"""
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from django.utils import timezone
+
+from .importers import (
+    SECTION_BOOL_FIELDS, SECTION_COLUMNS, SECTION_DATE_FIELDS, SECTION_LABELS, SECTION_REQUIRED,
+    FALSE_VALUES, TRUE_VALUES, SectionRowParser, _text, iter_rows, map_header, parse_date,
+)
+from .import_jobs import import_job_dir
+from .jig_calendar import get_jig_calendar
+from .models import Section
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅导入预校验需要
+    np = None
+
+try:
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill
+except ImportError:
+    openpyxl = None
+
+# 查询已有分段号时每批的数量，避免 IN 参数过多
+LOOKUP_BATCH = 1000
+
+
+@dataclass
+class ValidationReport:
+    """预校验结果"""
+    header: list
+    row_numbers: list
+    rows: list  # 原始单元格值，导出错误工作簿时使用
+    errors: dict = field(default_factory=dict)  # 行序号 -> [错误信息, ...]
+
+    @property
+    def total_rows(self):
+        return len(self.rows)
+
+    @property
+    def error_rows(self):
+        return len(self.errors)
+
+    @property
+    def error_count(self):
+        return sum(len(messages) for messages in self.errors.values())
+
+    def add(self, mask, message):
+        """为 mask 为 True 的行追加错误信息，message 可以是 行序号 -> 文本 的函数"""
+        for position in np.flatnonzero(mask):
+            position = int(position)
+            self.errors.setdefault(position, []).append(message(position) if callable(message) else message)
+
+    def messages(self, limit=None):
+        """按行号排列的 [(行号, 错误信息), ...]"""
+        items = sorted(self.errors.items())[:limit]
+        return [(self.row_numbers[position], '；'.join(messages)) for position, messages in items]
+
+
+def _date_column(values):
+    """日期列转为 datetime64[D]，空值和无法解析的值为 NaT，同时返回无法解析的掩码"""
+    parsed = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    invalid = np.zeros(len(values), dtype=bool)
+    for position, value in enumerate(values):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            invalid[position] = True
+            continue
+        if day is not None:
+            parsed[position] = day
+    return parsed, invalid
+
+
+def _existing_numbers(numbers):
+    existing = {}
+    for start in range(0, len(numbers), LOOKUP_BATCH):
+        existing.update(
+            Section.objects.filter(section_number__in=numbers[start:start + LOOKUP_BATCH])
+            .values_list('section_number', 'id')
+        )
+    return existing
+
+
+def validate_sections(file, filename, upsert=False):
+    """预校验分段导入文件，返回 ValidationReport
+
+    upsert 为 True 时已存在的分段号视为更新，不算错误；其胎架占用校验排除分段自身。
+    """
+    if np is None:
+        raise ValueError('导入预校验需要安装 numpy')
+    header, rows_iter = iter_rows(file, filename)
+    index = map_header(header, SECTION_COLUMNS, SECTION_REQUIRED)
+    parser = SectionRowParser(index)
+    row_numbers, rows = [], []
+    for row_number, values in rows_iter:
+        row_numbers.append(row_number)
+        rows.append(tuple(values))
+    report = ValidationReport(header=header, row_numbers=row_numbers, rows=rows)
+    if not rows:
+        return report
+
+    def text_column(name):
+        position = index.get(name)
+        if position is None:
+            return np.full(len(rows), '', dtype=object)
+        return np.array([_text(row[position]) if position < len(row) else '' for row in rows], dtype=object)
+
+    columns = {name: text_column(name) for name in SECTION_COLUMNS.values()}
+
+    # 必填
+    for name in SECTION_REQUIRED:
+        report.add(columns[name] == '', f'{SECTION_LABELS[name]}不能为空')
+
+    # 日期格式与先后顺序
+    dates = {}
+    for name in SECTION_DATE_FIELDS:
+        position = index[name]
+        dates[name], invalid = _date_column([row[position] if position < len(row) else None for row in rows])
+        report.add(invalid, f'{SECTION_LABELS[name]}日期格式错误')
+    for earlier, later in zip(SECTION_DATE_FIELDS, SECTION_DATE_FIELDS[1:]):
+        # 与 NaT 比较结果为 False，缺失的日期不会重复报错
+        report.add(dates[later] < dates[earlier], f'{SECTION_LABELS[later]}不能早于{SECTION_LABELS[earlier]}')
+
+    # 是/否列
+    accepted = np.array(sorted(TRUE_VALUES | FALSE_VALUES), dtype=object)
+    for name in SECTION_BOOL_FIELDS:
+        if name in index:
+            values = np.array([value.lower() for value in columns[name]], dtype=object)
+            report.add(~np.isin(values, accepted), f'{SECTION_LABELS[name]}应填写是/否')
+
+    # 项目、分段类型（按项目船型匹配）
+    projects = columns['project']
+    report.add((projects != '') & ~np.isin(projects, np.array(list(parser.projects), dtype=object)),
+               lambda position: f'项目不存在：{projects[position]}')
+    types = columns['section_type']
+    unknown_type = np.zeros(len(rows), dtype=bool)
+    for position, (project, name) in enumerate(zip(projects, types)):
+        # 项目不存在时已报错，这里只检查能确定船型的行
+        if name and project in parser.projects:
+            ship_type = parser.projects[project][1]
+            unknown_type[position] = not (parser.section_types.get((ship_type, name))
+                                          or parser.section_types_by_name.get(name))
+    report.add(unknown_type, lambda position: f'分段类型不存在：{types[position]}')
+
+    # 分段号：文件内重复、数据库中已存在
+    numbers = columns['section_number']
+    present = numbers != ''
+    unique, inverse, counts = np.unique(numbers.astype(str), return_inverse=True, return_counts=True)
+    duplicated = present & (counts[inverse] > 1)
+    report.add(duplicated, lambda position: f'文件中分段号重复：{numbers[position]}（共{counts[inverse[position]]}行）')
+    existing = _existing_numbers([number for number in unique.tolist() if number])
+    in_db = present & np.isin(numbers, np.array(list(existing), dtype=object))
+    if not upsert:
+        report.add(in_db, lambda position: f'分段号已存在：{numbers[position]}')
+
+    # 胎架占用：只校验胎架号和上胎/下胎日期齐全的行
+    jigs = columns['block_number']
+    on_dates, off_dates = dates['on_block_date'], dates['off_block_date']
+    checkable = (jigs != '') & ~np.isnat(on_dates) & ~np.isnat(off_dates) & (off_dates >= on_dates) & ~duplicated
+
+    # 文件内互相冲突：按 (胎架, 上胎日期) 排序，胎架编号乘以足够大的偏移后对下胎日期做前缀最大值，
+    # 前缀最大值在胎架切换处自然"重置"，上胎日期不晚于同胎架之前的最大下胎日期即为冲突
+    candidates = np.flatnonzero(checkable)
+    if len(candidates):
+        _, jig_index = np.unique(jigs[candidates].astype(str), return_inverse=True)
+        on_days = on_dates[candidates].astype(np.int64)
+        off_days = off_dates[candidates].astype(np.int64)
+        order = np.lexsort((on_days, jig_index))
+        # 参与校验的行下胎日期不早于上胎日期，日期范围为 [on_days.min(), off_days.max()]
+        offset = int(off_days.max() - on_days.min() + 2)
+        base = jig_index[order].astype(np.int64) * offset - on_days.min()
+        running = np.maximum.accumulate(base + off_days[order])
+        clash = np.zeros(len(order), dtype=bool)
+        clash[1:] = (base[1:] + on_days[order][1:]) <= running[:-1]
+        clash[1:] &= jig_index[order][1:] == jig_index[order][:-1]
+        report.add(np.isin(np.arange(len(rows)), candidates[order][clash]),
+                   lambda position: f'胎架{jigs[position]}与文件中其他分段的在胎期间重叠')
+
+    # 与已有分段冲突（内存中的胎架日历，每行一次二分查找）
+    calendar = get_jig_calendar()
+    clash = np.zeros(len(rows), dtype=bool)
+    detail = {}
+    for position in candidates:
+        conflicts = calendar.conflicts(
+            jigs[position], on_dates[position].item(), off_dates[position].item(),
+            exclude_id=existing.get(numbers[position]) if upsert else None,
+        )
+        if conflicts:
+            clash[position] = True
+            detail[int(position)] = conflicts[0][1]
+    report.add(clash, lambda position: f'胎架{jigs[position]}在该期间已被分段{detail[position]}占用')
+    return report
+
+
+def write_error_workbook(report, stream):
+    """导出错误工作簿：错误行的原始数据，前面加行号和错误信息两列"""
+    if openpyxl is None:
+        raise ValueError('导出错误工作簿需要安装 openpyxl')
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('错误明细')
+    sheet.column_dimensions['B'].width = 60
+    red = Font(color='C0392B')
+    header_fill = PatternFill('solid', fgColor='F8F9FA')
+
+    def styled(value, font=None, fill=None):
+        cell = openpyxl.cell.WriteOnlyCell(sheet, value=value)
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        return cell
+
+    sheet.append([styled(title, fill=header_fill) for title in ['原行号', '错误信息'] + report.header])
+    for position, messages in sorted(report.errors.items()):
+        sheet.append([report.row_numbers[position], styled('；'.join(messages), font=red)] + list(report.rows[position]))
+    workbook.save(stream)
+
+
+def _report_dir():
+    return import_job_dir() / 'reports'
+
+
+def save_error_workbook(report):
+    """保存错误工作簿并返回下载令牌，同时清理一天前的旧文件"""
+    directory = _report_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    expired = time.time() - 24 * 60 * 60
+    for stale in directory.glob('*.xlsx'):
+        if stale.stat().st_mtime < expired:
+            stale.unlink(missing_ok=True)
+    token = uuid.uuid4().hex
+    with open(directory / f'{token}.xlsx', 'wb') as f:
+        write_error_workbook(report, f)
+    return token
+
+
+def error_workbook_path(token):
+    """下载令牌对应的文件路径，令牌格式不对或文件不存在时返回 None"""
+    if not re.fullmatch(r'[0-9a-f]{32}', token or ''):
+        return None
+    path = _report_dir() / f'{token}.xlsx'
+    return path if path.exists() else None
+
+
+def error_workbook_name(filename):
+    stem = filename.rsplit('.', 1)[0] if filename else '分段导入'
+    return f'{stem}_错误明细_{timezone.localtime():%Y%m%d%H%M}.xlsx'
@@ -0,0 +1,535 @@
+"""分段/托盘 Excel、CSV 批量导入
+
+文件按行流式读取（XLSX 使用 openpyxl 只读模式的行迭代器，CSV 使用 csv.reader），内存占用与文件大小无关。
+项目、分段类型等外键在导入前各用一次查询构建 名称 -> ID 映射；有效行累积成批，
+每批用一次查询读出已存在的记录，校验胎架占用后在一个事务内 bulk_create。
+更新模式（upsert）下已存在的行与数据库中的字段摘要比较，分为新增、更新和无变化三类，
+只有新增和有变化的行写入数据库，重新导入基本未改动的计划表时几乎没有写操作。
+bulk_create 不触发信号，导入完成后统一使胎架日历、负荷矩阵和逾期托盘缓存失效；
+托盘导入每批写入后批量重建明细条目，导入完成后统一刷新涉及分段的齐套状态和涉及的物料需求周。
+"""
+import codecs
+import csv
+import hashlib
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from .jig_calendar import get_jig_calendar, invalidate_jig_calendar
+from .material_requirements import pallet_buckets, refresh_material_requirements, refresh_section_requirements
+from .models import Pallet, Project, Section, TypicalSection
+from .overdue_pallets import invalidate_overdue_pallets
+from .pallet_items import sync_pallet_items
+from .readiness import refresh_section_readiness
+from .utilization import invalidate_utilization
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl 为可选依赖，仅导入 XLSX 文件需要
+    openpyxl = None
+
+CHUNK_SIZE = 500
+# 结果中最多保留的错误行数，避免整份文件格式错误时错误列表过大
+MAX_ERRORS = 1000
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y%m%d')
+TRUE_VALUES = {'是', 'y', 'yes', 'true', '1', '√', '☑'}
+FALSE_VALUES = {'否', 'n', 'no', 'false', '0', '', '×', '☐'}
+
+# 表头 -> 字段名（同时接受字段名本身作为表头）
+SECTION_COLUMNS = {
+    '分段号': 'section_number',
+    '项目名称': 'project',
+    '分段类型': 'section_type',
+    '计划开始时间': 'planned_start_date',
+    '上胎日期': 'on_block_date',
+    '下胎日期': 'off_block_date',
+    '结束时间': 'end_date',
+    '胎架号': 'block_number',
+    '模型接收': 'model_received',
+    'BOM接收': 'bom_received',
+    '满足开工条件': 'start_conditions_met',
+}
+SECTION_LABELS = {name: title for title, name in SECTION_COLUMNS.items()}
+SECTION_REQUIRED = (
+    'section_number', 'project', 'section_type', 'planned_start_date', 'on_block_date', 'off_block_date', 'end_date',
+)
+# 按先后顺序排列：计划开始时间 <= 上胎日期 <= 下胎日期 <= 结束时间
+SECTION_DATE_FIELDS = ('planned_start_date', 'on_block_date', 'off_block_date', 'end_date')
+SECTION_BOOL_FIELDS = ('model_received', 'bom_received', 'start_conditions_met')
+
+PALLET_COLUMNS = {
+    '托盘编码': 'pallet_code',
+    '托盘名称': 'pallet_name',
+    '所属项目': 'project',
+    '所属分段': 'section',
+    '需求日期': 'required_date',
+    '托盘明细': 'pallet_details',
+    '是否接收': 'is_received',
+}
+PALLET_LABELS = {name: title for title, name in PALLET_COLUMNS.items()}
+PALLET_REQUIRED = ('pallet_code', 'pallet_name', 'section')
+
+
+class ImportFormatError(ValueError):
+    """文件格式错误（无法读取、缺少必需列等），整个文件无法导入"""
+
+
+@dataclass
+class ImportResult:
+    """导入结果"""
+    total_rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list = field(default_factory=list)  # [(行号, 错误信息), ...]
+    error_count: int = 0
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def _text(value):
+    """单元格转文本：Excel 中的整数分段号会读成 888 或 888.0"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'日期格式错误：{text}')
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = _text(value).lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'无法识别的是/否值：{text}')
+
+
+def _open_text(file):
+    """以文本方式打开 CSV：优先 UTF-8（含 BOM），否则按 Excel 中文版默认的 GB18030 解码"""
+    raw = getattr(file, 'file', file)
+    raw.seek(0)
+    head = raw.read(64 * 1024)
+    raw.seek(0)
+    try:
+        # 非最终块，截断在多字节字符中间不算错误
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        encoding = 'gb18030'
+    return io.TextIOWrapper(raw, encoding=encoding, newline='')
+
+
+def iter_rows(file, filename):
+    """逐行读取 XLSX/CSV，返回 (表头列表, 行迭代器)，行迭代器产生 (行号, 单元格元组)"""
+    suffix = Path(filename or '').suffix.lower()
+    if suffix == '.xlsx':
+        if openpyxl is None:
+            raise ImportFormatError('导入 XLSX 文件需要安装 openpyxl')
+        try:
+            workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFormatError(f'无法读取Excel文件：{e}')
+        rows = enumerate(workbook.worksheets[0].iter_rows(values_only=True), start=1)
+    elif suffix == '.csv':
+        workbook = None
+        rows = enumerate(csv.reader(_open_text(file)), start=1)
+    else:
+        raise ImportFormatError('仅支持 .xlsx 和 .csv 文件，.xls 文件请在Excel中另存为 .xlsx')
+
+    header = None
+    for _, values in rows:
+        if any(_text(value) for value in values):
+            header = [_text(value) for value in values]
+            break
+    if header is None:
+        raise ImportFormatError('文件中没有数据')
+
+    def data_rows():
+        try:
+            for row_number, values in rows:
+                if any(_text(value) for value in values):
+                    yield row_number, values
+        finally:
+            if workbook is not None:
+                workbook.close()
+
+    return header, data_rows()
+
+
+def estimate_rows(file, filename):
+    """估计数据行数（不含表头），用于显示导入进度
+
+    XLSX 读取工作表记录的数据范围，CSV 按块统计换行数，均不解析单元格。
+    """
+    suffix = Path(filename or '').suffix.lower()
+    if suffix == '.xlsx' and openpyxl is not None:
+        try:
+            workbook = openpyxl.load_workbook(file, read_only=True)
+            rows = workbook.worksheets[0].max_row or 0
+            workbook.close()
+        except Exception:
+            rows = 0
+    else:
+        raw = getattr(file, 'file', file)
+        rows, last = 0, b''
+        for block in iter(lambda: raw.read(1024 * 1024), b''):
+            rows += block.count(b'\n')
+            last = block
+        if last and not last.endswith(b'\n'):
+            rows += 1  # 最后一行没有换行符
+    getattr(file, 'file', file).seek(0)
+    return max(rows - 1, 0)
+
+
+def map_header(header, columns, required):
+    """表头 -> 列序号，缺少必需列时抛出 ImportFormatError"""
+    names = dict(columns, **{name: name for name in columns.values()})
+    index = {}
+    for position, title in enumerate(header):
+        name = names.get(title)
+        if name and name not in index:
+            index[name] = position
+    labels = {name: title for title, name in columns.items()}
+    missing = [labels[name] for name in required if name not in index]
+    if missing:
+        raise ImportFormatError(f'缺少必需的列：{"、".join(missing)}')
+    return index
+
+
+class RowParser:
+    """按列序号取单元格值"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def value(self, values, name):
+        position = self.index.get(name)
+        return values[position] if position is not None and position < len(values) else None
+
+
+class SectionRowParser(RowParser):
+    """分段行解析：外键按预先构建的映射解析，不逐行查询"""
+
+    def __init__(self, index):
+        super().__init__(index)
+        self.projects = {
+            name: (project_id, ship_type_id)
+            for project_id, name, ship_type_id in Project.objects.values_list('id', 'project_name', 'ship_type_id')
+        }
+        self.section_types = {}
+        self.section_types_by_name = {}
+        for type_id, ship_type_id, name in TypicalSection.objects.values_list('id', 'ship_type_id', 'section_name'):
+            self.section_types[(ship_type_id, name)] = type_id
+            # 分段类型名称只在船型内唯一，跨船型重名时不能仅凭名称确定
+            self.section_types_by_name[name] = None if name in self.section_types_by_name else type_id
+
+    def parse(self, values):
+        """解析一行，返回未保存的 Section；数据错误时抛出 ValueError"""
+        data = {}
+        for name in SECTION_REQUIRED:
+            if not _text(self.value(values, name)):
+                raise ValueError(f'{SECTION_LABELS[name]}不能为空')
+
+        section_number = _text(self.value(values, 'section_number'))
+        block_number = _text(self.value(values, 'block_number'))
+        for name, text in (('section_number', section_number), ('block_number', block_number)):
+            max_length = Section._meta.get_field(name).max_length
+            if len(text) > max_length:
+                raise ValueError(f'{SECTION_LABELS[name]}超过{max_length}个字符')
+
+        project_name = _text(self.value(values, 'project'))
+        if project_name not in self.projects:
+            raise ValueError(f'项目不存在：{project_name}')
+        project_id, ship_type_id = self.projects[project_name]
+
+        type_name = _text(self.value(values, 'section_type'))
+        section_type_id = self.section_types.get((ship_type_id, type_name)) or self.section_types_by_name.get(type_name)
+        if not section_type_id:
+            raise ValueError(f'分段类型不存在：{type_name}')
+
+        for name in SECTION_DATE_FIELDS:
+            data[name] = parse_date(self.value(values, name))
+        for earlier, later in zip(SECTION_DATE_FIELDS, SECTION_DATE_FIELDS[1:]):
+            if data[later] < data[earlier]:
+                raise ValueError(f'{SECTION_LABELS[later]}不能早于{SECTION_LABELS[earlier]}')
+        for name in SECTION_BOOL_FIELDS:
+            data[name] = parse_bool(self.value(values, name))
+
+        return Section(
+            section_number=section_number,
+            project_id=project_id,
+            section_type_id=section_type_id,
+            block_number=block_number,
+            # 新分段尚无托盘，齐套状态只取决于三项条件
+            is_ready=data['model_received'] and data['bom_received'] and data['start_conditions_met'],
+            **data,
+        )
+
+
+class PalletRowParser(RowParser):
+    """托盘行解析：所属分段按分段号映射解析，所属项目取自分段"""
+
+    def __init__(self, index):
+        super().__init__(index)
+        self.sections = {
+            number: (section_id, project_id)
+            for section_id, number, project_id in Section.objects.values_list('id', 'section_number', 'project_id')
+        }
+        self.projects = dict(Project.objects.values_list('id', 'project_name'))
+
+    def parse(self, values):
+        """解析一行，返回未保存的 Pallet；数据错误时抛出 ValueError"""
+        for name in PALLET_REQUIRED:
+            if not _text(self.value(values, name)):
+                raise ValueError(f'{PALLET_LABELS[name]}不能为空')
+
+        pallet_code = _text(self.value(values, 'pallet_code'))
+        pallet_name = _text(self.value(values, 'pallet_name'))
+        for name, text in (('pallet_code', pallet_code), ('pallet_name', pallet_name)):
+            max_length = Pallet._meta.get_field(name).max_length
+            if len(text) > max_length:
+                raise ValueError(f'{PALLET_LABELS[name]}超过{max_length}个字符')
+
+        section_number = _text(self.value(values, 'section'))
+        if section_number not in self.sections:
+            raise ValueError(f'分段不存在：{section_number}')
+        section_id, project_id = self.sections[section_number]
+        # 所属项目列可省略；填写时须与分段所属项目一致
+        project_name = _text(self.value(values, 'project'))
+        if project_name and project_name != self.projects[project_id]:
+            raise ValueError(f'所属项目与分段不符：分段{section_number}属于{self.projects[project_id]}')
+
+        return Pallet(
+            pallet_code=pallet_code,
+            pallet_name=pallet_name,
+            project_id=project_id,
+            section_id=section_id,
+            pallet_details=_text(self.value(values, 'pallet_details')),
+            required_date=parse_date(self.value(values, 'required_date')),
+            is_received=parse_bool(self.value(values, 'is_received')),
+        )
+
+
+def field_hash(values):
+    """一行字段值的摘要，用于判断已有记录是否需要更新"""
+    return hashlib.blake2b(repr(tuple(values)).encode('utf-8'), digest_size=16).digest()
+
+
+def load_existing(model, key_field, keys, fields):
+    """按自然键一次查询已有记录，返回 {键: (ID, 字段摘要, 是否启用)}"""
+    rows = model.objects.filter(**{f'{key_field}__in': keys}).values_list(key_field, 'id', 'is_active', *fields)
+    return {row[0]: (row[1], field_hash(row[3:]), row[2]) for row in rows}
+
+
+def import_sections(file, filename, chunk_size=CHUNK_SIZE, upsert=False, progress=None):
+    """流式导入分段，返回 ImportResult
+
+    数据有误的行跳过并记录行号和原因，其余行按批写入（每批一个事务）。
+    upsert 为 True 时分段号已存在的行按字段摘要比较，只更新有变化的分段；
+    文件中没有的可选列（胎架号、接收状态等）保持原值不变。
+    progress 为每批写入后的回调，参数为当前的 ImportResult。
+    """
+    header, rows = iter_rows(file, filename)
+    index = map_header(header, SECTION_COLUMNS, SECTION_REQUIRED)
+    parser = SectionRowParser(index)
+    update_fields = [name for name in SECTION_COLUMNS.values() if name in index and name != 'section_number']
+    attnames = [Section._meta.get_field(name).attname for name in update_fields]
+    calendar = get_jig_calendar()
+    result = ImportResult()
+    seen = set()
+    batch = []
+    pending = {}  # 本批新增分段号 -> 日历中的临时键
+
+    def flush():
+        existing = load_existing(Section, 'section_number', [section.section_number for _, section in batch],
+                                 update_fields)
+        inserts, updates = [], []
+        for row_number, section in batch:
+            current = existing.get(section.section_number)
+            if current and not upsert:
+                result.add_error(row_number, f'分段号已存在：{section.section_number}')
+                continue
+            if current:
+                section.pk, digest, section.is_active = current
+                if field_hash(getattr(section, name) for name in attnames) == digest:
+                    result.unchanged += 1
+                    continue
+            conflicts = calendar.conflicts(section.block_number, section.on_block_date, section.off_block_date,
+                                           exclude_id=section.pk)
+            if conflicts and section.is_active:
+                result.add_error(row_number, f'胎架{section.block_number}在该期间已被分段{conflicts[0][1]}占用')
+                continue
+            if section.pk:
+                updates.append(section)
+                key = section.pk
+            else:
+                inserts.append(section)
+                # 新分段尚无ID，先用负数临时键登记，同一批后续行与它重叠时也能检出冲突
+                key = pending[section.section_number] = -(len(pending) + 1)
+            calendar.place(key, section.section_number, section.block_number,
+                           section.on_block_date, section.off_block_date, section.is_active)
+
+        with transaction.atomic():
+            created = Section.objects.bulk_create(inserts)
+            if updates:
+                now = timezone.now()
+                for section in updates:
+                    section.updated_at = now  # bulk_update 不会自动刷新 auto_now 字段
+                Section.objects.bulk_update(updates, update_fields + ['updated_at'])
+                # 接收状态可能变化，齐套状态需结合托盘重算；计划开始时间变化影响未填需求日期托盘的物料需求
+                refresh_section_readiness([section.pk for section in updates])
+                refresh_section_requirements([section.pk for section in updates])
+        # MySQL 的 bulk_create 不回填主键，按分段号查回 ID 后把临时键换成分段ID
+        ids = dict(Section.objects.filter(section_number__in=[s.section_number for s in created if s.block_number])
+                   .values_list('section_number', 'id'))
+        for section in created:
+            calendar.discard(pending.pop(section.section_number))
+            if section.block_number:
+                calendar.place(ids[section.section_number], section.section_number, section.block_number,
+                               section.on_block_date, section.off_block_date, section.is_active)
+        result.created += len(created)
+        result.updated += len(updates)
+        batch.clear()
+        if progress:
+            progress(result)
+
+    try:
+        for row_number, values in rows:
+            result.total_rows += 1
+            try:
+                section = parser.parse(values)
+            except ValueError as e:
+                result.add_error(row_number, str(e))
+                continue
+            if section.section_number in seen:
+                result.add_error(row_number, f'文件中分段号重复：{section.section_number}')
+                continue
+            seen.add(section.section_number)
+            batch.append((row_number, section))
+            if len(batch) >= chunk_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if result.created or result.updated:
+            invalidate_jig_calendar()
+            invalidate_utilization()
+            invalidate_overdue_pallets()
+    result.errors.sort()
+    return result
+
+
+def import_pallets(file, filename, chunk_size=CHUNK_SIZE, upsert=False, progress=None):
+    """流式导入托盘，返回 ImportResult
+
+    参数和错误处理与 import_sections 相同。所属项目由所属分段确定；
+    upsert 时文件中没有的可选列（需求日期、托盘明细、是否接收）保持原值不变。
+    """
+    header, rows = iter_rows(file, filename)
+    index = map_header(header, PALLET_COLUMNS, PALLET_REQUIRED)
+    parser = PalletRowParser(index)
+    update_fields = [name for name in PALLET_COLUMNS.values()
+                     if name != 'pallet_code' and (name in index or name == 'project')]
+    attnames = [Pallet._meta.get_field(name).attname for name in update_fields]
+    result = ImportResult()
+    seen = set()
+    batch = []
+    # 涉及的分段和需求周在全部批次写入后统一刷新，各批次共用的分段/周只重算一次
+    touched_sections = set()
+    touched_buckets = set()
+
+    def flush():
+        existing = load_existing(Pallet, 'pallet_code', [pallet.pallet_code for _, pallet in batch], update_fields)
+        inserts, updates = [], []
+        for row_number, pallet in batch:
+            current = existing.get(pallet.pallet_code)
+            if current and not upsert:
+                result.add_error(row_number, f'托盘编码已存在：{pallet.pallet_code}')
+                continue
+            if current:
+                pallet.pk, digest, pallet.is_active = current
+                if field_hash(getattr(pallet, name) for name in attnames) == digest:
+                    result.unchanged += 1
+                    continue
+            (updates if pallet.pk else inserts).append(pallet)
+
+        update_ids = [pallet.pk for pallet in updates]
+        with transaction.atomic():
+            # 更新前的所属分段和需求周，托盘改挂分段或改期后原分段、原需求周也需刷新
+            touched_sections.update(Pallet.objects.filter(pk__in=update_ids).values_list('section_id', flat=True))
+            touched_buckets.update(pallet_buckets(update_ids))
+            Pallet.objects.bulk_create(inserts)
+            if updates:
+                now = timezone.now()
+                for pallet in updates:
+                    pallet.updated_at = now  # bulk_update 不会自动刷新 auto_now 字段
+                Pallet.objects.bulk_update(updates, update_fields + ['updated_at'])
+            # MySQL 的 bulk_create 不回填主键，按托盘编码查回 ID
+            ids = dict(Pallet.objects.filter(pallet_code__in=[pallet.pallet_code for pallet in inserts])
+                       .values_list('pallet_code', 'id'))
+            for pallet in inserts:
+                pallet.pk = ids[pallet.pallet_code]
+            written = inserts + updates
+            sync_pallet_items((pallet.pk, pallet.pallet_details)
+                              for pallet in (written if 'pallet_details' in index else inserts))
+        touched_sections.update(pallet.section_id for pallet in written)
+        touched_buckets.update(pallet_buckets([pallet.pk for pallet in written]))
+        result.created += len(inserts)
+        result.updated += len(updates)
+        batch.clear()
+        if progress:
+            progress(result)
+
+    try:
+        for row_number, values in rows:
+            result.total_rows += 1
+            try:
+                pallet = parser.parse(values)
+            except ValueError as e:
+                result.add_error(row_number, str(e))
+                continue
+            if pallet.pallet_code in seen:
+                result.add_error(row_number, f'文件中托盘编码重复：{pallet.pallet_code}')
+                continue
+            seen.add(pallet.pallet_code)
+            batch.append((row_number, pallet))
+            if len(batch) >= chunk_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if touched_sections:
+            refresh_section_readiness(touched_sections)
+        if touched_buckets:
+            refresh_material_requirements(buckets=touched_buckets)
+        if result.created or result.updated:
+            invalidate_overdue_pallets()
+    result.errors.sort()
+    return result
@@ -0,0 +1,106 @@
+"""胎架自动分配
+
+为项目中尚未分配胎架的分段分配胎架（区间图着色 / 最早完成贪心）：
+分段按上胎日期、下胎日期排序依次处理，在当前占用日历（已有分段及本次已分配的分段）上
+选择该期间空闲、且之前最近一次占用结束得最晚的胎架（最紧凑放置，为后续分段留出整段空闲）。
+每个胎架的空闲判断为 O(log n)，整体约为 O(分段数 × 胎架数 × log n)。
+"""
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from .jig_calendar import JigCalendar, JigTimeline, get_jig_calendar, invalidate_jig_calendar
+from .models import Section
+from .utilization import invalidate_utilization
+
+
+@dataclass
+class JigAllocation:
+    """胎架分配方案"""
+    assignments: list = field(default_factory=list)  # [{'section_id', 'section_number', 'on_block_date', 'off_block_date', 'block_number'}]
+    unassigned: list = field(default_factory=list)   # 没有空闲胎架的分段（字段同上，block_number 为空）
+    jigs: list = field(default_factory=list)
+
+
+def unassigned_sections(project):
+    return list(
+        Section.objects.filter(project=project, is_active=True, block_number='')
+        .order_by('on_block_date', 'off_block_date', 'section_number')
+        .values('id', 'section_number', 'on_block_date', 'off_block_date')
+    )
+
+
+def allocate_jigs(sections, calendar, jigs=None):
+    """在占用日历上为分段分配胎架，calendar 会被就地修改（登记本次分配）
+
+    jigs 为可使用的胎架号列表，为空时使用日历中已有的全部胎架。
+    """
+    jigs = sorted(set(jigs or calendar.timelines))
+    timelines = [calendar.timelines.setdefault(jig, JigTimeline()) for jig in jigs]
+    allocation = JigAllocation(jigs=jigs)
+    for section in sorted(sections, key=lambda item: (item['on_block_date'], item['off_block_date'], item['id'])):
+        start, end = section['on_block_date'], section['off_block_date']
+        best, best_end = None, None
+        for index, timeline in enumerate(timelines):
+            if not timeline.is_free(start, end):
+                continue
+            previous_end = timeline.window(start, end)[0] or date.min
+            if best is None or previous_end > best_end:
+                best, best_end = index, previous_end
+        item = {
+            'section_id': section['id'],
+            'section_number': section['section_number'],
+            'on_block_date': start,
+            'off_block_date': end,
+            'block_number': jigs[best] if best is not None else '',
+        }
+        if best is None:
+            allocation.unassigned.append(item)
+            continue
+        calendar.place(section['id'], section['section_number'], jigs[best], start, end)
+        allocation.assignments.append(item)
+    return allocation
+
+
+def propose_jig_allocation(project, jigs=None):
+    """生成项目的胎架分配方案（不修改数据）"""
+    # 缓存读取得到的是反序列化后的副本，就地登记不影响缓存中的日历
+    return allocate_jigs(unassigned_sections(project), get_jig_calendar(), jigs)
+
+
+def apply_jig_allocation(project, jigs=None):
+    """重新生成分配方案并批量写入胎架号，返回方案
+
+    在事务内按最新数据重新计算，避免应用过期的方案造成重复占用。
+    """
+    with transaction.atomic():
+        sections = list(
+            Section.objects.select_for_update()
+            .filter(project=project, is_active=True, block_number='')
+            .order_by('on_block_date', 'off_block_date', 'section_number')
+        )
+        allocation = allocate_jigs(
+            [
+                {'id': section.id, 'section_number': section.section_number,
+                 'on_block_date': section.on_block_date, 'off_block_date': section.off_block_date}
+                for section in sections
+            ],
+            JigCalendar.build(),
+            jigs,
+        )
+        block_numbers = {item['section_id']: item['block_number'] for item in allocation.assignments}
+        now = timezone.now()
+        changed = []
+        for section in sections:
+            if section.id in block_numbers:
+                section.block_number = block_numbers[section.id]
+                section.updated_at = now  # bulk_update 不会自动刷新 auto_now 字段
+                changed.append(section)
+        Section.objects.bulk_update(changed, ['block_number', 'updated_at'], batch_size=1000)
+
+    # bulk_update 不触发信号，相关缓存整体失效
+    invalidate_jig_calendar()
+    invalidate_utilization()
+    return allocation
@@ -0,0 +1,263 @@
+"""胎架占用日历
+
+分段的胎架号（block_number）及上胎/下胎日期决定了胎架的占用区间（含首尾两天）。
+每个胎架维护一条按上胎日期排序的区间列表，并附带"下胎日期前缀最大值"：
+与 [start, end] 重叠的区间必然位于上胎日期 <= end 的前缀中，且该前缀的最大下胎日期 >= start，
+因此判断是否冲突只需一次二分查找，O(log n)；列出冲突分段时从前缀末尾向前扫描，
+前缀最大值小于 start 即可停止。
+
+每个胎架的占用区间单独缓存：校验单个分段只读取该胎架的区间，不反序列化整个日历。
+分段保存/删除时由信号使新旧胎架的缓存失效，下次读取时只查询这些胎架重建；
+批量导入等绕过 save() 的操作完成后调用 invalidate_jig_calendar() 更换缓存代号，全部胎架重建。
+多进程部署时需配置共享的缓存后端，否则其他进程的缓存要到过期才会失效。
+"""
+import hashlib
+import time
+from bisect import bisect_right
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Section
+
+CACHE_KEY = 'jig_calendar'
+GENERATION_KEY = f'{CACHE_KEY}:generation'
+
+
+class JigTimeline:
+    """单个胎架的占用区间"""
+
+    def __init__(self):
+        self.keys = []  # (上胎日期, 分段ID)，保持有序
+        self.ends = []
+        self.numbers = []
+        self.prefix_max = []
+
+    def _refresh_prefix(self, index):
+        # 插入/删除位置之后的前缀最大值需要重算
+        running = self.prefix_max[index - 1] if index > 0 else None
+        for i in range(index, len(self.ends)):
+            running = self.ends[i] if running is None else max(running, self.ends[i])
+            self.prefix_max[i] = running
+
+    def add(self, section_id, section_number, on_block_date, off_block_date):
+        key = (on_block_date, section_id)
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.ends.insert(index, off_block_date)
+        self.numbers.insert(index, section_number)
+        self.prefix_max.insert(index, off_block_date)
+        self._refresh_prefix(index)
+
+    def remove(self, section_id, on_block_date):
+        index = bisect_right(self.keys, (on_block_date, section_id)) - 1
+        if index < 0 or self.keys[index] != (on_block_date, section_id):
+            return
+        for values in (self.keys, self.ends, self.numbers, self.prefix_max):
+            del values[index]
+        self._refresh_prefix(index)
+
+    def is_free(self, start, end):
+        """[start, end] 内是否没有任何占用"""
+        index = bisect_right(self.keys, (end, float('inf')))
+        return index == 0 or self.prefix_max[index - 1] < start
+
+    def conflicts(self, start, end, exclude_id=None):
+        """与 [start, end] 重叠的分段，返回 [(分段ID, 分段号, 上胎日期, 下胎日期), ...]"""
+        index = bisect_right(self.keys, (end, float('inf')))
+        result = []
+        for i in range(index - 1, -1, -1):
+            if self.prefix_max[i] < start:
+                break
+            on_block_date, section_id = self.keys[i]
+            if self.ends[i] >= start and section_id != exclude_id:
+                result.append((section_id, self.numbers[i], on_block_date, self.ends[i]))
+        result.reverse()
+        return result
+
+    def window(self, start, end):
+        """查询区间前后最近的占用：返回 (前一占用的最晚下胎日期, 后一占用的最早上胎日期)，无则为 None"""
+        index = bisect_right(self.keys, (end, float('inf')))
+        previous_end = self.prefix_max[index - 1] if index > 0 else None
+        next_start = self.keys[index][0] if index < len(self.keys) else None
+        return previous_end, next_start
+
+
+class JigCalendar:
+    """全部胎架的占用日历"""
+
+    def __init__(self):
+        self.timelines = {}
+        self.locations = {}  # 分段ID -> (胎架号, 上胎日期)
+
+    @classmethod
+    def build(cls):
+        return cls.from_timelines(build_timelines())
+
+    @classmethod
+    def from_timelines(cls, timelines):
+        calendar = cls()
+        calendar.timelines = timelines
+        for block_number, timeline in timelines.items():
+            for on_block_date, section_id in timeline.keys:
+                calendar.locations[section_id] = (block_number, on_block_date)
+        return calendar
+
+    def place(self, section_id, section_number, block_number, on_block_date, off_block_date, is_active=True):
+        """登记（或移动）分段的占用"""
+        self.discard(section_id)
+        if block_number:
+            timeline = self.timelines.setdefault(block_number, JigTimeline())
+            if is_active and on_block_date and off_block_date:
+                timeline.add(section_id, section_number, on_block_date, off_block_date)
+                self.locations[section_id] = (block_number, on_block_date)
+
+    def discard(self, section_id):
+        location = self.locations.pop(section_id, None)
+        if location:
+            self.timelines[location[0]].remove(section_id, location[1])
+
+    def conflicts(self, block_number, start, end, exclude_id=None):
+        timeline = self.timelines.get(block_number)
+        if timeline is None or timeline.is_free(start, end):
+            return []
+        return timeline.conflicts(start, end, exclude_id)
+
+    def free_jigs(self, start, end, exclude_id=None):
+        """区间内空闲的胎架，返回 [{'block_number', 'free_after', 'free_until'}, ...]
+
+        exclude_id 为正在编辑的分段，其自身的占用不算冲突。
+        """
+        result = []
+        for block_number in sorted(self.timelines):
+            timeline = self.timelines[block_number]
+            if timeline.is_free(start, end) or (
+                    exclude_id is not None and not timeline.conflicts(start, end, exclude_id)):
+                previous_end, next_start = timeline.window(start, end)
+                result.append({
+                    'block_number': block_number,
+                    'free_after': previous_end,
+                    'free_until': next_start,
+                })
+        return result
+
+
+def build_timelines(block_numbers=None):
+    """从数据库构建胎架占用区间，block_numbers 为空时构建全部胎架，返回 {胎架号: JigTimeline}"""
+    rows = Section.objects.exclude(block_number='')
+    if block_numbers is not None:
+        rows = rows.filter(block_number__in=block_numbers)
+    rows = rows.values_list(
+        'id', 'section_number', 'block_number', 'on_block_date', 'off_block_date', 'is_active',
+    ).order_by('block_number', 'on_block_date', 'id')
+    timelines = {block_number: JigTimeline() for block_number in block_numbers or ()}
+    for section_id, section_number, block_number, on_block_date, off_block_date, is_active in rows:
+        timeline = timelines.setdefault(block_number, JigTimeline())
+        if is_active:
+            # 已按上胎日期排序读取，直接追加，最后统一计算前缀最大值
+            timeline.keys.append((on_block_date, section_id))
+            timeline.ends.append(off_block_date)
+            timeline.numbers.append(section_number)
+    for timeline in timelines.values():
+        timeline.prefix_max = list(accumulate(timeline.ends, max))
+    return timelines
+
+
+def _timeout():
+    return getattr(settings, 'JIG_CALENDAR_CACHE_TIMEOUT', 60 * 60)
+
+
+def _generation():
+    """当前缓存代号，invalidate_jig_calendar() 换新代号使全部胎架的缓存同时失效"""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # 代号取当前时间，代号被淘汰后重新生成也不会与旧代号的缓存重名
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _timeline_key(generation, block_number):
+    # 胎架号可能含空格等缓存后端不允许的字符，取摘要作为键
+    return f'{CACHE_KEY}:{generation}:{hashlib.md5(block_number.encode("utf-8")).hexdigest()}'
+
+
+def _jigs_key(generation):
+    return f'{CACHE_KEY}:{generation}:jigs'
+
+
+def get_jig_timeline(block_number):
+    """读取单个胎架的占用区间，未缓存时只查询该胎架的分段"""
+    key = _timeline_key(_generation(), block_number)
+    timeline = cache.get(key)
+    if timeline is None:
+        timeline = build_timelines([block_number])[block_number]
+        cache.set(key, timeline, _timeout())
+    return timeline
+
+
+def get_jig_calendar():
+    """读取全部胎架的占用日历（批量导入、自动分配、空闲胎架查询使用）
+
+    返回的是缓存的副本，就地修改不影响缓存。
+    """
+    generation = _generation()
+    jigs = cache.get(_jigs_key(generation))
+    if jigs is None:
+        jigs = sorted(Section.objects.exclude(block_number='').values_list('block_number', flat=True).distinct())
+        cache.set(_jigs_key(generation), jigs, _timeout())
+    keys = {_timeline_key(generation, block_number): block_number for block_number in jigs}
+    timelines = {keys[key]: timeline for key, timeline in cache.get_many(list(keys)).items()}
+    missing = [block_number for block_number in jigs if block_number not in timelines]
+    if missing:
+        built = build_timelines(missing)
+        cache.set_many({_timeline_key(generation, block_number): built[block_number] for block_number in missing},
+                       _timeout())
+        timelines.update(built)
+    return JigCalendar.from_timelines({block_number: timelines[block_number] for block_number in jigs})
+
+
+def invalidate_jig_calendar():
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def update_jig_calendar(section, deleted=False):
+    """分段保存/删除后使其所在胎架（及原胎架）的缓存失效，下次读取时只重建这些胎架
+
+    不在缓存中读取-修改-写回，并发保存时不会互相覆盖。
+    """
+    loaded = getattr(section, '_loaded_block_number', None)
+    block_numbers = {section.block_number, loaded} - {None, ''}
+    # 新增、删除或更换胎架时胎架列表可能变化
+    jigs_changed = deleted or section.block_number != loaded
+
+    def forget():
+        generation = _generation()
+        keys = [_timeline_key(generation, block_number) for block_number in block_numbers]
+        if jigs_changed:
+            keys.append(_jigs_key(generation))
+        cache.delete_many(keys)
+
+    forget()
+    # 在事务中保存时，提交前其他请求可能按旧数据重建了缓存，提交后再清除一次
+    transaction.on_commit(forget)
+
+
+def check_jig_available(block_number, on_block_date, off_block_date, exclude_id=None):
+    """校验胎架在上胎~下胎期间未被其他启用的分段占用，冲突时抛出 ValueError"""
+    if not block_number or not on_block_date or not off_block_date:
+        return
+    if off_block_date < on_block_date:
+        raise ValueError('下胎日期不能早于上胎日期')
+    timeline = get_jig_timeline(block_number)
+    if timeline.is_free(on_block_date, off_block_date):
+        return
+    conflicts = timeline.conflicts(on_block_date, off_block_date, exclude_id)
+    if conflicts:
+        detail = '、'.join(
+            f'{number}（{start:%Y-%m-%d}~{end:%Y-%m-%d}）' for _, number, start, end in conflicts[:5]
+        )
+        more = f'等{len(conflicts)}个分段' if len(conflicts) > 5 else ''
+        raise ValueError(f'胎架{block_number}在该期间已被占用：{detail}{more}')
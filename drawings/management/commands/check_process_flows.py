@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from drawings.flow_validation import check_process_flows
+from drawings.models import StandardProcessFlow
+from drawings.process_flow import store_topo_order
+
+
+class Command(BaseCommand):
+    help = '检查全部标准工艺流程的前置关系：循环依赖、跨流程/自引用前置步骤、并行组冲突'
+
+    KIND_LABELS = {
+        'cycle': '循环依赖',
+        'orphan': '无效前置',
+        'parallel_group': '并行组冲突',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flow', type=int, action='append', dest='flow_ids',
+                            help='只检查指定ID的工艺流程（可重复）')
+        parser.add_argument('--fix-order', action='store_true',
+                            help='为无循环的流程重建步骤拓扑序号')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始检查标准工艺流程...')
+        issues, orders = check_process_flows(options['flow_ids'])
+
+        names = dict(StandardProcessFlow.objects.values_list('id', 'name'))
+        for issue in issues:
+            self.stdout.write(self.style.WARNING(
+                f'✗ [{self.KIND_LABELS[issue.kind]}] {names.get(issue.process_flow_id)}：{issue.message}'
+            ))
+
+        if options['fix_order']:
+            updated = sum(store_topo_order(steps, order) for steps, order in orders.values())
+            self.stdout.write(self.style.SUCCESS(f'✓ 重建步骤拓扑序号: {updated} 个'))
+
+        if issues:
+            flows = len({issue.process_flow_id for issue in issues})
+            self.stdout.write(self.style.WARNING(f'共发现 {len(issues)} 个问题，涉及 {flows} 个工艺流程'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ 检查完成，{len(orders)} 个工艺流程均未发现问题'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from drawings.material_requirements import refresh_material_requirements
+from drawings.models import Pallet
+from drawings.pallet_items import sync_pallet_items
+
+
+class Command(BaseCommand):
+    help = '按托盘明细文本重建全部托盘的明细条目（分批处理），并重算物料需求汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每批处理的托盘数（默认2000）')
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        total = Pallet.objects.count()
+        self.stdout.write(f'开始重建托盘明细条目（共 {total} 个托盘）...')
+
+        # 按ID分批（WHERE id > 上一批最后的ID），每批一次读取、一次删除、一次批量插入
+        last_id = 0
+        processed = items = 0
+        while True:
+            chunk = list(
+                Pallet.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'pallet_details')[:chunk_size]
+            )
+            if not chunk:
+                break
+            items += sync_pallet_items(chunk)
+            processed += len(chunk)
+            last_id = chunk[-1][0]
+            self.stdout.write(f'已处理 {processed}/{total} 个托盘')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ 重建托盘明细条目: {processed} 个托盘，{items} 条明细'))
+
+        rows = refresh_material_requirements()
+        self.stdout.write(self.style.SUCCESS(f'✓ 重算物料需求汇总: {rows} 条'))
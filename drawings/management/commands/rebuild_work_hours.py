@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from drawings.process_flow import reconcile_flow_hours
+from drawings.work_hours import propagate_work_type_hours
+
+
+class Command(BaseCommand):
+    help = '全量重算作业工序工时、工艺流程步骤预估工时和标准工艺流程总工时'
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重算工时数据...')
+
+        # 工序工时 -> 沿用工序工时的步骤
+        updated_processes, updated_steps, _ = propagate_work_type_hours()
+        self.stdout.write(self.style.SUCCESS(f'✓ 重算作业工序工时: {updated_processes} 个'))
+        self.stdout.write(self.style.SUCCESS(f'✓ 同步工艺流程步骤预估工时: {updated_steps} 个'))
+
+        # 全部流程总工时以聚合结果为准
+        reconcile_flow_hours()
+        self.stdout.write(self.style.SUCCESS('✓ 校正标准工艺流程总工时和关键路径工时'))
+
+        self.stdout.write(self.style.SUCCESS('工时数据重算完成！'))
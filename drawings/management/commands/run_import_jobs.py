@@ -0,0 +1,81 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# 以下两个函数在 worker 进程中执行。本模块不能在顶层导入模型：
+# spawn 方式的子进程先导入本模块、再运行初始化函数
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _run_job(job_id):
+    from drawings.import_jobs import run_import_job
+    return run_import_job(job_id)
+
+
+class Command(BaseCommand):
+    help = '处理排队中的后台导入任务（进程池执行，无需消息队列）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='并行处理的任务数（默认2）')
+        parser.add_argument('--interval', type=float, default=3, help='轮询间隔秒数（默认3）')
+        parser.add_argument('--once', action='store_true', help='处理完当前排队的任务后退出')
+        parser.add_argument('--stale-timeout', type=int, default=None,
+                            help='导入中的任务超过该秒数未更新视为中断（默认取 IMPORT_JOB_STALE_TIMEOUT，30分钟）')
+
+    def handle(self, *args, **options):
+        from drawings.import_jobs import claim_job, fail_job, pending_job_ids, recover_stale_jobs, requeue_job
+
+        workers = max(options['workers'], 1)
+        interval = options['interval']
+        self.stdout.write(f'导入任务处理进程已启动（{workers} 个 worker）...')
+
+        # 上次 worker 异常退出时遗留的导入中任务：可重复执行的重新排队，其余标记为失败
+        requeued, failed = recover_stale_jobs(options['stale_timeout'])
+        if requeued or failed:
+            self.stdout.write(self.style.WARNING(
+                f'回收中断的导入任务：重新排队 {requeued} 个，标记失败 {failed} 个'))
+
+        # 使用 spawn 而非 fork：子进程不继承父进程的数据库连接，Windows 上行为也一致
+        context = multiprocessing.get_context('spawn')
+        running = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            try:
+                while True:
+                    for future in [future for future in running if future.done()]:
+                        job_id = running.pop(future)
+                        try:
+                            status = future.result()
+                        except Exception as e:
+                            fail_job(job_id, f'导入进程异常：{e}')
+                            self.stdout.write(self.style.ERROR(f'✗ 导入任务 {job_id} 异常：{e}'))
+                            continue
+                        if status == 'success':
+                            self.stdout.write(self.style.SUCCESS(f'✓ 导入任务 {job_id} 已完成'))
+                        else:
+                            self.stdout.write(self.style.WARNING(f'✗ 导入任务 {job_id} 失败'))
+
+                    capacity = workers - len(running)
+                    pending = pending_job_ids(capacity) if capacity else []
+                    for job_id in pending:
+                        if claim_job(job_id):
+                            self.stdout.write(f'开始处理导入任务 {job_id}')
+                            try:
+                                running[pool.submit(_run_job, job_id)] = job_id
+                            except BrokenProcessPool:
+                                requeue_job(job_id)
+                                raise CommandError('worker 进程异常退出，请检查日志后重新启动')
+
+                    if options['once'] and not running and not pending:
+                        break
+                    if running:
+                        wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(interval)
+            except KeyboardInterrupt:
+                self.stdout.write('正在等待进行中的任务完成...')
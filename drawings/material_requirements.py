@@ -0,0 +1,128 @@
+"""物料需求周汇总
+
+按托盘明细条目汇总每个项目每周需要的零件数量，结果预先写入 MaterialRequirement 表，
+报表和导出直接读取汇总表，不在请求时解析托盘明细或聚合托盘。
+
+需求日期取托盘的需求日期，未填写时取所属分段的计划开始时间；需求周为该日期所在周的周一。
+只统计启用的托盘，已接收托盘的数量同时计入已接收数量。
+
+汇总按 (项目, 需求周) 为单位增量刷新：托盘保存/删除时刷新托盘变化前后所在的周，
+分段计划开始时间变化时刷新有未填需求日期托盘的项目。每次刷新先删除这些周的汇总行，
+再用一次分组查询（按项目、日期、零件）重新计算后批量插入。
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import MaterialRequirement, Pallet, PalletItem, Section
+
+REQUIREMENT_DATE = Coalesce('pallet__required_date', 'pallet__section__planned_start_date')
+
+
+def week_start(day):
+    """日期所在周的周一"""
+    return day - timedelta(days=day.weekday())
+
+
+def pallet_bucket(project_id, section_id, required_date):
+    """托盘所在的 (项目ID, 需求周)，分段已不存在时返回 None"""
+    if required_date is None:
+        required_date = Section.objects.filter(pk=section_id).values_list('planned_start_date', flat=True).first()
+        if required_date is None:
+            return None
+    return project_id, week_start(required_date)
+
+
+def pallet_buckets(pallet_ids):
+    """托盘当前所在的 (项目ID, 需求周) 集合（一次查询，供批量写入托盘后刷新）"""
+    if not pallet_ids:
+        return set()
+    rows = (
+        Pallet.objects.filter(pk__in=pallet_ids)
+        .annotate(requirement_date=Coalesce('required_date', 'section__planned_start_date'))
+        .values_list('project_id', 'requirement_date')
+    )
+    return {(project_id, week_start(day)) for project_id, day in rows}
+
+
+def _aggregate(items):
+    """按 (项目, 需求周, 零件编码, 类别) 汇总明细条目
+
+    数据库按日期分组，再在内存中合并为周，避免依赖各数据库不同的周函数。
+    """
+    rows = (
+        items.filter(pallet__is_active=True)
+        .values('pallet__project_id', 'requirement_date', 'part_code', 'kind')
+        .annotate(
+            required=Sum('quantity'),
+            received=Sum('quantity', filter=Q(pallet__is_received=True)),
+            pallets=Count('pallet_id'),
+        )
+        .order_by()
+    )
+    totals = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        total = totals[(row['pallet__project_id'], week_start(row['requirement_date']), row['part_code'], row['kind'])]
+        total[0] += row['required']
+        total[1] += row['received'] or 0
+        total[2] += row['pallets']
+    return totals
+
+
+def refresh_material_requirements(buckets=None, project_ids=None):
+    """重算物料需求汇总
+
+    buckets 为 [(项目ID, 需求周), ...]，project_ids 为整项目重算，两者都为空时全部重算。
+    """
+    items = PalletItem.objects.annotate(requirement_date=REQUIREMENT_DATE)
+    existing = MaterialRequirement.objects.all()
+    keep = None
+    if buckets is not None or project_ids is not None:
+        weeks = defaultdict(set)
+        for bucket in buckets or ():
+            if bucket:
+                weeks[bucket[0]].add(bucket[1])
+        for project_id in project_ids or ():
+            weeks[project_id] = None
+        if not weeks:
+            return 0
+        item_filter, existing_filter = Q(), Q()
+        for project_id, project_weeks in weeks.items():
+            if project_weeks is None:
+                item_filter |= Q(pallet__project_id=project_id)
+                existing_filter |= Q(project_id=project_id)
+            else:
+                # 每个项目只查一个日期范围，范围内不需要刷新的周在合并结果时丢弃
+                item_filter |= Q(pallet__project_id=project_id,
+                                 requirement_date__range=(min(project_weeks), max(project_weeks) + timedelta(days=6)))
+                existing_filter |= Q(project_id=project_id, week_start__in=project_weeks)
+        items = items.filter(item_filter)
+        existing = existing.filter(existing_filter)
+        keep = weeks
+
+    totals = _aggregate(items)
+    rows = [
+        MaterialRequirement(
+            project_id=project_id, week_start=week, part_code=part_code, kind=kind,
+            required_quantity=required, received_quantity=received, pallet_count=pallets,
+        )
+        for (project_id, week, part_code, kind), (required, received, pallets) in totals.items()
+        if keep is None or keep[project_id] is None or week in keep[project_id]
+    ]
+    with transaction.atomic():
+        existing.delete()
+        MaterialRequirement.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def refresh_section_requirements(section_ids):
+    """分段计划开始时间变化后，重算有未填需求日期托盘的项目"""
+    project_ids = set(
+        Pallet.objects.filter(section_id__in=section_ids, required_date__isnull=True, is_active=True)
+        .values_list('project_id', flat=True)
+    )
+    if project_ids:
+        refresh_material_requirements(project_ids=project_ids)
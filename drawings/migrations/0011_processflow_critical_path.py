@@ -0,0 +1,128 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:35
+
+from collections import deque
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def _dependency_graph(steps, edges):
+    """依赖图快照（与迁移时的 process_flow.build_dependency_graph 相同）
+
+    返回 (durations, predecessors)，虚拟阶段节点使用负数ID，工期为 0。
+    """
+    durations = {}
+    predecessors = {}
+    for step in steps:
+        durations[step['id']] = Decimal(step['estimated_hours'] or 0)
+        predecessors[step['id']] = []
+
+    explicit = {}
+    for step_id, prerequisite_id in edges:
+        if step_id in durations and prerequisite_id in durations and step_id != prerequisite_id:
+            explicit.setdefault(step_id, []).append(prerequisite_id)
+
+    # 连续且并行组号相同（非0）的步骤属于同一阶段
+    stages = []
+    for step in steps:
+        group = step['parallel_group']
+        if stages and group and stages[-1][0] == group:
+            stages[-1][1].append(step['id'])
+        else:
+            stages.append((group, [step['id']]))
+
+    previous_barrier = None
+    for index, (group, stage_step_ids) in enumerate(stages):
+        for step_id in stage_step_ids:
+            if step_id in explicit:
+                predecessors[step_id] = explicit[step_id]
+            elif previous_barrier is not None:
+                predecessors[step_id] = [previous_barrier]
+        if index < len(stages) - 1:
+            barrier = -(index + 1)
+            durations[barrier] = Decimal('0')
+            predecessors[barrier] = list(stage_step_ids)
+            previous_barrier = barrier
+    return durations, predecessors
+
+
+def _topological_order(predecessors):
+    """Kahn 拓扑排序，存在环时返回 None"""
+    successors = {node: [] for node in predecessors}
+    in_degree = {node: len(preds) for node, preds in predecessors.items()}
+    for node, preds in predecessors.items():
+        for pred in preds:
+            successors[pred].append(node)
+
+    queue = deque(node for node, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for succ in successors[node]:
+            in_degree[succ] -= 1
+            if in_degree[succ] == 0:
+                queue.append(succ)
+    return order if len(order) == len(predecessors) else None
+
+
+def forwards(apps, schema_editor):
+    """去除对称关系遗留的反向前置记录，并计算已有流程的关键路径工时
+
+    使用历史模型和迁移内的算法快照，不依赖当前的 drawings.process_flow。
+    """
+    ProcessFlowStep = apps.get_model('drawings', 'ProcessFlowStep')
+    StandardProcessFlow = apps.get_model('drawings', 'StandardProcessFlow')
+    through = ProcessFlowStep.prerequisites.through
+
+    step_orders = dict(ProcessFlowStep.objects.values_list('id', 'step_order'))
+    reversed_ids = [
+        row_id for row_id, step_id, prerequisite_id in through.objects.values_list(
+            'id', 'from_processflowstep_id', 'to_processflowstep_id')
+        if step_orders.get(prerequisite_id, 0) > step_orders.get(step_id, 0)
+    ]
+    through.objects.filter(id__in=reversed_ids).delete()
+
+    for flow_id in StandardProcessFlow.objects.values_list('id', flat=True):
+        steps = list(
+            ProcessFlowStep.objects.filter(process_flow_id=flow_id)
+            .order_by('step_order', 'parallel_group', 'id')
+            .values('id', 'step_order', 'parallel_group', 'estimated_hours')
+        )
+        edges = list(
+            through.objects.filter(from_processflowstep__process_flow_id=flow_id)
+            .values_list('from_processflowstep_id', 'to_processflowstep_id')
+        )
+        durations, predecessors = _dependency_graph(steps, edges)
+        order = _topological_order(predecessors)
+        if order is None:
+            continue
+        earliest_finish = {}
+        for node in order:
+            start = max((earliest_finish[pred] for pred in predecessors[node]), default=Decimal('0'))
+            earliest_finish[node] = start + durations[node]
+        StandardProcessFlow.objects.filter(id=flow_id).update(
+            estimated_total_hours=sum((durations[step['id']] for step in steps), Decimal('0')),
+            critical_path_hours=max(earliest_finish.values(), default=Decimal('0')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0010_standardprocessflow_processflowstep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='standardprocessflow',
+            name='critical_path_hours',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='考虑并行组和前置步骤后的最短完工工时', max_digits=10, verbose_name='关键路径工时'),
+        ),
+        migrations.AlterField(
+            model_name='processflowstep',
+            name='prerequisites',
+            field=models.ManyToManyField(blank=True, help_text='必须在此步骤之前完成的步骤', related_name='successors', to='drawings.processflowstep', verbose_name='前置步骤'),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0011_processflow_critical_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionWorkOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estimated_total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='预估总工时')),
+                ('critical_path_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='关键路径工时')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('process_flow', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='drawings.standardprocessflow', verbose_name='标准工艺流程')),
+                ('section', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='work_order', to='drawings.section', verbose_name='分段')),
+            ],
+            options={
+                'verbose_name': '分段作业工单',
+                'verbose_name_plural': '分段作业工单',
+                'ordering': ['section'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SectionWorkStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step_name', models.CharField(max_length=100, verbose_name='步骤名称')),
+                ('step_order', models.PositiveIntegerField(verbose_name='步骤顺序')),
+                ('parallel_group', models.PositiveIntegerField(default=0, verbose_name='并行组号')),
+                ('estimated_hours', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='预估工时')),
+                ('status', models.CharField(choices=[('pending', '未开始'), ('in_progress', '进行中'), ('completed', '已完成')], default='pending', max_length=20, verbose_name='状态')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('flow_step', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='drawings.processflowstep', verbose_name='标准流程步骤')),
+                ('work_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='drawings.sectionworkorder', verbose_name='所属工单')),
+                ('work_process', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='drawings.workprocess', verbose_name='作业工序')),
+            ],
+            options={
+                'verbose_name': '分段作业工单步骤',
+                'verbose_name_plural': '分段作业工单步骤',
+                'ordering': ['work_order', 'step_order', 'parallel_group'],
+                'unique_together': {('work_order', 'step_order')},
+            },
+        ),
+    ]
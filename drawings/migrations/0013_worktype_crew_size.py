@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0012_sectionworkorder_sectionworkstep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worktype',
+            name='crew_size',
+            field=models.PositiveIntegerField(default=1, help_text='用于作业排程，每日产能 = 班组人数 × 标准作业工时', verbose_name='班组人数'),
+        ),
+    ]
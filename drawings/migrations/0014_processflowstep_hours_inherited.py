@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:43
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def forwards(apps, schema_editor):
+    """修复此前未保存的作业工序工时，并标记沿用工序工时的步骤"""
+    WorkType = apps.get_model('drawings', 'WorkType')
+    WorkProcess = apps.get_model('drawings', 'WorkProcess')
+    ProcessFlowStep = apps.get_model('drawings', 'ProcessFlowStep')
+
+    WorkProcess.objects.filter(work_type__isnull=False).update(
+        work_hours=Subquery(WorkType.objects.filter(pk=OuterRef('work_type_id')).values('standard_hours')[:1])
+        * F('coefficient')
+    )
+    ProcessFlowStep.objects.filter(estimated_hours=F('work_process__work_hours')).update(hours_inherited=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0013_worktype_crew_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processflowstep',
+            name='hours_inherited',
+            field=models.BooleanField(default=False, help_text='预估工时取自作业工序，工种标准工时调整后自动同步', verbose_name='沿用工序工时'),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0014_processflowstep_hours_inherited'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processflowstep',
+            name='hours_max',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='最长工时'),
+        ),
+        migrations.AddField(
+            model_name='processflowstep',
+            name='hours_min',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='最短工时'),
+        ),
+        migrations.AddField(
+            model_name='processflowstep',
+            name='hours_mode',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='最可能工时'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:48
+
+from collections import deque
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def _dependency_graph(steps, edges):
+    """依赖图快照（与迁移时的 process_flow.build_dependency_graph 相同）
+
+    返回 (durations, predecessors)，虚拟阶段节点使用负数ID，工期为 0。
+    """
+    durations = {}
+    predecessors = {}
+    for step in steps:
+        durations[step['id']] = Decimal(step['estimated_hours'] or 0)
+        predecessors[step['id']] = []
+
+    explicit = {}
+    for step_id, prerequisite_id in edges:
+        if step_id in durations and prerequisite_id in durations and step_id != prerequisite_id:
+            explicit.setdefault(step_id, []).append(prerequisite_id)
+
+    # 连续且并行组号相同（非0）的步骤属于同一阶段
+    stages = []
+    for step in steps:
+        group = step['parallel_group']
+        if stages and group and stages[-1][0] == group:
+            stages[-1][1].append(step['id'])
+        else:
+            stages.append((group, [step['id']]))
+
+    previous_barrier = None
+    for index, (group, stage_step_ids) in enumerate(stages):
+        for step_id in stage_step_ids:
+            if step_id in explicit:
+                predecessors[step_id] = explicit[step_id]
+            elif previous_barrier is not None:
+                predecessors[step_id] = [previous_barrier]
+        if index < len(stages) - 1:
+            barrier = -(index + 1)
+            durations[barrier] = Decimal('0')
+            predecessors[barrier] = list(stage_step_ids)
+            previous_barrier = barrier
+    return durations, predecessors
+
+
+def _topological_order(predecessors):
+    """Kahn 拓扑排序，存在环时返回 None"""
+    successors = {node: [] for node in predecessors}
+    in_degree = {node: len(preds) for node, preds in predecessors.items()}
+    for node, preds in predecessors.items():
+        for pred in preds:
+            successors[pred].append(node)
+
+    queue = deque(node for node, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for succ in successors[node]:
+            in_degree[succ] -= 1
+            if in_degree[succ] == 0:
+                queue.append(succ)
+    return order if len(order) == len(predecessors) else None
+
+
+def forwards(apps, schema_editor):
+    """按依赖图为已有流程的步骤编排拓扑序号（存在循环的流程保持未计算）
+
+    使用历史模型和迁移内的算法快照，不依赖当前的 drawings.process_flow。
+    """
+    ProcessFlowStep = apps.get_model('drawings', 'ProcessFlowStep')
+    through = ProcessFlowStep.prerequisites.through
+
+    for flow_id in ProcessFlowStep.objects.values_list('process_flow_id', flat=True).distinct():
+        steps = list(
+            ProcessFlowStep.objects.filter(process_flow_id=flow_id)
+            .order_by('step_order', 'parallel_group', 'id')
+            .values('id', 'step_order', 'parallel_group', 'estimated_hours')
+        )
+        edges = list(
+            through.objects.filter(from_processflowstep__process_flow_id=flow_id)
+            .values_list('from_processflowstep_id', 'to_processflowstep_id')
+        )
+        order = _topological_order(_dependency_graph(steps, edges)[1])
+        if order is None:
+            continue
+        ProcessFlowStep.objects.bulk_update(
+            [ProcessFlowStep(id=node, topo_index=index)
+             for index, node in enumerate((node for node in order if node > 0), start=1)],
+            ['topo_index'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0015_processflowstep_hours_distribution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processflowstep',
+            name='topo_index',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='步骤在流程依赖图中的拓扑顺序（从1开始，0表示未计算），用于增量校验前置关系', verbose_name='拓扑序号'),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0016_processflowstep_topo_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['project', 'on_block_date', 'off_block_date'], name='section_project_block_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:56
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+def forwards(apps, schema_editor):
+    """按托盘表回填已有分段的齐套字段（与 readiness.refresh_section_readiness 一致）"""
+    Section = apps.get_model('drawings', 'Section')
+    Pallet = apps.get_model('drawings', 'Pallet')
+
+    def pallet_count(**filters):
+        return Coalesce(
+            Subquery(
+                Pallet.objects.filter(section=OuterRef('pk'), is_active=True, **filters)
+                .order_by().values('section').annotate(total=Count('id')).values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    pending = Pallet.objects.filter(section=OuterRef('pk'), is_active=True, is_received=False)
+    Section.objects.update(
+        pallet_count=pallet_count(),
+        pending_pallet_count=pallet_count(is_received=False),
+        is_ready=Case(
+            When(Q(model_received=True, bom_received=True, start_conditions_met=True) & ~Exists(pending),
+                 then=Value(True)),
+            default=Value(False),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0017_section_project_block_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='is_ready',
+            field=models.BooleanField(default=False, editable=False, help_text='模型、BOM已接收，满足开工条件且托盘全部接收', verbose_name='齐套可开工'),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='pallet_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='托盘数'),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='pending_pallet_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='未接收托盘数'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['is_ready', 'planned_start_date'], name='section_ready_idx'),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0018_section_readiness'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('section', '分段导入')], max_length=20, verbose_name='导入类型')),
+                ('file_path', models.CharField(max_length=500, verbose_name='文件路径')),
+                ('original_name', models.CharField(max_length=255, verbose_name='原文件名')),
+                ('upsert', models.BooleanField(default=False, verbose_name='新增并更新')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '导入中'), ('success', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='预计行数')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='已处理行数')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='新增数')),
+                ('updated_count', models.PositiveIntegerField(default=0, verbose_name='更新数')),
+                ('unchanged_count', models.PositiveIntegerField(default=0, verbose_name='无变化数')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='错误行数')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='错误明细')),
+                ('message', models.TextField(blank=True, default='', verbose_name='失败原因')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': '导入任务',
+                'verbose_name_plural': '导入任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='import_job_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0019_import_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['on_block_date', 'id'], name='section_timeline_idx'),
+        ),
+    ]
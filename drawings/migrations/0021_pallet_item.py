@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0020_section_timeline_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PalletItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_code', models.CharField(max_length=100, verbose_name='零件编码')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='数量')),
+                ('kind', models.CharField(choices=[('part', '零部件'), ('outfitting', '舾装件')], default='part', max_length=20, verbose_name='类别')),
+                ('pallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='drawings.pallet', verbose_name='所属托盘')),
+            ],
+            options={
+                'verbose_name': '托盘明细条目',
+                'verbose_name_plural': '托盘明细条目',
+                'ordering': ['pallet', 'id'],
+                'indexes': [models.Index(fields=['part_code', 'pallet'], name='pallet_item_part_idx')],
+                'unique_together': {('pallet', 'part_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0021_pallet_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialRequirement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(help_text='该周的周一', verbose_name='需求周')),
+                ('part_code', models.CharField(max_length=100, verbose_name='零件编码')),
+                ('kind', models.CharField(choices=[('part', '零部件'), ('outfitting', '舾装件')], default='part', max_length=20, verbose_name='类别')),
+                ('required_quantity', models.PositiveIntegerField(default=0, verbose_name='需求数量')),
+                ('received_quantity', models.PositiveIntegerField(default=0, verbose_name='已接收数量')),
+                ('pallet_count', models.PositiveIntegerField(default=0, verbose_name='托盘数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='drawings.project', verbose_name='所属项目')),
+            ],
+            options={
+                'verbose_name': '物料需求汇总',
+                'verbose_name_plural': '物料需求汇总',
+                'ordering': ['week_start', 'project', 'part_code'],
+                'indexes': [models.Index(fields=['week_start', 'project'], name='material_req_week_idx')],
+                'unique_together': {('project', 'week_start', 'part_code', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0022_material_requirement'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=[('section', '分段导入'), ('pallet', '托盘导入')], max_length=20, verbose_name='导入类型'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0023_import_job_pallet_kind'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pallet',
+            index=models.Index(fields=['is_received', 'required_date', 'section'], name='pallet_due_idx'),
+        ),
+    ]
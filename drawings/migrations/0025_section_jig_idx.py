@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0024_pallet_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['block_number', 'on_block_date'], name='section_jig_idx'),
+        ),
+    ]
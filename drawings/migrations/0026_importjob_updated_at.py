@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0025_section_jig_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新时间'),
+        ),
+    ]
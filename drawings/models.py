@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from decimal import Decimal, InvalidOperation
 
 # Create your models here.
@@ -158,6 +158,7 @@ class WorkType(models.Model):
     work_type_name = models.CharField(max_length=100, verbose_name='作业工种名称', unique=True)
     work_type_code = models.CharField(max_length=20, verbose_name='作业工种编码', unique=True)
     standard_hours = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='标准作业工时')
+    crew_size = models.PositiveIntegerField(default=1, verbose_name='班组人数', help_text='用于作业排程，每日产能 = 班组人数 × 标准作业工时')
     description = models.TextField(verbose_name='工种描述', blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -193,20 +194,19 @@ class WorkProcess(models.Model):
         return f"{self.process_name} ({self.process_code})"
 
     def save(self, *args, **kwargs):
-        # 自动计算作业工时 = 标准工时 * 系数
-        if self.work_type and self.coefficient:
+        # 自动计算作业工时 = 标准工时 * 系数（批量重算见 work_hours.propagate_work_type_hours）
+        self.work_hours = None
+        if self.work_type and self.coefficient is not None:
             try:
                 # 确保 standard_hours 是 Decimal 类型，即使它被错误地保存为其他类型
                 standard_hours_decimal = Decimal(str(self.work_type.standard_hours))
                 
                 # 执行乘法运算
-                self.work_hours = standard_hours_decimal * self.coefficient
+                self.work_hours = (standard_hours_decimal * Decimal(str(self.coefficient))).quantize(Decimal('0.01'))
 
             except (InvalidOperation, TypeError, ValueError) as e:
-                # 捕获可能的类型转换错误,Value:
-              print(f"Error calculating work hours: {e}")
-                # 可以在这里记录日志或者抛出更友好的异常
-        self.work_hours = None # 或者设置为一个默认值
+                # 捕获可能的类型转换错误
+                print(f"Error calculating work hours: {e}")
 
         super().save(*args, **kwargs)
 
@@ -235,6 +235,19 @@ class Project(models.Model):
         return self.delivery_date.year if self.delivery_date else None
 
 
+class SectionQuerySet(models.QuerySet):
+    def overlapping(self, start=None, end=None):
+        """在 [start, end] 期间（含首尾）在胎的分段：上胎日期 <= end 且 下胎日期 >= start
+
+        只给出一端时按单侧条件筛选。
+        """
+        if end:
+            self = self.filter(on_block_date__lte=end)
+        if start:
+            self = self.filter(off_block_date__gte=start)
+        return self
+
+
 class Section(models.Model):
     """分段管理表"""
     section_number = models.CharField(max_length=50, verbose_name='分段号', unique=True)
@@ -248,14 +261,31 @@ class Section(models.Model):
     model_received = models.BooleanField(default=False, verbose_name='模型接收')
     bom_received = models.BooleanField(default=False, verbose_name='BOM接收')
     start_conditions_met = models.BooleanField(default=False, verbose_name='满足开工条件')
+    # 齐套状态冗余字段，由分段/托盘保存和删除的信号维护（见 readiness.refresh_section_readiness）
+    pallet_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='托盘数')
+    pending_pallet_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='未接收托盘数')
+    is_ready = models.BooleanField(default=False, editable=False, verbose_name='齐套可开工',
+                                   help_text='模型、BOM已接收，满足开工条件且托盘全部接收')
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
+    objects = SectionQuerySet.as_manager()
+
     class Meta:
         verbose_name = '分段管理'
         verbose_name_plural = '分段管理'
         ordering = ['-created_at']
+        indexes = [
+            # 按项目筛选在胎区间（overlapping）
+            models.Index(fields=['project', 'on_block_date', 'off_block_date'], name='section_project_block_idx'),
+            # 按齐套状态筛选近期可开工的分段
+            models.Index(fields=['is_ready', 'planned_start_date'], name='section_ready_idx'),
+            # 时间轴按 (上胎日期, ID) 键集分页
+            models.Index(fields=['on_block_date', 'id'], name='section_timeline_idx'),
+            # 按胎架重建占用日历
+            models.Index(fields=['block_number', 'on_block_date'], name='section_jig_idx'),
+        ]
 
     def __str__(self):
         return f"{self.section_number} - {self.project.project_name}"
@@ -267,6 +297,17 @@ class Section(models.Model):
             return (self.off_block_date - self.on_block_date).days
         return 0
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录读取时的计划开始时间，变化时刷新未填需求日期托盘的物料需求汇总
+        if 'planned_start_date' in field_names:
+            instance._loaded_planned_start_date = instance.planned_start_date
+        # 记录读取时的胎架号，更换胎架时原胎架的占用日历缓存也需失效
+        if 'block_number' in field_names:
+            instance._loaded_block_number = instance.block_number
+        return instance
+
 
 class Pallet(models.Model):
     """托盘管理表"""
@@ -285,10 +326,83 @@ class Pallet(models.Model):
         verbose_name = '托盘管理'
         verbose_name_plural = '托盘管理'
         ordering = ['-created_at']
+        indexes = [
+            # 未接收托盘按需求日期筛选（逾期托盘报表），带上分段ID以便直接关联分段
+            models.Index(fields=['is_received', 'required_date', 'section'], name='pallet_due_idx'),
+        ]
 
     def __str__(self):
         return f"{self.pallet_name} - {self.project.project_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录读取时的所属分段，托盘改挂其他分段时两个分段的齐套状态都需刷新
+        if 'section_id' in field_names:
+            instance._loaded_section_id = instance.section_id
+        # 记录读取时的托盘明细，明细未变化时保存不重建明细条目
+        if 'pallet_details' in field_names:
+            instance._loaded_pallet_details = instance.pallet_details
+        # 记录读取时的项目和需求日期，用于刷新原需求周的物料需求汇总
+        if {'project_id', 'required_date'} <= set(field_names):
+            instance._loaded_requirement = (instance.project_id, instance.section_id, instance.required_date)
+        return instance
+
+
+class PalletItem(models.Model):
+    """托盘明细条目表（由托盘明细文本解析生成，见 pallet_items.py）"""
+    KIND_CHOICES = [
+        ('part', '零部件'),
+        ('outfitting', '舾装件'),
+    ]
+
+    pallet = models.ForeignKey(Pallet, on_delete=models.CASCADE, related_name='items', verbose_name='所属托盘')
+    part_code = models.CharField(max_length=100, verbose_name='零件编码')
+    quantity = models.PositiveIntegerField(default=1, verbose_name='数量')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='part', verbose_name='类别')
+
+    class Meta:
+        verbose_name = '托盘明细条目'
+        verbose_name_plural = '托盘明细条目'
+        unique_together = ['pallet', 'part_code']
+        ordering = ['pallet', 'id']
+        indexes = [
+            # "哪些托盘包含零件 c2" 按编码等值查询
+            models.Index(fields=['part_code', 'pallet'], name='pallet_item_part_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.part_code} x{self.quantity}"
+
+
+class MaterialRequirement(models.Model):
+    """物料需求周汇总表（按托盘明细条目预计算，见 material_requirements.py）"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, verbose_name='所属项目')
+    week_start = models.DateField(verbose_name='需求周', help_text='该周的周一')
+    part_code = models.CharField(max_length=100, verbose_name='零件编码')
+    kind = models.CharField(max_length=20, choices=PalletItem.KIND_CHOICES, default='part', verbose_name='类别')
+    required_quantity = models.PositiveIntegerField(default=0, verbose_name='需求数量')
+    received_quantity = models.PositiveIntegerField(default=0, verbose_name='已接收数量')
+    pallet_count = models.PositiveIntegerField(default=0, verbose_name='托盘数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '物料需求汇总'
+        verbose_name_plural = '物料需求汇总'
+        unique_together = ['project', 'week_start', 'part_code', 'kind']
+        ordering = ['week_start', 'project', 'part_code']
+        indexes = [
+            models.Index(fields=['week_start', 'project'], name='material_req_week_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.week_start} {self.part_code} x{self.required_quantity}"
+
+    @property
+    def outstanding_quantity(self):
+        """未接收数量"""
+        return self.required_quantity - self.received_quantity
+
 
 class StandardProcessFlow(models.Model):
     """标准工艺流程表"""
@@ -296,7 +410,10 @@ class StandardProcessFlow(models.Model):
     ship_type = models.ForeignKey(ShipType, on_delete=models.CASCADE, verbose_name='船型')
     typical_section = models.ForeignKey(TypicalSection, on_delete=models.CASCADE, verbose_name='典型分段')
     description = models.TextField(verbose_name='工艺流程描述', blank=True, null=True)
+    # 总工时随步骤的增删改增量维护（见 process_flow.apply_step_hours_change），保存流程基本信息时不再重算
     estimated_total_hours = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='预估总工时', default=0)
+    critical_path_hours = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='关键路径工时', default=0,
+                                              help_text='考虑并行组和前置步骤后的最短完工工时')
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
@@ -310,14 +427,6 @@ class StandardProcessFlow(models.Model):
     def __str__(self):
         return f"{self.ship_type.ship_type} - {self.typical_section.section_name} - {self.name}"
 
-    def save(self, *args, **kwargs):
-        # 自动计算预估总工时
-        total_hours = sum(
-            step.estimated_hours for step in self.processflowstep_set.all()
-        )
-        self.estimated_total_hours = total_hours
-        super().save(*args, **kwargs)
-
 
 class ProcessFlowStep(models.Model):
     """工艺流程步骤表"""
@@ -333,8 +442,16 @@ class ProcessFlowStep(models.Model):
     parallel_group = models.PositiveIntegerField(verbose_name='并行组号', default=0, 
                                                help_text='相同组号的步骤可以并行执行，0表示顺序执行')
     estimated_hours = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='预估工时')
-    prerequisites = models.ManyToManyField('self', blank=True, verbose_name='前置步骤',
-                                         help_text='必须在此步骤之前完成的步骤')
+    hours_inherited = models.BooleanField(default=False, verbose_name='沿用工序工时',
+                                          help_text='预估工时取自作业工序，工种标准工时调整后自动同步')
+    # 工时三角分布（可选），用于蒙特卡洛工期模拟；未填写时按预估工时取定值
+    hours_min = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='最短工时', blank=True, null=True)
+    hours_mode = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='最可能工时', blank=True, null=True)
+    hours_max = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='最长工时', blank=True, null=True)
+    prerequisites = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='successors',
+                                         verbose_name='前置步骤', help_text='必须在此步骤之前完成的步骤')
+    topo_index = models.PositiveIntegerField(default=0, verbose_name='拓扑序号', editable=False,
+                                             help_text='步骤在流程依赖图中的拓扑顺序（从1开始，0表示未计算），用于增量校验前置关系')
     description = models.TextField(verbose_name='步骤描述', blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -349,8 +466,147 @@ class ProcessFlowStep(models.Model):
     def __str__(self):
         return f"{self.process_flow.name} - 步骤{self.step_order}: {self.step_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录读取时的所属流程和工时，保存时据此计算总工时差值
+        if 'process_flow_id' in field_names and 'estimated_hours' in field_names:
+            instance._loaded_hours = (instance.process_flow_id, instance.estimated_hours)
+        # 记录读取时的位置，执行顺序或并行组变化会改变推导出的依赖关系，保存时需校验循环
+        if {'process_flow_id', 'step_order', 'parallel_group'} <= set(field_names):
+            instance._loaded_position = (instance.process_flow_id, instance.step_order, instance.parallel_group)
+        return instance
+
     def save(self, *args, **kwargs):
+        from .process_flow import apply_step_hours_change, reconcile_flow_hours
+
         # 如果没有设置预估工时，使用作业工序的工时
         if not self.estimated_hours and self.work_process.work_hours:
             self.estimated_hours = self.work_process.work_hours
-        super().save(*args, **kwargs)
+        self.hours_inherited = self.estimated_hours == self.work_process.work_hours
+        adding = self._state.adding
+        before = getattr(self, '_loaded_hours', None)
+        position = (self.process_flow_id, self.step_order, self.parallel_group)
+        moved = adding or getattr(self, '_loaded_position', None) != position
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            after = (self.process_flow_id, self.estimated_hours)
+            if adding or before is not None:
+                # 位置变化导致循环依赖时抛出 ProcessFlowCycleError 并回滚本次保存
+                apply_step_hours_change(before, after, validate=moved)
+            else:
+                # 无法得知原工时（如延迟加载字段），回退为聚合校正
+                reconcile_flow_hours([self.process_flow_id])
+        self._loaded_hours = after
+        self._loaded_position = position
+
+    def delete(self, *args, **kwargs):
+        from .process_flow import apply_step_hours_change
+
+        before = (self.process_flow_id, self.estimated_hours)
+        result = super().delete(*args, **kwargs)
+        apply_step_hours_change(before, None)
+        return result
+
+
+class SectionWorkOrder(models.Model):
+    """分段作业工单表（由标准工艺流程实例化）"""
+    section = models.OneToOneField(Section, on_delete=models.CASCADE, verbose_name='分段', related_name='work_order')
+    process_flow = models.ForeignKey(StandardProcessFlow, on_delete=models.PROTECT, verbose_name='标准工艺流程')
+    estimated_total_hours = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='预估总工时', default=0)
+    critical_path_hours = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='关键路径工时', default=0)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '分段作业工单'
+        verbose_name_plural = '分段作业工单'
+        ordering = ['section']
+
+    def __str__(self):
+        return f"{self.section.section_number} - {self.process_flow.name}"
+
+
+class SectionWorkStep(models.Model):
+    """分段作业工单步骤表
+
+    前置关系不复制，排程时通过 flow_step 沿用标准工艺流程步骤的前置关系。
+    """
+    STATUS_CHOICES = [
+        ('pending', '未开始'),
+        ('in_progress', '进行中'),
+        ('completed', '已完成'),
+    ]
+
+    work_order = models.ForeignKey(SectionWorkOrder, on_delete=models.CASCADE, verbose_name='所属工单', related_name='steps')
+    flow_step = models.ForeignKey(ProcessFlowStep, on_delete=models.SET_NULL, verbose_name='标准流程步骤', null=True, blank=True)
+    work_process = models.ForeignKey(WorkProcess, on_delete=models.PROTECT, verbose_name='作业工序')
+    step_name = models.CharField(max_length=100, verbose_name='步骤名称')
+    step_order = models.PositiveIntegerField(verbose_name='步骤顺序')
+    parallel_group = models.PositiveIntegerField(verbose_name='并行组号', default=0)
+    estimated_hours = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='预估工时')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '分段作业工单步骤'
+        verbose_name_plural = '分段作业工单步骤'
+        unique_together = ['work_order', 'step_order']
+        ordering = ['work_order', 'step_order', 'parallel_group']
+
+    def __str__(self):
+        return f"{self.work_order.section.section_number} - 步骤{self.step_order}: {self.step_name}"
+
+
+class ImportJob(models.Model):
+    """后台导入任务（由 run_import_jobs 命令在请求之外处理）"""
+    KIND_CHOICES = [
+        ('section', '分段导入'),
+        ('pallet', '托盘导入'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '导入中'),
+        ('success', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='导入类型')
+    file_path = models.CharField(max_length=500, verbose_name='文件路径')
+    original_name = models.CharField(max_length=255, verbose_name='原文件名')
+    upsert = models.BooleanField(default=False, verbose_name='新增并更新')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    total_rows = models.PositiveIntegerField(default=0, verbose_name='预计行数')
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name='已处理行数')
+    created_count = models.PositiveIntegerField(default=0, verbose_name='新增数')
+    updated_count = models.PositiveIntegerField(default=0, verbose_name='更新数')
+    unchanged_count = models.PositiveIntegerField(default=0, verbose_name='无变化数')
+    error_count = models.PositiveIntegerField(default=0, verbose_name='错误行数')
+    errors = models.JSONField(default=list, blank=True, verbose_name='错误明细')
+    message = models.TextField(blank=True, default='', verbose_name='失败原因')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='完成时间')
+    # 领取和每批写入进度时刷新，worker 异常退出后据此识别卡在导入中的任务
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '导入任务'
+        verbose_name_plural = '导入任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='import_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.original_name}"
+
+    @property
+    def percent(self):
+        if self.status == 'success':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
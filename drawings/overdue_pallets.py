@@ -0,0 +1,117 @@
+"""逾期/临期未接收托盘报表
+
+托盘的到期日取需求日期，未填写时取所属分段的上胎日期。未接收且到期日已过（逾期）
+或在今后 N 天内（临期）的托盘按项目、分段分组列出。
+
+全部数据用一条托盘关联分段、项目的查询取出（按 MAX_DAYS 的最长范围），按 (是否接收, 需求日期) 索引筛选，
+结果按天缓存；页面按所选天数和项目在缓存的行上筛选，不再查询数据库。
+托盘或分段变化、批量导入后使缓存失效，日期翻天后自动重建。
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from .models import Pallet
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 30
+CACHE_KEY = 'overdue_pallets'
+
+ROW_FIELDS = (
+    'id', 'pallet_code', 'pallet_name', 'project_id', 'project__project_name', 'section_id',
+    'section__section_number', 'section__block_number', 'section__on_block_date', 'required_date', 'due_date',
+)
+
+
+@dataclass
+class OverdueSnapshot:
+    """某一天的未接收托盘（到期日不晚于 today + MAX_DAYS）"""
+    today: date
+    rows: list = field(default_factory=list)  # ROW_FIELDS 顺序的元组，按项目、上胎日期、分段号、到期日排序
+
+
+def build_overdue_pallets(today=None):
+    """一次关联查询取出到期日不晚于 today + MAX_DAYS 的未接收托盘"""
+    today = today or date.today()
+    horizon = today + timedelta(days=MAX_DAYS)
+    rows = (
+        Pallet.objects.filter(is_received=False, is_active=True)
+        # 拆成两个条件而不是直接筛选 Coalesce，需求日期条件可以走 (是否接收, 需求日期) 索引
+        .filter(Q(required_date__lte=horizon) | Q(required_date__isnull=True, section__on_block_date__lte=horizon))
+        .annotate(due_date=Coalesce('required_date', 'section__on_block_date'))
+        .order_by('project__project_name', 'section__on_block_date', 'section__section_number', 'due_date', 'pallet_code')
+        .values_list(*ROW_FIELDS)
+    )
+    return OverdueSnapshot(today=today, rows=list(rows))
+
+
+def _timeout():
+    return getattr(settings, 'OVERDUE_PALLET_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_overdue_pallets():
+    """读取当天缓存的未接收托盘，日期翻天或未缓存时重建"""
+    snapshot = cache.get(CACHE_KEY)
+    if snapshot is None or snapshot.today != date.today():
+        snapshot = build_overdue_pallets()
+        cache.set(CACHE_KEY, snapshot, _timeout())
+    return snapshot
+
+
+def invalidate_overdue_pallets():
+    cache.delete(CACHE_KEY)
+
+
+def overdue_report(snapshot, days=DEFAULT_DAYS, project_ids=None):
+    """按项目、分段分组：逾期（到期日早于今天）和 days 天内到期的托盘"""
+    horizon = snapshot.today + timedelta(days=days)
+    project_ids = {int(project_id) for project_id in project_ids or ()}
+    projects = {}
+    sections = []
+    for row in snapshot.rows:
+        (pallet_id, pallet_code, pallet_name, project_id, project_name, section_id,
+         section_number, block_number, on_block_date, required_date, due_date) = row
+        if due_date > horizon or (project_ids and project_id not in project_ids):
+            continue
+        overdue = due_date < snapshot.today
+        if not sections or sections[-1]['section_id'] != section_id:
+            sections.append({
+                'project_id': project_id,
+                'project_name': project_name,
+                'section_id': section_id,
+                'section_number': section_number,
+                'block_number': block_number,
+                'on_block_date': on_block_date,
+                'overdue': 0,
+                'upcoming': 0,
+                'pallets': [],
+            })
+            project = projects.setdefault(project_id, {
+                'project_name': project_name, 'sections': 0, 'overdue': 0, 'upcoming': 0,
+            })
+            project['sections'] += 1
+        section = sections[-1]
+        section['overdue' if overdue else 'upcoming'] += 1
+        projects[project_id]['overdue' if overdue else 'upcoming'] += 1
+        section['pallets'].append({
+            'id': pallet_id,
+            'pallet_code': pallet_code,
+            'pallet_name': pallet_name,
+            'required_date': required_date,
+            'due_date': due_date,
+            'overdue': overdue,
+            # 正数为已逾期天数，负数为距到期的天数
+            'days_late': (snapshot.today - due_date).days,
+        })
+    return {
+        'today': snapshot.today,
+        'horizon': horizon,
+        'projects': list(projects.values()),
+        'sections': sections,
+        'overdue': sum(project['overdue'] for project in projects.values()),
+        'upcoming': sum(project['upcoming'] for project in projects.values()),
+    }
@@ -0,0 +1,79 @@
+"""托盘明细条目
+
+托盘明细是自由文本（如"零部件c1、c2、b1、b2"），按零件查托盘只能对明细做 LIKE 全表扫描。
+托盘保存和导入时把明细解析为 PalletItem（零件编码、数量、类别），按零件编码建索引，
+"哪些托盘包含零件 c2"变为一次索引等值查询。
+
+解析规则：
+- 条目之间用顿号、逗号、分号或换行分隔，末尾的"等"忽略；
+- "零部件"/"舾装件"前缀（可带冒号）指定其后条目的类别，直到下一个前缀，默认为零部件；
+- 数量写作 c1×2、c1*2、c1x2 或 c1(2件)，未写数量时为 1；
+- 零件编码不区分大小写，统一存为小写（与 MySQL 默认的不区分大小写排序规则一致），
+  同一托盘内重复的编码合并数量。
+"""
+import re
+
+from django.db import transaction
+
+from .models import PalletItem
+
+SEPARATORS = re.compile(r'[、，,；;\r\n]+')
+KIND_PREFIXES = (('零部件', 'part'), ('舾装件', 'outfitting'))
+QUANTITY = re.compile(r'^(?P<code>.+?)\s*(?:[x×X*＊]\s*(?P<times>\d+)|[（(]\s*(?P<paren>\d+)\s*[件个套只]?\s*[)）])$')
+CODE_MAX_LENGTH = PalletItem._meta.get_field('part_code').max_length
+
+
+def normalize_part_code(code):
+    """零件编码的规范形式：去掉首尾空白并转为小写"""
+    return code.strip().casefold()[:CODE_MAX_LENGTH]
+
+
+def parse_pallet_details(text):
+    """解析托盘明细文本，返回 [(零件编码, 数量, 类别), ...]（按出现顺序，编码不重复）"""
+    items = {}
+    kind = 'part'
+    for token in SEPARATORS.split(text or ''):
+        token = token.strip()
+        for prefix, prefix_kind in KIND_PREFIXES:
+            if token.startswith(prefix):
+                kind = prefix_kind
+                token = token[len(prefix):].lstrip('：: ')
+                break
+        token = token.removesuffix('等').strip()
+        if not token:
+            continue
+        quantity = 1
+        match = QUANTITY.match(token)
+        if match:
+            token = match.group('code')
+            quantity = int(match.group('times') or match.group('paren'))
+        code = normalize_part_code(token)
+        if code in items:
+            items[code][0] += quantity
+        else:
+            items[code] = [quantity, kind]
+    return [(code, quantity, kind) for code, (quantity, kind) in items.items()]
+
+
+def sync_pallet_items(pallets):
+    """按托盘明细重建托盘的明细条目
+
+    pallets 为 [(托盘ID, 明细文本), ...]，一次删除、一次批量插入。
+    """
+    pallets = list(pallets)
+    if not pallets:
+        return 0
+    items = [
+        PalletItem(pallet_id=pallet_id, part_code=code, quantity=quantity, kind=kind)
+        for pallet_id, details in pallets
+        for code, quantity, kind in parse_pallet_details(details)
+    ]
+    with transaction.atomic():
+        PalletItem.objects.filter(pallet_id__in=[pallet_id for pallet_id, _ in pallets]).delete()
+        PalletItem.objects.bulk_create(items, batch_size=1000)
+    return len(items)
+
+
+def pallets_containing(part_code):
+    """包含指定零件编码的托盘ID子查询"""
+    return PalletItem.objects.filter(part_code=normalize_part_code(part_code)).values('pallet_id')
@@ -0,0 +1,68 @@
+"""托盘批量接收
+
+仓库扫码接收托盘时一次提交一批托盘编码：先用一次查询找出这些编码对应的托盘，
+再用一条 UPDATE ... WHERE pallet_code IN (...) 把未接收的托盘标记为已接收，
+最后对整批涉及的分段统一重算齐套状态、刷新物料需求周并使逾期托盘缓存失效，
+不再逐个托盘走编辑页面保存（每个托盘都会重新查询项目、分段并改写全部字段，并各自触发一次重算）。
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .material_requirements import pallet_buckets, refresh_material_requirements
+from .models import Pallet
+from .overdue_pallets import invalidate_overdue_pallets
+from .readiness import refresh_section_readiness
+
+# 单次提交的编码数上限，避免 IN 参数过多
+MAX_CODES = 1000
+CODE_SEPARATORS = re.compile(r'[\s,，、;；]+')
+
+
+@dataclass
+class ReceiveResult:
+    """批量接收结果"""
+    received: list = field(default_factory=list)  # 本次标记为已接收的托盘编码
+    already_received: list = field(default_factory=list)
+    unknown: list = field(default_factory=list)  # 系统中不存在的托盘编码
+
+
+def parse_pallet_codes(text):
+    """扫码枪录入的文本拆分为托盘编码（换行、空格或逗号分隔），去重并保持顺序"""
+    return list(dict.fromkeys(code for code in CODE_SEPARATORS.split(text or '') if code))
+
+
+def receive_pallets(codes):
+    """把一批托盘编码标记为已接收，返回 ReceiveResult"""
+    codes = list(dict.fromkeys(code.strip() for code in codes if code and code.strip()))
+    if len(codes) > MAX_CODES:
+        raise ValueError(f'一次最多接收{MAX_CODES}个托盘，当前{len(codes)}个')
+    result = ReceiveResult()
+    if not codes:
+        return result
+
+    with transaction.atomic():
+        pallets = {
+            code: (pallet_id, section_id, is_received)
+            for pallet_id, code, section_id, is_received in Pallet.objects.select_for_update()
+            .filter(pallet_code__in=codes).values_list('id', 'pallet_code', 'section_id', 'is_received')
+        }
+        for code in codes:
+            if code not in pallets:
+                result.unknown.append(code)
+            elif pallets[code][2]:
+                result.already_received.append(code)
+            else:
+                result.received.append(code)
+        if not result.received:
+            return result
+
+        # update() 不触发信号，也不会自动刷新 auto_now 字段
+        Pallet.objects.filter(pallet_code__in=result.received, is_received=False).update(
+            is_received=True, updated_at=timezone.now())
+        refresh_section_readiness({pallets[code][1] for code in result.received})
+        refresh_material_requirements(buckets=pallet_buckets([pallets[code][0] for code in result.received]))
+    invalidate_overdue_pallets()
+    return result
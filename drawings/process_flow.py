@@ -0,0 +1,564 @@
+"""标准工艺流程计算引擎
+
+按关键路径法（CPM）计算工艺流程各步骤的最早/最迟开始时间、时差以及流程的关键路径工期。
+
+步骤之间的依赖关系：
+- 步骤配置了前置步骤（prerequisites）时，以前置步骤为准；
+- 否则按执行顺序和并行组号推导：相邻且并行组号相同（非0）的步骤组成一个并行阶段，
+  0 号组的步骤单独成为一个阶段，每个阶段依赖于上一个阶段全部完成。
+
+阶段之间的依赖通过一个工期为 0 的虚拟节点连接，避免两个大并行阶段之间产生 m*n 条边，
+整个计算为 O(V+E)。
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ProcessFlowStep, StandardProcessFlow, WorkProcess
+
+ZERO = Decimal('0')
+
+
+def step_label(step):
+    """提示信息中的步骤名称：步骤序号（工序名称），没有读取工序名称时只显示序号"""
+    name = step.get('work_process__process_name') or step.get('step_name')
+    return f'步骤{step["step_order"]}（{name}）' if name else f'步骤{step["step_order"]}'
+
+
+class ProcessFlowCycleError(ValueError):
+    """工艺流程步骤之间存在循环依赖
+
+    step_ids 为涉及的步骤ID；steps 为步骤字典（含 id、step_order，可含工序名称），
+    用于在提示信息中显示步骤序号和工序名称，而不是数据库ID。
+    """
+
+    def __init__(self, step_ids, steps=()):
+        self.step_ids = sorted(step_ids)
+        by_id = {step['id']: step for step in steps}
+        known = sorted((by_id[step_id] for step_id in self.step_ids if step_id in by_id),
+                       key=lambda step: (step['step_order'], step.get('parallel_group', 0)))
+        labels = [step_label(step) for step in known]
+        if len(known) < len(self.step_ids):
+            labels.append(f'其他{len(self.step_ids) - len(known)}个步骤')
+        super().__init__(f'工艺流程{"、".join(labels)}之间存在循环依赖')
+
+
+@dataclass
+class StepTiming:
+    """单个步骤的时间参数（单位：小时）"""
+    step_id: int
+    duration: Decimal
+    earliest_start: Decimal = ZERO
+    earliest_finish: Decimal = ZERO
+    latest_start: Decimal = ZERO
+    latest_finish: Decimal = ZERO
+
+    @property
+    def slack(self):
+        """总时差"""
+        return self.latest_start - self.earliest_start
+
+    @property
+    def is_critical(self):
+        return self.slack == ZERO
+
+
+@dataclass
+class FlowSchedule:
+    """工艺流程的关键路径计算结果"""
+    serial_hours: Decimal = ZERO
+    critical_path_hours: Decimal = ZERO
+    timings: dict = field(default_factory=dict)
+    critical_path: list = field(default_factory=list)
+    order: list = field(default_factory=list)
+    levels: dict = field(default_factory=dict)
+
+
+def load_flow_graph(process_flow_id, extra_fields=()):
+    """读取工艺流程的全部步骤和前置关系（共两次查询）
+
+    extra_fields 为需要一并读取的其他字段（可跨关联，如 work_process__process_name）。
+    """
+    steps = list(
+        ProcessFlowStep.objects.filter(process_flow_id=process_flow_id)
+        .order_by('step_order', 'parallel_group', 'id')
+        .values('id', 'step_order', 'parallel_group', 'estimated_hours', *extra_fields)
+    )
+    through = ProcessFlowStep.prerequisites.through
+    edges = list(
+        through.objects.filter(from_processflowstep__process_flow_id=process_flow_id)
+        .values_list('from_processflowstep_id', 'to_processflowstep_id')
+    )
+    return steps, edges
+
+
+def build_dependency_graph(steps, edges):
+    """构建依赖图
+
+    steps 需按 (step_order, parallel_group) 排序；edges 为 (步骤ID, 前置步骤ID)。
+    返回 (durations, predecessors)，虚拟阶段节点使用负数ID，工期为 0。
+    不属于本流程的前置步骤会被忽略。
+    """
+    durations = {}
+    predecessors = {}
+    for step in steps:
+        durations[step['id']] = Decimal(step['estimated_hours'] or 0)
+        predecessors[step['id']] = []
+
+    explicit = {}
+    for step_id, prerequisite_id in edges:
+        if step_id in durations and prerequisite_id in durations and step_id != prerequisite_id:
+            explicit.setdefault(step_id, []).append(prerequisite_id)
+
+    # 按执行顺序划分阶段：连续且并行组号相同（非0）的步骤属于同一阶段
+    stages = []
+    for step in steps:
+        group = step['parallel_group']
+        if stages and group and stages[-1][0] == group:
+            stages[-1][1].append(step['id'])
+        else:
+            stages.append((group, [step['id']]))
+
+    previous_barrier = None
+    for index, (group, stage_step_ids) in enumerate(stages):
+        for step_id in stage_step_ids:
+            if step_id in explicit:
+                predecessors[step_id] = explicit[step_id]
+            elif previous_barrier is not None:
+                predecessors[step_id] = [previous_barrier]
+        if index < len(stages) - 1:
+            barrier = -(index + 1)
+            durations[barrier] = ZERO
+            predecessors[barrier] = list(stage_step_ids)
+            previous_barrier = barrier
+    return durations, predecessors
+
+
+def topological_order(predecessors, steps=()):
+    """Kahn 拓扑排序，存在环时抛出 ProcessFlowCycleError（steps 用于错误信息中的步骤名称）"""
+    successors = {node: [] for node in predecessors}
+    in_degree = {node: len(preds) for node, preds in predecessors.items()}
+    for node, preds in predecessors.items():
+        for pred in preds:
+            successors[pred].append(node)
+
+    queue = deque(node for node, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for succ in successors[node]:
+            in_degree[succ] -= 1
+            if in_degree[succ] == 0:
+                queue.append(succ)
+
+    if len(order) != len(predecessors):
+        raise ProcessFlowCycleError(_cycle_nodes(predecessors, successors, in_degree), steps)
+    return order, successors
+
+
+def _cycle_nodes(predecessors, successors, in_degree):
+    """正向排序剩下的节点中，再逆向剥离没有后继的节点，剩下环上（及环之间）的步骤"""
+    remaining = {node for node, degree in in_degree.items() if degree > 0}
+    out_degree = {node: sum(succ in remaining for succ in successors[node]) for node in remaining}
+    queue = deque(node for node, degree in out_degree.items() if degree == 0)
+    while queue:
+        node = queue.popleft()
+        remaining.discard(node)
+        for pred in predecessors[node]:
+            if pred in remaining:
+                out_degree[pred] -= 1
+                if out_degree[pred] == 0:
+                    queue.append(pred)
+    return [node for node in remaining if node > 0]
+
+
+def compute_schedule(steps, edges):
+    """计算关键路径（正推求最早时间，逆推求最迟时间）"""
+    durations, predecessors = build_dependency_graph(steps, edges)
+    order, successors = topological_order(predecessors, steps)
+
+    earliest_finish = {}
+    for node in order:
+        start = max((earliest_finish[pred] for pred in predecessors[node]), default=ZERO)
+        earliest_finish[node] = start + durations[node]
+    project_duration = max(earliest_finish.values(), default=ZERO)
+
+    # 拓扑层级：无前置的步骤为第 0 层，虚拟阶段节点不单独占层
+    depth = {}
+    for node in order:
+        deepest = max((depth[pred] for pred in predecessors[node]), default=None)
+        if node < 0:
+            depth[node] = deepest
+        else:
+            depth[node] = 0 if deepest is None else deepest + 1
+
+    latest_start = {}
+    for node in reversed(order):
+        finish = min((latest_start[succ] for succ in successors[node]), default=project_duration)
+        latest_start[node] = finish - durations[node]
+
+    schedule = FlowSchedule(
+        serial_hours=sum((durations[step['id']] for step in steps), ZERO),
+        critical_path_hours=project_duration,
+        order=[node for node in order if node > 0],
+        levels={node: level for node, level in depth.items() if node > 0},
+    )
+    for step_id in schedule.order:
+        duration = durations[step_id]
+        schedule.timings[step_id] = StepTiming(
+            step_id=step_id,
+            duration=duration,
+            earliest_start=earliest_finish[step_id] - duration,
+            earliest_finish=earliest_finish[step_id],
+            latest_start=latest_start[step_id],
+            latest_finish=latest_start[step_id] + duration,
+        )
+    schedule.critical_path = _trace_critical_path(
+        order, predecessors, durations, earliest_finish, latest_start, project_duration
+    )
+    return schedule
+
+
+def _trace_critical_path(order, predecessors, durations, earliest_finish, latest_start, project_duration):
+    """从最晚完成的关键步骤逆向回溯出一条关键路径"""
+    def is_critical(node):
+        return latest_start[node] == earliest_finish[node] - durations[node]
+
+    sinks = [node for node in order if earliest_finish[node] == project_duration and is_critical(node)]
+    if not sinks:
+        return []
+    path = []
+    node = sinks[-1]
+    while node is not None:
+        if node > 0:
+            path.append(node)
+        start = earliest_finish[node] - durations[node]
+        node = next(
+            (pred for pred in predecessors[node]
+             if earliest_finish[pred] == start and is_critical(pred)),
+            None,
+        )
+    path.reverse()
+    return path
+
+
+def analyze_process_flow(process_flow_id):
+    """读取并计算指定工艺流程的关键路径"""
+    steps, edges = load_flow_graph(process_flow_id)
+    return compute_schedule(steps, edges)
+
+
+@dataclass
+class CompiledFlow:
+    """工艺流程的编译结果，供详情页直接渲染（可序列化后缓存）"""
+    steps: list = field(default_factory=list)
+    levels: list = field(default_factory=list)
+    parallel_groups: list = field(default_factory=list)
+    critical_path: list = field(default_factory=list)
+    serial_hours: Decimal = ZERO
+    critical_path_hours: Decimal = ZERO
+    cycle_error: str = ''
+
+
+def compile_process_flow(process_flow_id):
+    """编译工艺流程：拓扑层级、并行组、关键路径及关联的工序/工种名称"""
+    steps, edges = load_flow_graph(process_flow_id, extra_fields=(
+        'step_name', 'description', 'work_process_id',
+        'work_process__process_name', 'work_process__work_type__work_type_name',
+    ))
+    order_by_id = {step['id']: step['step_order'] for step in steps}
+    prerequisite_orders = {}
+    for step_id, prerequisite_id in edges:
+        if prerequisite_id in order_by_id:
+            prerequisite_orders.setdefault(step_id, []).append(order_by_id[prerequisite_id])
+
+    compiled = CompiledFlow()
+    try:
+        schedule = compute_schedule(steps, edges)
+    except ProcessFlowCycleError as e:
+        schedule = None
+        compiled.cycle_error = str(e)
+
+    by_id = {}
+    for step in steps:
+        timing = schedule.timings[step['id']] if schedule else None
+        item = {
+            'id': step['id'],
+            'step_name': step['step_name'],
+            'step_order': step['step_order'],
+            'parallel_group': step['parallel_group'],
+            'estimated_hours': step['estimated_hours'],
+            'description': step['description'],
+            'work_process_id': step['work_process_id'],
+            'process_name': step['work_process__process_name'],
+            'work_type_name': step['work_process__work_type__work_type_name'],
+            'prerequisite_orders': sorted(prerequisite_orders.get(step['id'], [])),
+            'level': schedule.levels[step['id']] if schedule else None,
+            'earliest_start': timing.earliest_start if timing else None,
+            'latest_start': timing.latest_start if timing else None,
+            'slack': timing.slack if timing else None,
+            'is_critical': timing.is_critical if timing else False,
+        }
+        compiled.steps.append(item)
+        by_id[step['id']] = item
+
+        # 与模板 regroup 语义一致：按执行顺序相邻且并行组号相同的步骤归为一组
+        if compiled.parallel_groups and compiled.parallel_groups[-1]['grouper'] == step['parallel_group']:
+            compiled.parallel_groups[-1]['list'].append(item)
+        else:
+            compiled.parallel_groups.append({'grouper': step['parallel_group'], 'list': [item]})
+
+    if schedule:
+        compiled.serial_hours = schedule.serial_hours
+        compiled.critical_path_hours = schedule.critical_path_hours
+        compiled.critical_path = [by_id[step_id] for step_id in schedule.critical_path]
+        level_count = max(schedule.levels.values(), default=-1) + 1
+        compiled.levels = [[] for _ in range(level_count)]
+        for step_id in schedule.order:
+            compiled.levels[schedule.levels[step_id]].append(by_id[step_id])
+    else:
+        compiled.serial_hours = sum((_to_decimal(step['estimated_hours']) for step in steps), ZERO)
+    return compiled
+
+
+def get_compiled_flow(process_flow):
+    """读取缓存的工艺流程编译结果
+
+    缓存键包含流程及其步骤、工序、工种的最后更新时间和步骤数，任何一项变化即自动失效。
+    """
+    stamp = ProcessFlowStep.objects.filter(process_flow=process_flow).aggregate(
+        step_count=Count('id'),
+        steps_updated=Max('updated_at'),
+        processes_updated=Max('work_process__updated_at'),
+        work_types_updated=Max('work_process__work_type__updated_at'),
+    )
+    key = 'process_flow:compiled:{}:{}'.format(
+        process_flow.pk,
+        ':'.join(
+            str(value.timestamp()) if hasattr(value, 'timestamp') else str(value)
+            for value in (process_flow.updated_at, *stamp.values())
+        ),
+    )
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_process_flow(process_flow.pk)
+        cache.set(key, compiled, getattr(settings, 'PROCESS_FLOW_CACHE_TIMEOUT', 60 * 60 * 24))
+    return compiled
+
+
+def sync_flow_steps(process_flow, rows):
+    """按提交的步骤数据批量同步工艺流程步骤
+
+    rows 为字典列表，键包括 step_id（新步骤为 None）、step_name、work_process_id、
+    step_order、parallel_group、estimated_hours、description、prerequisite_orders
+    （前置步骤的执行顺序号列表），可选 hours_min/hours_mode/hours_max（工时分布）。与现有步骤按 step_id 对比后，在一个事务内
+    批量新增/更新/删除步骤并重建前置关系，同时刷新流程总工时。
+    """
+    step_orders = [row['step_order'] for row in rows]
+    if len(step_orders) != len(set(step_orders)):
+        raise ValueError('步骤执行顺序不能重复')
+    for row in rows:
+        bounds = [row.get(key) for key in ('hours_min', 'hours_mode', 'hours_max')]
+        if any(value is not None for value in bounds):
+            if bounds[0] is None or bounds[2] is None:
+                raise ValueError(f'步骤{row["step_order"]}的工时分布需同时填写最短和最长工时')
+            if not bounds[0] <= (bounds[1] if bounds[1] is not None else bounds[0]) <= bounds[2]:
+                raise ValueError(f'步骤{row["step_order"]}的工时分布应满足 最短 ≤ 最可能 ≤ 最长')
+
+    work_processes = WorkProcess.objects.in_bulk({row['work_process_id'] for row in rows})
+    missing = {row['work_process_id'] for row in rows} - set(work_processes)
+    if missing:
+        raise ValueError(f'作业工序不存在：{sorted(missing)}')
+
+    with transaction.atomic():
+        existing = {
+            step.id: step
+            for step in ProcessFlowStep.objects.filter(process_flow=process_flow)
+        }
+        to_create, to_update, reordered_ids = [], [], []
+        now = timezone.now()
+        for row in rows:
+            work_process = work_processes[row['work_process_id']]
+            step = existing.get(row['step_id'])
+            if step is None:
+                step = ProcessFlowStep(process_flow=process_flow)
+                to_create.append(step)
+            else:
+                if step.step_order != row['step_order']:
+                    reordered_ids.append(step.id)
+                to_update.append(step)
+            step.work_process = work_process
+            step.step_name = row['step_name']
+            step.step_order = row['step_order']
+            step.parallel_group = row['parallel_group']
+            # 未填写预估工时时沿用作业工序的工时（与 ProcessFlowStep.save 一致）
+            step.estimated_hours = row['estimated_hours'] or work_process.work_hours or 0
+            step.hours_inherited = step.estimated_hours == work_process.work_hours
+            step.hours_min = row.get('hours_min')
+            step.hours_mode = row.get('hours_mode')
+            step.hours_max = row.get('hours_max')
+            step.description = row['description']
+            step.updated_at = now  # bulk_update 不会自动刷新 auto_now 字段
+
+        kept_ids = {step.id for step in to_update}
+        ProcessFlowStep.objects.filter(
+            id__in=[step_id for step_id in existing if step_id not in kept_ids]
+        ).delete()
+
+        # 调整顺序的步骤先整体移到临时序号，避免批量更新时触发 (process_flow, step_order) 唯一约束
+        if reordered_ids:
+            offset = max(step_orders) + max(step.step_order for step in existing.values()) + 1
+            ProcessFlowStep.objects.filter(id__in=reordered_ids).update(step_order=F('step_order') + offset)
+        ProcessFlowStep.objects.bulk_update(
+            to_update,
+            ['work_process', 'step_name', 'step_order', 'parallel_group', 'estimated_hours', 'hours_inherited',
+             'hours_min', 'hours_mode', 'hours_max', 'description', 'updated_at'],
+        )
+        ProcessFlowStep.objects.bulk_create(to_create)
+
+        # 部分数据库 bulk_create 不回填主键，统一按执行顺序取回ID
+        id_by_order = dict(
+            ProcessFlowStep.objects.filter(process_flow=process_flow).values_list('step_order', 'id')
+        )
+        through = ProcessFlowStep.prerequisites.through
+        through.objects.filter(from_processflowstep__process_flow=process_flow).delete()
+        links = []
+        for row in rows:
+            step_id = id_by_order[row['step_order']]
+            for order in row['prerequisite_orders']:
+                if order not in id_by_order:
+                    raise ValueError(f'步骤{row["step_order"]}的前置步骤{order}不存在')
+                if order == row['step_order']:
+                    raise ValueError(f'步骤{order}不能以自身作为前置步骤')
+                links.append(through(from_processflowstep_id=step_id, to_processflowstep_id=id_by_order[order]))
+        through.objects.bulk_create(links)
+
+        # 串行总工时按差值累加，关键路径在本次批量变更后统一重算一次
+        old_total = sum((_to_decimal(step.estimated_hours) for step in existing.values()), ZERO)
+        new_total = sum((_to_decimal(step.estimated_hours) for step in to_update + to_create), ZERO)
+        apply_serial_hours_delta(process_flow.pk, new_total - old_total)
+        return refresh_critical_path(process_flow.pk)
+
+
+def _to_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
+
+
+def apply_serial_hours_delta(process_flow_id, delta):
+    """按差值更新预估总工时（数据库端 F 表达式，避免读取全部步骤）"""
+    if delta:
+        StandardProcessFlow.objects.filter(pk=process_flow_id).update(
+            estimated_total_hours=F('estimated_total_hours') + delta,
+            updated_at=timezone.now(),
+        )
+
+
+def store_topo_order(steps, order):
+    """按拓扑顺序从 1 开始回写步骤的 topo_index，只更新编号变化的步骤
+
+    steps 需包含 id 和 topo_index，order 为步骤ID的拓扑顺序。
+    """
+    current = {step['id']: step['topo_index'] for step in steps}
+    changed = [
+        ProcessFlowStep(id=step_id, topo_index=index)
+        for index, step_id in enumerate(order, start=1)
+        if current.get(step_id) != index
+    ]
+    ProcessFlowStep.objects.bulk_update(changed, ['topo_index'], batch_size=1000)
+    return len(changed)
+
+
+def refresh_critical_path(process_flow_id):
+    """重新计算并保存关键路径工时，同时刷新步骤的拓扑序号"""
+    steps, edges = load_flow_graph(process_flow_id, extra_fields=('topo_index', 'work_process__process_name'))
+    schedule = compute_schedule(steps, edges)
+    store_topo_order(steps, schedule.order)
+    StandardProcessFlow.objects.filter(pk=process_flow_id).update(
+        critical_path_hours=schedule.critical_path_hours,
+        updated_at=timezone.now(),
+    )
+    return schedule
+
+
+class _CriticalPathRefresh:
+    """事务提交后重算单个流程的关键路径（on_commit 回调）"""
+
+    def __init__(self, process_flow_id):
+        self.process_flow_id = process_flow_id
+
+    def __call__(self):
+        try:
+            refresh_critical_path(self.process_flow_id)
+        except ProcessFlowCycleError:
+            pass  # 存在循环依赖时保留原关键路径工时，由流程校验负责提示
+
+
+def refresh_critical_path_on_commit(process_flow_id):
+    """在事务提交后重算关键路径，同一事务内对同一流程的多次修改只重算一次
+
+    仍是整个流程图的全量重算（O(V+E)），只是合并到提交时执行；不在事务中时立即执行。
+    已登记的回调随事务（或保存点）回滚一并丢弃，之后的修改会重新登记。
+    """
+    connection = transaction.get_connection()
+    if any(
+        isinstance(func, _CriticalPathRefresh) and func.process_flow_id == process_flow_id
+        for _, func, _ in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(_CriticalPathRefresh(process_flow_id))
+
+
+def apply_step_hours_change(before, after, validate=False):
+    """单个步骤新增/修改/删除后维护所属流程的总工时
+
+    before、after 为 (process_flow_id, estimated_hours)，新增时 before 为 None，删除时 after 为 None。
+    validate 为 True 时，步骤调整后所属流程存在循环依赖则抛出 ProcessFlowCycleError。
+    """
+    deltas = {}
+    if before is not None:
+        deltas[before[0]] = deltas.get(before[0], ZERO) - _to_decimal(before[1])
+    if after is not None:
+        deltas[after[0]] = deltas.get(after[0], ZERO) + _to_decimal(after[1])
+    for process_flow_id, delta in deltas.items():
+        apply_serial_hours_delta(process_flow_id, delta)
+        if validate and after is not None and process_flow_id == after[0]:
+            # 位置变化会改变推导出的依赖关系，在本次保存的事务内重算，存在循环时回滚
+            refresh_critical_path(process_flow_id)
+        else:
+            refresh_critical_path_on_commit(process_flow_id)
+
+
+def reconcile_flow_hours(process_flow_ids=None):
+    """校正工艺流程总工时
+
+    串行总工时以数据库端 Sum 聚合一次性回写，关键路径工时逐个流程重算。
+    用于级联删除等绕过增量维护的场景。
+    """
+    flows = StandardProcessFlow.objects.all()
+    if process_flow_ids is not None:
+        flows = flows.filter(id__in=process_flow_ids)
+    step_totals = (
+        ProcessFlowStep.objects.filter(process_flow=OuterRef('pk'))
+        .order_by()
+        .values('process_flow')
+        .annotate(total=Sum('estimated_hours'))
+        .values('total')
+    )
+    flows.update(
+        estimated_total_hours=Coalesce(
+            Subquery(step_totals), Value(ZERO), output_field=StandardProcessFlow._meta.get_field('estimated_total_hours')
+        ),
+    )
+    for process_flow_id in flows.values_list('id', flat=True):
+        try:
+            refresh_critical_path(process_flow_id)
+        except ProcessFlowCycleError:
+            continue
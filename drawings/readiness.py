@@ -0,0 +1,44 @@
+"""分段齐套状态
+
+分段能否开工取决于模型接收、BOM接收、满足开工条件，以及该分段启用的托盘是否全部接收。
+托盘数、未接收托盘数和齐套标记冗余保存在分段表上，分段或托盘变化时用一条 UPDATE 按托盘表重算，
+"本周可开工的分段"等查询只需按 is_ready 索引筛选，不再逐分段关联托盘。
+"""
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Pallet, Section
+
+
+def _pallet_count(**filters):
+    return Coalesce(
+        Subquery(
+            Pallet.objects.filter(section=OuterRef('pk'), is_active=True, **filters)
+            .order_by().values('section').annotate(total=Count('id')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def refresh_section_readiness(section_ids=None):
+    """按托盘表重算分段的齐套字段，section_ids 为空时重算全部分段
+
+    is_ready 直接由子查询计算而不引用同一语句中更新的列（MySQL 按从左到右使用新值，其他数据库使用旧值）。
+    """
+    sections = Section.objects.all()
+    if section_ids is not None:
+        section_ids = {section_id for section_id in section_ids if section_id}
+        if not section_ids:
+            return 0
+        sections = sections.filter(pk__in=section_ids)
+    pending = Pallet.objects.filter(section=OuterRef('pk'), is_active=True, is_received=False)
+    return sections.update(
+        pallet_count=_pallet_count(),
+        pending_pallet_count=_pallet_count(is_received=False),
+        is_ready=Case(
+            When(Q(model_received=True, bom_received=True, start_conditions_met=True) & ~Exists(pending),
+                 then=Value(True)),
+            default=Value(False),
+        ),
+    )
@@ -0,0 +1,258 @@
+"""资源约束作业排程
+
+对所有启用分段的作业工单步骤做列表排程（serial schedule generation）：
+- 步骤之间遵守标准工艺流程的前置关系（未配置时按执行顺序/并行组推导）；
+- 步骤最早在分段上胎日期开工，以下胎日期为期限，超期的步骤标记为延误；
+- 每个作业工种的每日产能 = 班组人数 × 标准作业工时，步骤工时按人工时占用产能，
+  可跨天连续占用；未关联工种或工种产能为 0 的步骤不受产能约束。
+
+就绪步骤按（分段下胎日期，步骤在工单内的最迟开始时间，步骤ID）进入优先队列，
+依次放到其最早可行时刻，整体复杂度约为 O(N log N + 排程天数)。
+时间以天为单位的浮点数表示，0 为排程起始日 0 点。
+"""
+import heapq
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+from .models import ProcessFlowStep, Section, SectionWorkStep, WorkType
+from .process_flow import build_dependency_graph, compute_schedule
+
+# 无产能约束的步骤按单人标准工作日折算工期
+DEFAULT_HOURS_PER_DAY = 8.0
+
+
+@dataclass
+class PlannedStep:
+    """排程结果中的单个工单步骤"""
+    step_id: int
+    section_id: int
+    step_name: str
+    step_order: int
+    work_type_id: int
+    hours: float
+    start: float = 0.0
+    finish: float = 0.0
+    start_date: date = None
+    end_date: date = None
+    is_late: bool = False
+
+
+@dataclass
+class WorkPlan:
+    """作业排程结果"""
+    start_date: date
+    steps: list = field(default_factory=list)
+    sections: dict = field(default_factory=dict)
+    work_types: dict = field(default_factory=dict)
+    daily_load: dict = field(default_factory=dict)
+
+    @property
+    def late_sections(self):
+        return [section for section in self.sections.values() if section['is_late']]
+
+
+def load_schedule_input(project_ids=None):
+    """读取排程所需数据：未完成的工单步骤、分段时间窗、前置关系、工种产能（共四次查询）"""
+    steps = SectionWorkStep.objects.filter(
+        work_order__section__is_active=True,
+        work_order__section__project__is_active=True,
+    ).exclude(status='completed')
+    if project_ids:
+        steps = steps.filter(work_order__section__project_id__in=project_ids)
+    steps = list(
+        steps.order_by('work_order_id', 'step_order', 'parallel_group', 'id').values(
+            'id', 'work_order_id', 'work_order__section_id', 'flow_step_id', 'step_name',
+            'step_order', 'parallel_group', 'estimated_hours', 'work_process__work_type_id',
+            'work_process__process_name',
+        )
+    )
+
+    section_ids = {step['work_order__section_id'] for step in steps}
+    sections = {
+        section['id']: section
+        for section in Section.objects.filter(id__in=section_ids).values(
+            'id', 'section_number', 'project_id', 'project__project_name', 'block_number',
+            'on_block_date', 'off_block_date',
+        )
+    }
+
+    through = ProcessFlowStep.prerequisites.through
+    flow_edges = list(
+        through.objects.filter(
+            from_processflowstep_id__in={step['flow_step_id'] for step in steps if step['flow_step_id']}
+        ).values_list('from_processflowstep_id', 'to_processflowstep_id')
+    )
+
+    work_types = {
+        work_type['id']: work_type
+        for work_type in WorkType.objects.values('id', 'work_type_name', 'standard_hours', 'crew_size')
+    }
+    return steps, sections, flow_edges, work_types
+
+
+def build_work_plan(steps, sections, flow_edges, work_types, start_date=None):
+    """执行列表排程，返回 WorkPlan"""
+    start_date = start_date or date.today()
+    plan = WorkPlan(start_date=start_date)
+
+    prerequisites_by_flow_step = defaultdict(list)
+    for flow_step_id, prerequisite_id in flow_edges:
+        prerequisites_by_flow_step[flow_step_id].append(prerequisite_id)
+
+    steps_by_order = defaultdict(list)
+    for step in steps:
+        steps_by_order[step['work_order_id']].append(step)
+
+    # 逐个工单构建依赖图（虚拟阶段节点改用 (工单ID, 节点) 作为键避免冲突），并计算工单内最迟开始时间
+    predecessors = {}
+    durations = {}
+    priority = {}
+    release = {}
+    for work_order_id, order_steps in steps_by_order.items():
+        instance_by_flow_step = {step['flow_step_id']: step['id'] for step in order_steps if step['flow_step_id']}
+        edges = [
+            (step['id'], instance_by_flow_step[prerequisite_id])
+            for step in order_steps
+            for prerequisite_id in prerequisites_by_flow_step.get(step['flow_step_id'], ())
+            if prerequisite_id in instance_by_flow_step
+        ]
+        order_durations, order_predecessors = build_dependency_graph(order_steps, edges)
+        latest_start = {
+            step_id: timing.latest_start
+            for step_id, timing in compute_schedule(order_steps, edges).timings.items()
+        }
+
+        section = sections[order_steps[0]['work_order__section_id']]
+        deadline = (section['off_block_date'] - start_date).days
+        release_day = max((section['on_block_date'] - start_date).days, 0)
+
+        def key(node):
+            return node if node > 0 else (work_order_id, node)
+
+        for node, preds in order_predecessors.items():
+            node_key = key(node)
+            predecessors[node_key] = [key(pred) for pred in preds]
+            durations[node_key] = float(order_durations[node])
+            priority[node_key] = (deadline, float(latest_start.get(node, 0)), node if node > 0 else 0)
+            release[node_key] = release_day
+
+    successors = defaultdict(list)
+    remaining = {}
+    for node, preds in predecessors.items():
+        remaining[node] = len(preds)
+        for pred in preds:
+            successors[pred].append(node)
+
+    steps_by_id = {step['id']: step for step in steps}
+    capacity = {
+        work_type_id: float(work_type['crew_size'] * Decimal(work_type['standard_hours'] or 0))
+        for work_type_id, work_type in work_types.items()
+    }
+    used = defaultdict(lambda: defaultdict(float))  # 工种 -> 天 -> 已占用工时
+
+    heap = [(priority[node], str(node), node) for node, count in remaining.items() if count == 0]
+    heapq.heapify(heap)
+    ready_time = defaultdict(float)
+    finish = {}
+    while heap:
+        _, _, node = heapq.heappop(heap)
+        earliest = max(ready_time[node], release[node])
+        if isinstance(node, tuple):
+            # 虚拟阶段节点：不占用产能，等待前一阶段全部完成
+            finish[node] = ready_time[node]
+        else:
+            step = steps_by_id[node]
+            work_type_id = step['work_process__work_type_id']
+            start, end = _place(durations[node], earliest, capacity.get(work_type_id, 0), used[work_type_id])
+            finish[node] = end
+            plan.steps.append(PlannedStep(
+                step_id=node,
+                section_id=step['work_order__section_id'],
+                step_name=step['step_name'],
+                step_order=step['step_order'],
+                work_type_id=work_type_id,
+                hours=durations[node],
+                start=start,
+                finish=end,
+            ))
+        for succ in successors[node]:
+            ready_time[succ] = max(ready_time[succ], finish[node])
+            remaining[succ] -= 1
+            if remaining[succ] == 0:
+                heapq.heappush(heap, (priority[succ], str(succ), succ))
+
+    for planned in plan.steps:
+        section = sections[planned.section_id]
+        planned.start_date = start_date + timedelta(days=math.floor(planned.start))
+        planned.end_date = start_date + timedelta(days=max(math.ceil(planned.finish) - 1, math.floor(planned.start)))
+        planned.is_late = planned.end_date > section['off_block_date']
+
+        summary = plan.sections.setdefault(planned.section_id, {
+            'section_id': planned.section_id,
+            'section_number': section['section_number'],
+            'project_name': section['project__project_name'],
+            'block_number': section['block_number'],
+            'on_block_date': section['on_block_date'],
+            'off_block_date': section['off_block_date'],
+            'start_date': planned.start_date,
+            'end_date': planned.end_date,
+            'step_count': 0,
+            'is_late': False,
+        })
+        summary['start_date'] = min(summary['start_date'], planned.start_date)
+        summary['end_date'] = max(summary['end_date'], planned.end_date)
+        summary['step_count'] += 1
+        summary['is_late'] = summary['is_late'] or planned.is_late
+
+    plan.work_types = {
+        work_type_id: {
+            'work_type_name': work_type['work_type_name'],
+            'daily_capacity': capacity[work_type_id],
+        }
+        for work_type_id, work_type in work_types.items()
+    }
+    plan.daily_load = {
+        work_type_id: {start_date + timedelta(days=day): hours for day, hours in sorted(days.items())}
+        for work_type_id, days in used.items()
+        if work_type_id is not None
+    }
+    return plan
+
+
+def _place(hours, earliest, daily_capacity, used):
+    """在工种产能日历上放置一个步骤，返回 (开始时间, 完成时间)
+
+    每天的产能视为从当天 0 点开始连续占用，步骤的实际开始时间不早于当天已占用部分之后。
+    """
+    if daily_capacity <= 0:
+        return earliest, earliest + hours / DEFAULT_HOURS_PER_DAY
+    if hours <= 0:
+        return earliest, earliest
+
+    day = math.floor(earliest)
+    start = None
+    cursor = earliest
+    left = hours
+    while left > 1e-9:
+        day_start = max(cursor, day + used[day] / daily_capacity)
+        available = (day + 1 - day_start) * daily_capacity
+        if available > 1e-9:
+            take = min(available, left)
+            if start is None:
+                start = day_start
+            used[day] += take
+            left -= take
+            cursor = day_start + take / daily_capacity
+        if left > 1e-9:
+            day += 1
+            cursor = day
+    return start, cursor
+
+
+def schedule_work(project_ids=None, start_date=None):
+    """读取数据并生成作业排程"""
+    steps, sections, flow_edges, work_types = load_schedule_input(project_ids)
+    return build_work_plan(steps, sections, flow_edges, work_types, start_date)
@@ -0,0 +1,78 @@
+"""模型信号处理"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .flow_validation import validate_prerequisite_links
+from .jig_calendar import update_jig_calendar
+from .material_requirements import pallet_bucket, refresh_material_requirements, refresh_section_requirements
+from .models import Pallet, ProcessFlowStep, Section
+from .overdue_pallets import invalidate_overdue_pallets
+from .pallet_items import sync_pallet_items
+from .process_flow import refresh_critical_path_on_commit
+from .readiness import refresh_section_readiness
+from .utilization import invalidate_utilization_on_commit
+
+
+@receiver(m2m_changed, sender=ProcessFlowStep.prerequisites.through)
+def process_flow_step_prerequisites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """通过 ORM 或后台修改前置步骤时校验循环依赖，事务提交时刷新流程关键路径和拓扑序号
+
+    批量同步（sync_flow_steps）直接写中间表，不经过此信号，由其自行校验。
+    """
+    if action == 'pre_add':
+        if reverse:
+            links = [(step_id, instance.pk) for step_id in pk_set]
+        else:
+            links = [(instance.pk, prerequisite_id) for prerequisite_id in pk_set]
+        validate_prerequisite_links(links)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        refresh_critical_path_on_commit(instance.process_flow_id)
+
+
+@receiver(post_save, sender=Section)
+def section_saved(sender, instance, created, **kwargs):
+    """分段保存后更新胎架占用日历、负荷矩阵、齐套状态和物料需求汇总，逾期托盘缓存失效"""
+    update_jig_calendar(instance)
+    invalidate_utilization_on_commit()
+    refresh_section_readiness([instance.pk])
+    invalidate_overdue_pallets()
+    if not created and instance.planned_start_date != getattr(instance, '_loaded_planned_start_date', None):
+        refresh_section_requirements([instance.pk])
+    instance._loaded_planned_start_date = instance.planned_start_date
+    instance._loaded_block_number = instance.block_number
+
+
+@receiver(post_delete, sender=Section)
+def section_deleted(sender, instance, **kwargs):
+    update_jig_calendar(instance, deleted=True)
+    invalidate_utilization_on_commit()
+    invalidate_overdue_pallets()
+    # 级联删除的托盘在其信号中已无法取得分段计划开始时间，按项目重算
+    refresh_material_requirements(project_ids=[instance.project_id])
+
+
+@receiver(post_save, sender=Pallet)
+def pallet_saved(sender, instance, created, **kwargs):
+    """托盘保存后刷新所属分段（及原分段）的齐套状态和物料需求汇总，明细有变化时重建明细条目"""
+    refresh_section_readiness([instance.section_id, getattr(instance, '_loaded_section_id', None)])
+    instance._loaded_section_id = instance.section_id
+    invalidate_overdue_pallets()
+    if created or instance.pallet_details != getattr(instance, '_loaded_pallet_details', None):
+        sync_pallet_items([(instance.pk, instance.pallet_details)])
+        instance._loaded_pallet_details = instance.pallet_details
+    # 刷新托盘变化前后所在的需求周
+    loaded = getattr(instance, '_loaded_requirement', None)
+    refresh_material_requirements(buckets=[
+        pallet_bucket(instance.project_id, instance.section_id, instance.required_date),
+        pallet_bucket(*loaded) if loaded else None,
+    ])
+    instance._loaded_requirement = (instance.project_id, instance.section_id, instance.required_date)
+
+
+@receiver(post_delete, sender=Pallet)
+def pallet_deleted(sender, instance, **kwargs):
+    refresh_section_readiness([instance.section_id])
+    invalidate_overdue_pallets()
+    refresh_material_requirements(buckets=[
+        pallet_bucket(instance.project_id, instance.section_id, instance.required_date),
+    ])
@@ -0,0 +1,178 @@
+"""工艺流程工期蒙特卡洛模拟
+
+步骤工时按三角分布（最短/最可能/最长）抽样，未配置分布的步骤取预估工时定值。
+每个节点对全部抽样批次做一次向量化运算（最早完成 = 前置最早完成的最大值 + 工时），
+按拓扑顺序求出每批次的关键路径工期，再统计 P50/P80/P95。
+"""
+from datetime import timedelta
+
+from .models import ProcessFlowStep, Section
+from .process_flow import build_dependency_graph, topological_order
+from .scheduling import DEFAULT_HOURS_PER_DAY
+from .work_orders import match_process_flows
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅模拟功能需要
+    np = None
+
+DEFAULT_RUNS = 10000
+MAX_RUNS = 100000
+PERCENTILES = (50, 80, 95)
+
+
+def _require_numpy():
+    if np is None:
+        raise ValueError('蒙特卡洛模拟需要安装 numpy')
+
+
+def load_flows(process_flow_ids):
+    """一次读取多个工艺流程的步骤和前置关系，返回 {流程ID: (steps, edges)}"""
+    graphs = {process_flow_id: ([], []) for process_flow_id in process_flow_ids}
+    steps = (
+        ProcessFlowStep.objects.filter(process_flow_id__in=process_flow_ids)
+        .order_by('step_order', 'parallel_group', 'id')
+        .values('id', 'process_flow_id', 'step_order', 'parallel_group',
+                'estimated_hours', 'hours_min', 'hours_mode', 'hours_max')
+    )
+    flow_by_step = {}
+    for step in steps:
+        graphs[step['process_flow_id']][0].append(step)
+        flow_by_step[step['id']] = step['process_flow_id']
+
+    through = ProcessFlowStep.prerequisites.through
+    for step_id, prerequisite_id in through.objects.filter(
+        from_processflowstep_id__in=flow_by_step
+    ).values_list('from_processflowstep_id', 'to_processflowstep_id'):
+        graphs[flow_by_step[step_id]][1].append((step_id, prerequisite_id))
+    return graphs
+
+
+def _sample_hours(step, runs, rng):
+    """按三角分布抽样单个步骤的工时"""
+    estimated = float(step['estimated_hours'] or 0)
+    low, mode, high = step['hours_min'], step['hours_mode'], step['hours_max']
+    if low is None or high is None or high <= low:
+        return estimated
+    low, high = float(low), float(high)
+    mode = min(max(float(mode) if mode is not None else estimated, low), high)
+    return rng.triangular(low, mode, high, runs)
+
+
+def sample_flow_durations(steps, edges, runs=DEFAULT_RUNS, rng=None):
+    """抽样工艺流程的关键路径工期（小时），返回长度为 runs 的数组"""
+    _require_numpy()
+    rng = rng or np.random.default_rng()
+    durations, predecessors = build_dependency_graph(steps, edges)
+    order, successors = topological_order(predecessors, steps)
+    steps_by_id = {step['id']: step for step in steps}
+
+    total = np.zeros(runs)
+    finish = {}
+    pending = {node: len(successors[node]) for node in order}
+    for node in order:
+        start = None
+        for pred in predecessors[node]:
+            start = finish[pred] if start is None else np.maximum(start, finish[pred])
+            # 前置节点的所有后继都已计算后释放其数组，内存只与当前"前沿"大小相关
+            pending[pred] -= 1
+            if pending[pred] == 0:
+                del finish[pred]
+        hours = _sample_hours(steps_by_id[node], runs, rng) if node > 0 else 0.0
+        node_finish = (start if start is not None else np.zeros(runs)) + hours
+        np.maximum(total, node_finish, out=total)
+        if pending[node]:
+            finish[node] = node_finish
+    return total
+
+
+def summarize(samples):
+    """统计抽样结果的均值和分位数"""
+    values = np.percentile(samples, PERCENTILES)
+    summary = {f'p{percentile}': round(float(value), 2) for percentile, value in zip(PERCENTILES, values)}
+    summary['mean'] = round(float(samples.mean()), 2)
+    return summary
+
+
+def simulate_process_flow(process_flow, runs=DEFAULT_RUNS, seed=None):
+    """模拟单个工艺流程的工期分布"""
+    _require_numpy()
+    steps, edges = load_flows([process_flow.pk])[process_flow.pk]
+    samples = sample_flow_durations(steps, edges, runs, np.random.default_rng(seed))
+    result = summarize(samples)
+    result['runs'] = runs
+    result['critical_path_hours'] = float(process_flow.critical_path_hours)
+    result['serial_hours'] = float(process_flow.estimated_total_hours)
+    return result
+
+
+def simulate_project(project, runs=DEFAULT_RUNS, seed=None, hours_per_day=DEFAULT_HOURS_PER_DAY):
+    """模拟项目各分段及整体的完工日期分布
+
+    分段自上胎日期开工，工期按 hours_per_day 折算为天；优先使用分段已生成工单的工艺流程，
+    否则按分段类型和项目船型匹配。相同流程只抽样一次，各分段使用其随机重排以保持相互独立。
+    """
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    sections = list(
+        Section.objects.filter(project=project, is_active=True)
+        .order_by('section_number')
+        .values('id', 'section_number', 'section_type_id', 'on_block_date', 'off_block_date',
+                'work_order__process_flow_id')
+    )
+    matched = match_process_flows(project.ship_type_id, {section['section_type_id'] for section in sections})
+    flow_ids = {
+        section['work_order__process_flow_id'] or getattr(matched.get(section['section_type_id']), 'id', None)
+        for section in sections
+    } - {None}
+    graphs = load_flows(flow_ids)
+    flow_samples = {
+        process_flow_id: sample_flow_durations(steps, edges, runs, rng)
+        for process_flow_id, (steps, edges) in graphs.items()
+    }
+
+    origin = min((section['on_block_date'] for section in sections), default=project.delivery_date)
+    completion = None
+    section_results = []
+    missing = []
+    for section in sections:
+        process_flow_id = section['work_order__process_flow_id'] or getattr(matched.get(section['section_type_id']), 'id', None)
+        if process_flow_id is None:
+            missing.append(section['section_number'])
+            continue
+        hours = rng.permutation(flow_samples[process_flow_id])
+        # 以最早上胎日期为原点的完工天数
+        finish_days = (section['on_block_date'] - origin).days + hours / hours_per_day
+        completion = finish_days if completion is None else np.maximum(completion, finish_days)
+
+        deadline = (section['off_block_date'] - origin).days + 1
+        percentiles = np.percentile(finish_days, PERCENTILES)
+        section_results.append({
+            'section_number': section['section_number'],
+            'on_block_date': section['on_block_date'].isoformat(),
+            'off_block_date': section['off_block_date'].isoformat(),
+            **{f'p{p}_hours': round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(hours, PERCENTILES))},
+            **{f'p{p}_finish_date': _to_date(origin, v).isoformat() for p, v in zip(PERCENTILES, percentiles)},
+            'on_time_probability': round(float((finish_days <= deadline).mean()), 4),
+        })
+
+    result = {
+        'project_name': project.project_name,
+        'delivery_date': project.delivery_date.isoformat(),
+        'runs': runs,
+        'sections': section_results,
+        'sections_without_flow': missing,
+    }
+    if completion is not None:
+        deadline = (project.delivery_date - origin).days + 1
+        result.update({
+            **{f'p{p}_completion_date': _to_date(origin, v).isoformat()
+               for p, v in zip(PERCENTILES, np.percentile(completion, PERCENTILES))},
+            'on_time_probability': round(float((completion <= deadline).mean()), 4),
+        })
+    return result
+
+
+def _to_date(origin, days):
+    """完工天数（可为小数）折算为完工日期"""
+    return origin + timedelta(days=max(int(np.ceil(days)) - 1, 0))
@@ -1,3 +1,284 @@
-from django.test import TestCase
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from .importers import estimate_rows, import_sections
+from .jig_calendar import check_jig_available
+from .models import (
+    Pallet, ProcessFlowStep, Project, Section, ShipType, StandardProcessFlow, TypicalSection, WorkProcess, WorkType,
+)
+from .process_flow import (
+    ProcessFlowCycleError, analyze_process_flow, compute_schedule, refresh_critical_path, sync_flow_steps,
+)
+
+SECTION_HEADER = '分段号,项目名称,分段类型,计划开始时间,上胎日期,下胎日期,结束时间,胎架号\n'
+
+
+class CriticalPathTests(TestCase):
+    """关键路径计算（虚拟阶段节点）"""
+
+    @staticmethod
+    def step(step_id, step_order, hours, parallel_group=0):
+        return {'id': step_id, 'step_order': step_order, 'parallel_group': parallel_group,
+                'estimated_hours': Decimal(hours)}
+
+    def test_parallel_stage_waits_for_longest_step(self):
+        steps = [self.step(1, 1, 2), self.step(2, 2, 3, 1), self.step(3, 3, 5, 1), self.step(4, 4, 1)]
+        schedule = compute_schedule(steps, [])
+        self.assertEqual(schedule.serial_hours, Decimal('11'))
+        self.assertEqual(schedule.critical_path_hours, Decimal('8'))
+        self.assertEqual(schedule.critical_path, [1, 3, 4])
+        self.assertEqual(schedule.timings[2].slack, Decimal('2'))
+        self.assertEqual(schedule.timings[4].earliest_start, Decimal('7'))
+        # 虚拟阶段节点不出现在结果中
+        self.assertTrue(all(node > 0 for node in schedule.order))
+
+    def test_explicit_prerequisites_override_stage_order(self):
+        steps = [self.step(1, 1, 2), self.step(2, 2, 3), self.step(3, 3, 4)]
+        # 步骤3只依赖步骤1，可与步骤2并行
+        schedule = compute_schedule(steps, [(3, 1)])
+        self.assertEqual(schedule.critical_path_hours, Decimal('6'))
+        self.assertEqual(schedule.critical_path, [1, 3])
+
+    def test_cycle_names_steps_by_order(self):
+        steps = [self.step(1, 1, 1), self.step(2, 2, 1), self.step(3, 3, 1)]
+        with self.assertRaises(ProcessFlowCycleError) as context:
+            compute_schedule(steps, [(1, 2), (2, 1)])
+        self.assertEqual(context.exception.step_ids, [1, 2])
+        self.assertIn('步骤1', str(context.exception))
+        self.assertNotIn('步骤3', str(context.exception))
+
+
+class FlowTestMixin:
+    """工艺流程测试的公共数据"""
+
+    def setUp(self):
+        ship_type = ShipType.objects.create(ship_type='散货船')
+        self.section_type = TypicalSection.objects.create(ship_type=ship_type, section_name='双层底')
+        self.ship_type = ship_type
+        work_type = WorkType.objects.create(work_type_name='焊接工', work_type_code='W', standard_hours=Decimal('8'))
+        self.work_process = WorkProcess.objects.create(
+            process_name='焊接', process_code='W1', work_type=work_type, coefficient=Decimal('1'))
+
+    def create_flow(self, name='标准流程'):
+        return StandardProcessFlow.objects.create(
+            name=name, ship_type=self.ship_type, typical_section=self.section_type)
+
+    def add_step(self, flow, step_order, hours, parallel_group=0):
+        return ProcessFlowStep.objects.create(
+            process_flow=flow, work_process=self.work_process, step_name=f'步骤{step_order}',
+            step_order=step_order, parallel_group=parallel_group, estimated_hours=Decimal(hours))
+
+
+class FlowHoursTests(FlowTestMixin, TransactionTestCase):
+    """步骤增删改后按差值维护的总工时与全量重算一致（关键路径在事务提交时重算，需真实提交）"""
+
+    def assertMatchesFullRecompute(self, flow):
+        flow.refresh_from_db()
+        schedule = analyze_process_flow(flow.pk)
+        self.assertEqual(flow.estimated_total_hours, schedule.serial_hours)
+        self.assertEqual(flow.critical_path_hours, schedule.critical_path_hours)
+
+    def test_single_step_changes(self):
+        flow = self.create_flow()
+        first = self.add_step(flow, 1, 2)
+        second = self.add_step(flow, 2, 3, parallel_group=1)
+        self.add_step(flow, 3, 4, parallel_group=1)
+        self.assertMatchesFullRecompute(flow)
+
+        step = ProcessFlowStep.objects.get(pk=second.pk)
+        step.estimated_hours = Decimal('9')
+        step.save()
+        self.assertMatchesFullRecompute(flow)
+
+        first.delete()
+        self.assertMatchesFullRecompute(flow)
+        self.assertEqual(flow.critical_path_hours, Decimal('9'))
+
+    def test_bulk_edits_refresh_once_per_flow(self):
+        flow = self.create_flow()
+        steps = [self.add_step(flow, order, order) for order in range(1, 5)]
+        with mock.patch('drawings.process_flow.refresh_critical_path', wraps=refresh_critical_path) as refresh:
+            with transaction.atomic():
+                for step in ProcessFlowStep.objects.filter(process_flow=flow):
+                    step.estimated_hours = Decimal('2')
+                    step.save()
+                steps[3].prerequisites.add(steps[0])
+                self.assertEqual(refresh.call_count, 0)
+        refresh.assert_called_once_with(flow.pk)
+        self.assertMatchesFullRecompute(flow)
+
+    def test_sync_flow_steps(self):
+        flow = self.create_flow()
+        existing = self.add_step(flow, 1, 5)
+        rows = [
+            {'step_id': existing.pk, 'step_name': '下料', 'work_process_id': self.work_process.pk, 'step_order': 2,
+             'parallel_group': 0, 'estimated_hours': Decimal('5'), 'description': '', 'prerequisite_orders': []},
+            {'step_id': None, 'step_name': '装配', 'work_process_id': self.work_process.pk, 'step_order': 1,
+             'parallel_group': 0, 'estimated_hours': Decimal('3'), 'description': '', 'prerequisite_orders': []},
+            {'step_id': None, 'step_name': '焊接', 'work_process_id': self.work_process.pk, 'step_order': 3,
+             'parallel_group': 0, 'estimated_hours': Decimal('4'), 'description': '', 'prerequisite_orders': [1]},
+        ]
+        sync_flow_steps(flow, rows)
+        self.assertEqual(ProcessFlowStep.objects.get(pk=existing.pk).step_order, 2)
+        welding = ProcessFlowStep.objects.get(process_flow=flow, step_order=3)
+        self.assertEqual([step.step_order for step in welding.prerequisites.all()], [1])
+        self.assertMatchesFullRecompute(flow)
+        self.assertEqual(flow.critical_path_hours, Decimal('8'))
+
+
+class PrerequisiteValidationTests(FlowTestMixin, TestCase):
+    """新增前置关系时的增量循环校验"""
+
+    def setUp(self):
+        super().setUp()
+        self.flow = self.create_flow()
+        self.steps = [self.add_step(self.flow, order, 1) for order in range(1, 5)]
+
+    def assertRejected(self, step, prerequisite, exception=ProcessFlowCycleError, message=''):
+        # m2m add 不创建保存点，异常后需回滚外层事务
+        with self.assertRaisesMessage(exception, message), transaction.atomic():
+            step.prerequisites.add(prerequisite)
+        self.assertFalse(step.prerequisites.filter(pk=prerequisite.pk).exists())
+
+    def test_forward_link_accepted(self):
+        self.steps[3].prerequisites.add(self.steps[0])
+        self.assertEqual(list(self.steps[3].prerequisites.all()), [self.steps[0]])
+
+    def test_cycle_rejected(self):
+        # 按执行顺序 1→2→3→4 推导依赖，步骤2以步骤4为前置构成循环
+        self.assertRejected(self.steps[1], self.steps[3], message='步骤2（焊接）')
+
+    def test_cycle_rejected_after_reordering_in_same_transaction(self):
+        # 同一并行组的两个步骤互不依赖；第一条前置关系调整了拓扑编号而关键路径尚未重算，
+        # 第二条仍需按调整后的编号检出循环
+        first = self.add_step(self.flow, 5, 1, parallel_group=2)
+        second = self.add_step(self.flow, 6, 1, parallel_group=2)
+        first.prerequisites.add(second)
+        self.assertRejected(second, first)
+
+    def test_cross_flow_and_self_reference_rejected(self):
+        other = self.add_step(self.create_flow('其他流程'), 1, 1)
+        self.assertRejected(self.steps[0], other, ValueError, '必须属于同一工艺流程')
+        self.assertRejected(self.steps[0], self.steps[0], ValueError, '不能以自身作为前置步骤')
+
+
+class SectionTestMixin:
+    """分段/胎架测试的公共数据"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ship_type = ShipType.objects.create(ship_type='散货船')
+        cls.section_type = TypicalSection.objects.create(ship_type=ship_type, section_name='双层底')
+        cls.project = Project.objects.create(
+            project_name='P1', ship_type=ship_type, classification_society='CCS', delivery_date=date(2027, 1, 1))
+
+    def create_section(self, section_number, block_number, on_block_date, off_block_date, **fields):
+        return Section.objects.create(
+            section_number=section_number, project=self.project, section_type=self.section_type,
+            planned_start_date=on_block_date, on_block_date=on_block_date, off_block_date=off_block_date,
+            end_date=off_block_date, block_number=block_number, **fields)
+
+    @staticmethod
+    def csv_file(*lines):
+        return io.BytesIO((SECTION_HEADER + ''.join(f'{line}\n' for line in lines)).encode('utf-8'))
+
+
+class JigOverlapTests(SectionTestMixin, TestCase):
+    """胎架占用冲突检测"""
+
+    def setUp(self):
+        self.section = self.create_section('S1', 'J1', date(2026, 3, 1), date(2026, 3, 10))
+
+    def test_overlap_detected(self):
+        with self.assertRaisesMessage(ValueError, 'S1'):
+            check_jig_available('J1', date(2026, 3, 10), date(2026, 3, 12))
+        check_jig_available('J1', date(2026, 3, 11), date(2026, 3, 12))
+        check_jig_available('J2', date(2026, 3, 1), date(2026, 3, 10))
+        check_jig_available('J1', date(2026, 3, 1), date(2026, 3, 10), exclude_id=self.section.pk)
+
+    def test_calendar_follows_section_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.section.block_number = 'J2'
+            self.section.save()
+        check_jig_available('J1', date(2026, 3, 1), date(2026, 3, 10))
+        with self.assertRaises(ValueError):
+            check_jig_available('J2', date(2026, 3, 5), date(2026, 3, 6))
+
+    def test_import_rejects_overlap_with_existing_section(self):
+        result = import_sections(self.csv_file('S2,P1,双层底,2026-03-05,2026-03-05,2026-03-06,2026-03-06,J1'),
+                                 'sections.csv')
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors, [(2, '胎架J1在该期间已被分段S1占用')])
+
+    def test_import_rejects_overlap_within_batch(self):
+        result = import_sections(self.csv_file(
+            'S2,P1,双层底,2026-04-01,2026-04-01,2026-04-05,2026-04-05,J3',
+            'S3,P1,双层底,2026-04-03,2026-04-03,2026-04-08,2026-04-08,J3',
+        ), 'sections.csv')
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, '胎架J3在该期间已被分段S2占用')])
+
+
+class SectionUpsertTests(SectionTestMixin, TestCase):
+    """按分段号新增并更新"""
+
+    def test_upsert_keyed_on_section_number(self):
+        self.create_section('S1', 'J1', date(2026, 3, 1), date(2026, 3, 10))
+        self.create_section('S2', 'J2', date(2026, 3, 1), date(2026, 3, 10))
+        result = import_sections(self.csv_file(
+            'S1,P1,双层底,2026-03-01,2026-03-01,2026-03-10,2026-03-10,J1',
+            'S2,P1,双层底,2026-03-01,2026-03-01,2026-03-12,2026-03-12,J2',
+            'S3,P1,双层底,2026-03-01,2026-03-01,2026-03-10,2026-03-10,J3',
+        ), 'sections.csv', upsert=True)
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+        self.assertEqual(result.errors, [])
+        self.assertEqual(Section.objects.get(section_number='S2').off_block_date, date(2026, 3, 12))
+        self.assertEqual(Section.objects.count(), 3)
+
+    def test_existing_rows_rejected_without_upsert(self):
+        self.create_section('S1', 'J1', date(2026, 3, 1), date(2026, 3, 10))
+        result = import_sections(self.csv_file('S1,P1,双层底,2026-03-01,2026-03-01,2026-03-10,2026-03-10,J1'),
+                                 'sections.csv')
+        self.assertEqual(result.errors, [(2, '分段号已存在：S1')])
+
+
+class ImportProgressTests(TestCase):
+    """后台导入任务的预计行数"""
+
+    def test_estimate_rows_counts_last_line_without_newline(self):
+        self.assertEqual(estimate_rows(io.BytesIO(b'h\na\nb'), 'sections.csv'), 2)
+        self.assertEqual(estimate_rows(io.BytesIO(b'h\na\nb\n'), 'sections.csv'), 2)
+        self.assertEqual(estimate_rows(io.BytesIO(b'h'), 'sections.csv'), 0)
+
+
+class ReadinessTests(SectionTestMixin, TestCase):
+    """托盘变化后分段齐套状态"""
+
+    def test_pallet_move_refreshes_both_sections(self):
+        received = {'model_received': True, 'bom_received': True, 'start_conditions_met': True}
+        first = self.create_section('S1', 'J1', date(2026, 3, 1), date(2026, 3, 10), **received)
+        second = self.create_section('S2', 'J2', date(2026, 3, 1), date(2026, 3, 10), **received)
+        pallet = Pallet.objects.create(pallet_code='T1', pallet_name='托盘1', project=self.project, section=first,
+                                       pallet_details='c1')
+        first.refresh_from_db()
+        self.assertFalse(first.is_ready)
+        self.assertEqual(first.pending_pallet_count, 1)
+
+        pallet = Pallet.objects.get(pk=pallet.pk)
+        pallet.section = second
+        pallet.save()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.is_ready)
+        self.assertEqual(first.pallet_count, 0)
+        self.assertFalse(second.is_ready)
+
+        pallet.is_received = True
+        pallet.save()
+        second.refresh_from_db()
+        self.assertTrue(second.is_ready)
@@ -0,0 +1,86 @@
+"""分段时间轴（计划开始 → 上胎 → 下胎 → 结束）
+
+只返回可见日期窗口内、当前一页的分段：按 (上胎日期, ID) 做键集分页，
+下一页从上一页最后一行之后继续（WHERE (上胎日期, ID) > 游标），不使用 OFFSET，
+翻到多深都只扫描一页的索引范围。
+
+返回按列组织的紧凑数据：日期编码为相对窗口起点的天数，项目名称单独列一张表，
+前端按项目或胎架分组绘制，滚动到底部时带上 next 游标请求下一页。
+"""
+from datetime import date, timedelta
+
+from django.db.models import Q
+
+from .models import Section
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+DEFAULT_WINDOW_DAYS = 180
+
+
+def encode_cursor(on_block_date, section_id):
+    return f'{on_block_date:%Y%m%d}.{section_id}'
+
+
+def decode_cursor(cursor):
+    """解析游标，格式错误时抛出 ValueError"""
+    day, _, section_id = (cursor or '').partition('.')
+    if len(day) != 8 or not day.isdigit() or not section_id.isdigit():
+        raise ValueError('无效的分页游标')
+    return date(int(day[:4]), int(day[4:6]), int(day[6:])), int(section_id)
+
+
+def default_window(today=None):
+    start = (today or date.today()) - timedelta(days=30)
+    return start, start + timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+
+
+def section_timeline_page(start, end, project_ids=None, cursor=None, limit=DEFAULT_LIMIT):
+    """时间轴的一页数据（只包含与 [start, end] 有交集的启用分段）"""
+    limit = max(1, min(limit, MAX_LIMIT))
+    sections = Section.objects.filter(is_active=True, planned_start_date__lte=end, end_date__gte=start)
+    if project_ids:
+        sections = sections.filter(project_id__in=project_ids)
+    if cursor:
+        on_block_date, section_id = decode_cursor(cursor)
+        sections = sections.filter(
+            Q(on_block_date__gt=on_block_date) | Q(on_block_date=on_block_date, id__gt=section_id)
+        )
+    # 多取一行判断是否还有下一页
+    rows = list(
+        sections.order_by('on_block_date', 'id').values_list(
+            'id', 'section_number', 'project_id', 'project__project_name', 'block_number',
+            'planned_start_date', 'on_block_date', 'off_block_date', 'end_date', 'is_ready',
+        )[:limit + 1]
+    )
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    project_index = {}
+    projects = []
+    for row in rows:
+        if row[2] not in project_index:
+            project_index[row[2]] = len(projects)
+            projects.append([row[2], row[3]])
+
+    def offsets(position):
+        return [(row[position] - start).days for row in rows]
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'count': len(rows),
+        'next': encode_cursor(rows[-1][6], rows[-1][0]) if has_next else None,
+        'projects': projects,
+        'columns': {
+            'id': [row[0] for row in rows],
+            'section_number': [row[1] for row in rows],
+            'project': [project_index[row[2]] for row in rows],
+            'block_number': [row[4] for row in rows],
+            'planned_start': offsets(5),
+            'on_block': offsets(6),
+            'off_block': offsets(7),
+            'end': offsets(8),
+            'is_ready': [int(row[9]) for row in rows],
+        },
+    }
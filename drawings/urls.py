@@ -60,12 +60,21 @@ urlpatterns = [
     path('standard-process-flow/<int:process_flow_id>/edit/', views.standard_process_flow_edit, name='standard_process_flow_edit'),
     path('standard-process-flow/<int:process_flow_id>/delete/', views.standard_process_flow_delete, name='standard_process_flow_delete'),
     path('standard-process-flow/<int:process_flow_id>/detail/', views.standard_process_flow_detail, name='standard_process_flow_detail'),
+    path('standard-process-flow/<int:process_flow_id>/diagram/<slug:digest>.svg', views.standard_process_flow_diagram, name='standard_process_flow_diagram'),
+    path('standard-process-flow/<int:process_flow_id>/simulation/', views.standard_process_flow_simulation, name='standard_process_flow_simulation'),
     
     # 项目管理
     path('project/', views.project_list, name='project_list'),
     path('project/add/', views.project_add, name='project_add'),
     path('project/<int:project_id>/edit/', views.project_edit, name='project_edit'),
     path('project/<int:project_id>/delete/', views.project_delete, name='project_delete'),
+    path('project/<int:project_id>/work-orders/', views.project_work_orders, name='project_work_orders'),
+    path('project/<int:project_id>/simulation/', views.project_simulation, name='project_simulation'),
+    path('project/<int:project_id>/jig-allocation/', views.project_jig_allocation, name='project_jig_allocation'),
+    
+    # 作业排程
+    path('schedule/', views.work_schedule, name='work_schedule'),
+    path('schedule/json/', views.work_schedule_json, name='work_schedule_json'),
     
     # 分段管理
     path('section/', views.section_list, name='section_list'),
@@ -73,9 +82,19 @@ urlpatterns = [
     path('section/<int:section_id>/edit/', views.section_edit, name='section_edit'),
     path('section/<int:section_id>/delete/', views.section_delete, name='section_delete'),
     path('section/import/', views.section_import, name='section_import'),
+    path('section/import/report/<slug:token>.xlsx', views.section_import_report, name='section_import_report'),
+    path('import-job/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
+    path('section/jig-free/', views.jig_free_slots, name='jig_free_slots'),
+    path('section/utilization/', views.jig_utilization, name='jig_utilization'),
+    path('section/utilization/json/', views.jig_utilization_json, name='jig_utilization_json'),
+    path('section/timeline/', views.section_timeline, name='section_timeline'),
+    path('section/timeline/json/', views.section_timeline_json, name='section_timeline_json'),
     
     # 托盘管理
     path('pallet/', views.pallet_list, name='pallet_list'),
+    path('pallet/material-requirements/', views.material_requirement_report, name='material_requirement_report'),
+    path('pallet/overdue/', views.overdue_pallet_report, name='overdue_pallet_report'),
+    path('pallet/receive/', views.pallet_bulk_receive, name='pallet_bulk_receive'),
     path('pallet/add/', views.pallet_add, name='pallet_add'),
     path('pallet/<int:pallet_id>/edit/', views.pallet_edit, name='pallet_edit'),
     path('pallet/<int:pallet_id>/delete/', views.pallet_delete, name='pallet_delete'),
@@ -0,0 +1,135 @@
+"""胎架/项目负荷热力图
+
+以今天为起点、HORIZON_DAYS 天为范围，用 NumPy 一次性构建两个矩阵：
+- 胎架 × 天：当天在该胎架上的分段数（>1 表示重复占用）；
+- 项目 × 天：当天在胎的分段数。
+
+构建时对每个分段只在差分数组的上胎列 +1、下胎次日列 -1，再沿天数方向累加，
+整体为 O(分段数 + 胎架数 × 天数)。热力图页面和 JSON 接口直接读取缓存的矩阵，不查询分段表；
+分段保存/删除后矩阵在事务提交时失效，下次读取时一次查询重建。日期翻天后自动重建。
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Section
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅负荷热力图需要
+    np = None
+
+HORIZON_DAYS = 90
+CACHE_KEY = 'jig_utilization'
+
+
+def _require_numpy():
+    if np is None:
+        raise ValueError('负荷热力图需要安装 numpy')
+
+
+@dataclass
+class UtilizationMatrix:
+    """胎架/项目 × 天 的在胎分段数矩阵"""
+    start_date: date
+    days: int = HORIZON_DAYS
+    jigs: list = field(default_factory=list)
+    projects: list = field(default_factory=list)  # [(项目ID, 项目名称), ...]
+    jig_load: object = None
+    project_load: object = None
+
+    @property
+    def dates(self):
+        return [self.start_date + timedelta(days=offset) for offset in range(self.days)]
+
+
+def build_utilization(start_date=None, days=HORIZON_DAYS):
+    """从启用的分段构建负荷矩阵（一次查询）"""
+    _require_numpy()
+    start_date = start_date or date.today()
+    end_date = start_date + timedelta(days=days - 1)
+    rows = list(
+        Section.objects.filter(is_active=True).exclude(block_number='')
+        .overlapping(start_date, end_date)
+        .values_list('id', 'block_number', 'project_id', 'project__project_name', 'on_block_date', 'off_block_date')
+    )
+
+    jigs = sorted({row[1] for row in rows})
+    projects = sorted({(row[2], row[3]) for row in rows}, key=lambda project: project[1])
+    jig_index = {jig: index for index, jig in enumerate(jigs)}
+    project_index = {project[0]: index for index, project in enumerate(projects)}
+
+    count = len(rows)
+    jig_rows = np.fromiter((jig_index[row[1]] for row in rows), np.int32, count)
+    project_rows = np.fromiter((project_index[row[2]] for row in rows), np.int32, count)
+    first = np.fromiter((max((row[4] - start_date).days, 0) for row in rows), np.int32, count)
+    last = np.fromiter((min((row[5] - start_date).days, days - 1) for row in rows), np.int32, count)
+
+    def accumulate(row_index, height):
+        # 差分数组多留一列，下胎次日列 -1 后沿天数方向累加
+        diff = np.zeros((height, days + 1), np.int32)
+        np.add.at(diff, (row_index, first), 1)
+        np.add.at(diff, (row_index, last + 1), -1)
+        return np.cumsum(diff[:, :days], axis=1, dtype=np.int32)
+
+    return UtilizationMatrix(
+        start_date=start_date,
+        days=days,
+        jigs=jigs,
+        projects=projects,
+        jig_load=accumulate(jig_rows, len(jigs)),
+        project_load=accumulate(project_rows, len(projects)),
+    )
+
+
+def _timeout():
+    return getattr(settings, 'JIG_UTILIZATION_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_utilization():
+    """读取缓存的负荷矩阵，日期翻天或未缓存时重建"""
+    matrix = cache.get(CACHE_KEY)
+    if matrix is None or matrix.start_date != date.today():
+        matrix = build_utilization()
+        cache.set(CACHE_KEY, matrix, _timeout())
+    return matrix
+
+
+def invalidate_utilization():
+    cache.delete(CACHE_KEY)
+
+
+def invalidate_utilization_on_commit():
+    """分段保存/删除后使负荷矩阵失效，事务提交后再失效一次
+
+    不在缓存中读取-修改-写回整个矩阵：并发保存不会互相覆盖，回滚的保存也不会留在热力图中。
+    """
+    invalidate_utilization()
+    transaction.on_commit(invalidate_utilization)
+
+
+def utilization_summary(matrix):
+    """汇总每行的占用天数和峰值，供页面和 JSON 共用"""
+    def rows(names, load):
+        busy_days = (load > 0).sum(axis=1) if len(names) else []
+        peaks = load.max(axis=1) if len(names) else []
+        return [
+            {
+                'name': name,
+                'load': load[index].tolist(),
+                'busy_days': int(busy_days[index]),
+                'utilization': round(float(busy_days[index]) / matrix.days, 4),
+                'peak': int(peaks[index]),
+            }
+            for index, name in enumerate(names)
+        ]
+
+    return {
+        'start_date': matrix.start_date,
+        'dates': matrix.dates,
+        'jigs': rows(matrix.jigs, matrix.jig_load),
+        'projects': rows([name for _, name in matrix.projects], matrix.project_load),
+    }
@@ -1,8 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header, urlencode
 from django.db import models
+from django.db.models import ProtectedError
 from django.core.paginator import Paginator
-from .models import Role, Person, Permission, RolePermission, PersonRole, ShipType, TypicalSection, WorkType, WorkProcess, Project, Section, Pallet
+from .models import Role, Person, Permission, RolePermission, PersonRole, ShipType, TypicalSection, WorkType, WorkProcess, Project, Section, Pallet, PalletItem, MaterialRequirement, ImportJob, SectionWorkOrder, SectionWorkStep
+from .import_jobs import background_threshold, create_import_job, job_status
+from .import_validation import error_workbook_name, error_workbook_path, save_error_workbook, validate_sections
+from .importers import import_pallets, import_sections
+from .jig_allocation import apply_jig_allocation, propose_jig_allocation
+from .jig_calendar import check_jig_available, get_jig_calendar
+from .material_requirements import week_start
+from .overdue_pallets import DEFAULT_DAYS as OVERDUE_DEFAULT_DAYS, MAX_DAYS as OVERDUE_MAX_DAYS, get_overdue_pallets, overdue_report
+from .pallet_items import normalize_part_code, pallets_containing
+from .pallet_receiving import MAX_CODES, parse_pallet_codes, receive_pallets
+from .process_flow import ProcessFlowCycleError
+from .scheduling import schedule_work
+from .timeline import DEFAULT_LIMIT, default_window, section_timeline_page
+from .utilization import get_utilization, utilization_summary
+from .work_hours import propagate_work_process_hours, propagate_work_type_hours
+from .work_orders import generate_work_orders
 
 # Create your views here.
 
@@ -518,11 +536,17 @@ def work_type_add(request):
             except (ValueError, TypeError):
                 raise ValueError("标准工时必须是有效的数字")
             
+            crew_size_str = request.POST.get('crew_size') or '1'
+            if not crew_size_str.isdigit():
+                raise ValueError("班组人数必须是非负整数")
+            crew_size = int(crew_size_str)
+            
             # 创建作业工种
             work_type = WorkType.objects.create(
                 work_type_name=work_type_name,
                 work_type_code=work_type_code,
                 standard_hours=standard_hours,
+                crew_size=crew_size,
                 description=description,
                 is_active=is_active
             )
@@ -559,14 +583,25 @@ def work_type_edit(request, work_type_id):
             except (ValueError, TypeError):
                 raise ValueError("标准工时必须是有效的数字")
             
+            crew_size_str = request.POST.get('crew_size') or '1'
+            if not crew_size_str.isdigit():
+                raise ValueError("班组人数必须是非负整数")
+            crew_size = int(crew_size_str)
+            
             # 更新作业工种
+            standard_hours_changed = work_type.standard_hours != standard_hours
             work_type.work_type_name = work_type_name
             work_type.work_type_code = work_type_code
             work_type.standard_hours = standard_hours
+            work_type.crew_size = crew_size
             work_type.description = description
             work_type.is_active = is_active
             work_type.save()
             
+            # 标准工时变化时批量同步工序工时、步骤工时和流程总工时
+            if standard_hours_changed:
+                propagate_work_type_hours([work_type.id])
+            
             # 重定向到作业工种列表页面
             return redirect('drawings:work_type_list')
             
@@ -583,11 +618,33 @@ def work_type_edit(request, work_type_id):
     })
 
 
+def _protected_work_orders(error, limit=10):
+    """阻止删除的分段作业工单（按分段号列出）"""
+    step_ids = [obj.pk for obj in error.protected_objects if isinstance(obj, SectionWorkStep)]
+    section_numbers = list(
+        SectionWorkOrder.objects.filter(steps__id__in=step_ids).values_list('section__section_number', flat=True)
+        .distinct().order_by('section__section_number')
+    )
+    names = '、'.join(section_numbers[:limit])
+    if len(section_numbers) > limit:
+        names += f' 等{len(section_numbers)}个分段'
+    return names
+
+
 def work_type_delete(request, work_type_id):
     """删除作业工种"""
     work_type = get_object_or_404(WorkType, id=work_type_id)
     if request.method == 'POST':
-        work_type.delete()
+        # 工种删除会级联删除其工序和流程步骤，删除后同样校正受影响流程的总工时
+        affected_flow_ids = list(
+            ProcessFlowStep.objects.filter(work_process__work_type=work_type).values_list('process_flow_id', flat=True).distinct()
+        )
+        try:
+            work_type.delete()
+        except ProtectedError as e:
+            messages.error(request, f'作业工种"{work_type.work_type_name}"的工序已用于分段作业工单，无法删除：{_protected_work_orders(e)}')
+            return redirect('drawings:work_type_list')
+        reconcile_flow_hours(affected_flow_ids)
         return redirect('drawings:work_type_list')
     return render(request, 'drawings/work_type/delete.html', {'work_type': work_type})
 
@@ -717,6 +774,9 @@ def work_process_edit(request, process_id):
             work_process.is_active = is_active
             work_process.save()
             
+            # 同步沿用该工序工时的工艺流程步骤
+            propagate_work_process_hours([work_process.id])
+            
             # 重定向到作业工序列表页面
             return redirect('/work-process/')
             
@@ -741,7 +801,16 @@ def work_process_delete(request, process_id):
     """删除作业工序"""
     work_process = get_object_or_404(WorkProcess, id=process_id)
     if request.method == 'POST':
-        work_process.delete()
+        # 级联删除的步骤不经过增量维护，删除后校正受影响流程的总工时
+        affected_flow_ids = list(
+            ProcessFlowStep.objects.filter(work_process=work_process).values_list('process_flow_id', flat=True).distinct()
+        )
+        try:
+            work_process.delete()
+        except ProtectedError as e:
+            messages.error(request, f'作业工序"{work_process.process_name}"已用于分段作业工单，无法删除：{_protected_work_orders(e)}')
+            return redirect('/work-process/')
+        reconcile_flow_hours(affected_flow_ids)
         return redirect('/work-process/')
     return render(request, 'drawings/work_process/delete.html', {'work_process': work_process})
 
@@ -897,22 +966,230 @@ def project_delete(request, project_id):
     return render(request, 'drawings/project/delete.html', {'project': project})
 
 
-# 分段管理视图
-def section_list(request):
-    """分段管理列表"""
-    sections = Section.objects.all().select_related('project', 'section_type')
+def project_work_orders(request, project_id):
+    """项目分段作业工单：按标准工艺流程批量生成"""
+    project = get_object_or_404(Project.objects.select_related('ship_type'), id=project_id)
+    result = None
+    error_message = None
+    if request.method == 'POST':
+        try:
+            result = generate_work_orders(project, replace=request.POST.get('replace') == '1')
+        except Exception as e:
+            error_message = f'生成失败：{str(e)}'
     
-    # 搜索和筛选功能
+    # 各分段的工单概况
+    sections = (
+        Section.objects.filter(project=project, is_active=True)
+        .select_related('section_type', 'work_order__process_flow')
+        .annotate(step_count=models.Count('work_order__steps'))
+        .order_by('section_number')
+    )
+    
+    paginator = Paginator(sections, 20)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    
+    context = {
+        'project': project,
+        'page_obj': page_obj,
+        'result': result,
+        'error_message': error_message,
+    }
+    return render(request, 'drawings/project/work_orders.html', context)
+
+
+def project_jig_allocation(request, project_id):
+    """项目胎架自动分配：为未分配胎架的分段生成分配方案，确认后批量写入"""
+    project = get_object_or_404(Project, id=project_id)
+    data = request.POST if request.method == 'POST' else request.GET
+    # 可用胎架号，逗号/空格分隔；为空时使用已有分段用过的全部胎架
+    jigs_text = data.get('jigs', '').strip()
+    jigs = [jig for jig in jigs_text.replace('，', ',').replace(',', ' ').split() if jig]
+    
+    if request.method == 'POST':
+        try:
+            allocation = apply_jig_allocation(project, jigs)
+            messages.success(request, f'已为 {len(allocation.assignments)} 个分段分配胎架！')
+            if allocation.unassigned:
+                messages.warning(request, f'{len(allocation.unassigned)} 个分段在上胎期间没有空闲胎架，未分配')
+        except Exception as e:
+            messages.error(request, f'分配失败：{str(e)}')
+        response = redirect('drawings:project_jig_allocation', project_id=project.id)
+        if jigs_text:
+            response['Location'] += '?' + urlencode({'jigs': jigs_text})
+        return response
+    
+    allocation = propose_jig_allocation(project, jigs)
+    context = {
+        'project': project,
+        'allocation': allocation,
+        'jigs_text': jigs_text,
+    }
+    return render(request, 'drawings/project/jig_allocation.html', context)
+
+
+def _parse_schedule_params(request):
+    """解析作业排程的筛选参数"""
+    from datetime import datetime
+    project_filter = [project_id for project_id in request.GET.getlist('project') if project_id.isdigit()]
+    start_date_str = request.GET.get('start_date', '')
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
+    return project_filter, start_date
+
+
+def _schedule_error(request, error_message):
+    """排程参数或工单数据有误时只显示筛选条件和错误信息"""
+    return render(request, 'drawings/schedule/index.html', {
+        'error_message': error_message,
+        'projects': Project.objects.filter(is_active=True),
+        'project_filter': [project_id for project_id in request.GET.getlist('project') if project_id.isdigit()],
+    })
+
+
+def work_schedule(request):
+    """作业排程（资源约束）"""
+    try:
+        project_filter, start_date = _parse_schedule_params(request)
+    except ValueError:
+        return _schedule_error(request, '日期格式应为YYYY-MM-DD')
+    try:
+        plan = schedule_work(project_filter, start_date)
+    except ProcessFlowCycleError as e:
+        return _schedule_error(request, f'排程失败：{e}')
+    
+    sections = sorted(plan.sections.values(), key=lambda section: (not section['is_late'], section['start_date']))
+    paginator = Paginator(sections, 20)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    
+    # 各工种的产能与峰值负荷
+    work_type_loads = []
+    for work_type_id, work_type in plan.work_types.items():
+        load = plan.daily_load.get(work_type_id, {})
+        work_type_loads.append({
+            'work_type_name': work_type['work_type_name'],
+            'daily_capacity': work_type['daily_capacity'],
+            'busy_days': len(load),
+            'total_hours': sum(load.values()),
+            'last_date': max(load) if load else None,
+        })
+    
+    # 翻页时保留筛选条件
+    query = request.GET.copy()
+    query.pop('page', None)
+    
+    context = {
+        'page_obj': page_obj,
+        'query_string': query.urlencode(),
+        'plan': plan,
+        'step_count': len(plan.steps),
+        'late_count': len(plan.late_sections),
+        'work_type_loads': work_type_loads,
+        'projects': Project.objects.filter(is_active=True),
+        'project_filter': project_filter,
+        'start_date_filter': plan.start_date,
+    }
+    return render(request, 'drawings/schedule/index.html', context)
+
+
+def work_schedule_json(request):
+    """作业排程JSON接口"""
+    try:
+        project_filter, start_date = _parse_schedule_params(request)
+    except ValueError:
+        return JsonResponse({'error': '日期格式应为YYYY-MM-DD'}, status=400)
+    try:
+        plan = schedule_work(project_filter, start_date)
+    except ProcessFlowCycleError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'start_date': plan.start_date.isoformat(),
+        'sections': [
+            {
+                'id': section['section_id'],
+                'section_number': section['section_number'],
+                'project_name': section['project_name'],
+                'block_number': section['block_number'],
+                'on_block_date': section['on_block_date'].isoformat(),
+                'off_block_date': section['off_block_date'].isoformat(),
+                'start_date': section['start_date'].isoformat(),
+                'end_date': section['end_date'].isoformat(),
+                'is_late': section['is_late'],
+            }
+            for section in plan.sections.values()
+        ],
+        'steps': [
+            {
+                'id': step.step_id,
+                'section_id': step.section_id,
+                'step_name': step.step_name,
+                'step_order': step.step_order,
+                'work_type_id': step.work_type_id,
+                'hours': round(step.hours, 2),
+                'start_date': step.start_date.isoformat(),
+                'end_date': step.end_date.isoformat(),
+                'is_late': step.is_late,
+            }
+            for step in plan.steps
+        ],
+        'work_types': [
+            {
+                'id': work_type_id,
+                'work_type_name': work_type['work_type_name'],
+                'daily_capacity': work_type['daily_capacity'],
+                'daily_load': {
+                    day.isoformat(): round(hours, 2)
+                    for day, hours in plan.daily_load.get(work_type_id, {}).items()
+                },
+            }
+            for work_type_id, work_type in plan.work_types.items()
+        ],
+    })
+
+
+# 分段管理视图
+def filter_sections(request, sections=None):
+    """按请求参数筛选分段（项目多选、在胎区间），列表、导出和报表共用
+
+    返回 (sections, project_filter, start_date_filter, end_date_filter)。
+    """
+    from datetime import datetime
+    if sections is None:
+        sections = Section.objects.all()
     project_filter = request.GET.getlist('project')  # 支持多选
     start_date_filter = request.GET.get('start_date', '')
     end_date_filter = request.GET.get('end_date', '')
     
-    if project_filter:
-        sections = sections.filter(project_id__in=project_filter)
+    project_ids = [project_id for project_id in project_filter if project_id.isdigit()]
+    if project_ids:
+        sections = sections.filter(project_id__in=project_ids)
     
-    if start_date_filter and end_date_filter:
-        # 筛选在此区间内所有在胎的分段（脱胎日期在此区间内）
-        sections = sections.filter(off_block_date__range=[start_date_filter, end_date_filter])
+    # 筛选在此区间内任意一天在胎的分段（包括跨越整个区间的分段）；日期格式不对时忽略日期筛选
+    try:
+        start_date = datetime.strptime(start_date_filter, '%Y-%m-%d').date() if start_date_filter else None
+        end_date = datetime.strptime(end_date_filter, '%Y-%m-%d').date() if end_date_filter else None
+    except ValueError:
+        messages.error(request, '日期格式应为YYYY-MM-DD')
+    else:
+        sections = sections.overlapping(start_date, end_date)
+    return sections, project_filter, start_date_filter, end_date_filter
+
+
+def section_list(request):
+    """分段管理列表"""
+    sections, project_filter, start_date_filter, end_date_filter = filter_sections(
+        request, Section.objects.select_related('project', 'section_type')
+    )
+    
+    # 齐套统计和筛选直接使用分段表上的冗余字段（section_ready_idx）
+    readiness = sections.aggregate(
+        total=models.Count('id'),
+        ready=models.Count('id', filter=models.Q(is_ready=True)),
+    )
+    ready_filter = request.GET.get('ready', '')
+    if ready_filter in ('0', '1'):
+        sections = sections.filter(is_ready=ready_filter == '1')
     
     # 获取所有项目用于筛选
     projects = Project.objects.filter(is_active=True)
@@ -928,6 +1205,8 @@ def section_list(request):
         'project_filter': project_filter,
         'start_date_filter': start_date_filter,
         'end_date_filter': end_date_filter,
+        'ready_filter': ready_filter,
+        'readiness': readiness,
     }
     return render(request, 'drawings/section/list.html', context)
 
@@ -967,6 +1246,10 @@ def section_add(request):
             off_block_date = datetime.strptime(off_block_date_str, '%Y-%m-%d').date() if off_block_date_str else None
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
             
+            # 校验胎架占用
+            if is_active:
+                check_jig_available(block_number, on_block_date, off_block_date)
+            
             # 创建分段
             section = Section.objects.create(
                 section_number=section_number,
@@ -1041,6 +1324,10 @@ def section_edit(request, section_id):
             off_block_date = datetime.strptime(off_block_date_str, '%Y-%m-%d').date() if off_block_date_str else None
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
             
+            # 校验胎架占用（排除分段自身原有的占用）
+            if is_active:
+                check_jig_available(block_number, on_block_date, off_block_date, exclude_id=section.id)
+            
             # 更新分段
             section.section_number = section_number
             section.project = project
@@ -1080,6 +1367,113 @@ def section_edit(request, section_id):
     })
 
 
+def jig_free_slots(request):
+    """查询日期区间内空闲的胎架（JSON）"""
+    from datetime import datetime
+    try:
+        start = datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+        end = datetime.strptime(request.GET.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': '日期格式应为YYYY-MM-DD'}, status=400)
+    if end < start:
+        return JsonResponse({'error': '结束日期不能早于开始日期'}, status=400)
+
+    exclude_id = request.GET.get('exclude')
+    calendar = get_jig_calendar()
+    jigs = calendar.free_jigs(start, end, int(exclude_id) if exclude_id and exclude_id.isdigit() else None)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'total_jigs': len(calendar.timelines),
+        'free_jigs': [
+            {
+                'block_number': jig['block_number'],
+                'free_after': jig['free_after'].isoformat() if jig['free_after'] else None,
+                'free_until': jig['free_until'].isoformat() if jig['free_until'] else None,
+            }
+            for jig in jigs
+        ],
+    })
+
+
+def _utilization_context():
+    matrix = get_utilization()
+    summary = utilization_summary(matrix)
+    # 胎架：0 空闲、1 占用、2 重复占用；项目：按当天在胎分段数相对峰值分 0~4 级
+    for jig in summary['jigs']:
+        jig['cells'] = [(count, min(count, 2)) for count in jig['load']]
+    project_peak = max((project['peak'] for project in summary['projects']), default=0) or 1
+    for project in summary['projects']:
+        project['cells'] = [(count, -(-count * 4 // project_peak)) for count in project['load']]
+    return summary
+
+
+def jig_utilization(request):
+    """胎架/项目负荷热力图（未来90天）"""
+    try:
+        summary = _utilization_context()
+    except ValueError as e:
+        return render(request, 'drawings/section/utilization.html', {'error_message': str(e)})
+    return render(request, 'drawings/section/utilization.html', summary)
+
+
+def jig_utilization_json(request):
+    """胎架/项目负荷矩阵（JSON）"""
+    try:
+        summary = utilization_summary(get_utilization())
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    summary['start_date'] = summary['start_date'].isoformat()
+    summary['dates'] = [day.isoformat() for day in summary['dates']]
+    return JsonResponse(summary)
+
+
+def _timeline_window(request):
+    """解析时间轴的日期窗口，未指定时为默认窗口"""
+    from datetime import datetime
+    default_start, default_end = default_window()
+    start_str = request.GET.get('start', '')
+    end_str = request.GET.get('end', '')
+    try:
+        start = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else default_start
+        end = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start + (default_end - default_start)
+    except ValueError:
+        raise ValueError('日期格式应为YYYY-MM-DD')
+    if end < start:
+        raise ValueError('结束日期不能早于开始日期')
+    return start, end
+
+
+def section_timeline(request):
+    """分段时间轴（按项目或胎架分组，滚动加载）"""
+    try:
+        start, end = _timeline_window(request)
+    except ValueError:
+        start, end = default_window()
+    context = {
+        'start': start,
+        'end': end,
+        'projects': Project.objects.filter(is_active=True),
+        'project_filter': request.GET.getlist('project'),
+        'group_by': 'jig' if request.GET.get('group') == 'jig' else 'project',
+    }
+    return render(request, 'drawings/section/timeline.html', context)
+
+
+def section_timeline_json(request):
+    """分段时间轴数据（JSON，按列组织，键集分页）"""
+    limit = request.GET.get('limit') or str(DEFAULT_LIMIT)
+    project_ids = [project_id for project_id in request.GET.getlist('project') if project_id]
+    if not limit.isdigit() or not all(project_id.isdigit() for project_id in project_ids):
+        return JsonResponse({'error': '参数格式错误'}, status=400)
+    try:
+        start, end = _timeline_window(request)
+        page = section_timeline_page(start, end, project_ids, request.GET.get('after'), int(limit))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(page)
+
+
 def section_delete(request, section_id):
     """删除分段"""
     section = get_object_or_404(Section, id=section_id)
@@ -1098,9 +1492,33 @@ def section_import(request):
             if not excel_file:
                 raise ValueError("请选择要上传的Excel文件")
             
-            # TODO: 实现Excel文件解析和导入逻辑
-            # 这里需要根据具体的Excel格式来实现解析逻辑
-            
+            upsert = request.POST.get('mode') == 'upsert'
+            if request.POST.get('dry_run'):
+                # 仅校验不导入，有错误时生成错误工作簿供下载
+                report = validate_sections(excel_file, excel_file.name, upsert=upsert)
+                return render(request, 'drawings/section/import.html', {
+                    'validation': report,
+                    'validation_errors': report.messages(200),
+                    'report_token': save_error_workbook(report) if report.errors else None,
+                    'report_name': error_workbook_name(excel_file.name),
+                    'upsert': upsert,
+                })
+            
+            if excel_file.size > background_threshold():
+                # 大文件转为后台任务，由 run_import_jobs 处理，页面轮询进度
+                job = create_import_job('section', excel_file, upsert=upsert)
+                return redirect(f"{reverse('drawings:section_import')}?job={job.id}")
+            
+            result = import_sections(excel_file, excel_file.name, upsert=upsert)
+            if result.error_count:
+                # 有错误行时留在导入页面显示错误明细，其余行已导入
+                return render(request, 'drawings/section/import.html', {'result': result, 'upsert': upsert})
+            
+            if upsert:
+                messages.success(request, f'导入成功，新增 {result.created} 个、更新 {result.updated} 个、'
+                                          f'无变化 {result.unchanged} 个分段！')
+            else:
+                messages.success(request, f'导入成功，共导入 {result.created} 个分段！')
             return redirect('drawings:section_list')
             
         except Exception as e:
@@ -1108,7 +1526,24 @@ def section_import(request):
                 'error_message': f'导入失败：{str(e)}'
             })
     
-    return render(request, 'drawings/section/import.html')
+    job_id = request.GET.get('job')
+    job = ImportJob.objects.filter(pk=job_id, kind='section').first() if job_id and job_id.isdigit() else None
+    return render(request, 'drawings/section/import.html', {'job': job})
+
+
+def section_import_report(request, token):
+    """下载导入预校验的错误工作簿"""
+    path = error_workbook_path(token)
+    if path is None:
+        raise Http404('错误明细已过期，请重新校验')
+    name = request.GET.get('name') or error_workbook_name('')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+def import_job_status(request, job_id):
+    """导入任务进度（JSON，供导入页面轮询）"""
+    job = get_object_or_404(ImportJob, id=job_id)
+    return JsonResponse(job_status(job))
 
 
 # 托盘管理视图
@@ -1123,6 +1558,7 @@ def pallet_list(request):
     required_date_end = request.GET.get('required_date_end')
     is_received_filter = request.GET.get('is_received')
     search_code = request.GET.get('search_code', '').strip()
+    part_code = request.GET.get('part_code', '').strip()
     
     # 应用筛选条件
     if project_filter:
@@ -1145,6 +1581,10 @@ def pallet_list(request):
         pallets = pallets.filter(models.Q(pallet_code__icontains=search_code) | 
                                 models.Q(pallet_name__icontains=search_code))
     
+    if part_code:
+        # 按明细条目的零件编码精确匹配（索引查询），不再对明细文本做模糊匹配
+        pallets = pallets.filter(id__in=pallets_containing(part_code))
+    
     # 分页
     paginator = Paginator(pallets, 10)  # 每页显示10项
     page_number = request.GET.get('page')
@@ -1164,6 +1604,7 @@ def pallet_list(request):
         'required_date_end_filter': required_date_end,
         'is_received_filter': is_received_filter,
         'search_code_filter': search_code,
+        'part_code_filter': part_code,
     }
     
     return render(request, 'drawings/pallet/list.html', context)
@@ -1313,9 +1754,22 @@ def pallet_import(request):
             if not excel_file:
                 raise ValueError("请选择要上传的Excel文件")
             
-            # TODO: 实现Excel文件解析和导入逻辑
-            # 这里需要根据具体的Excel格式来实现解析逻辑
+            upsert = request.POST.get('mode') == 'upsert'
+            if excel_file.size > background_threshold():
+                # 大文件转为后台任务，由 run_import_jobs 处理，页面轮询进度
+                job = create_import_job('pallet', excel_file, upsert=upsert)
+                return redirect(f"{reverse('drawings:pallet_import')}?job={job.id}")
+            
+            result = import_pallets(excel_file, excel_file.name, upsert=upsert)
+            if result.error_count:
+                # 有错误行时留在导入页面显示错误明细，其余行已导入
+                return render(request, 'drawings/pallet/import.html', {'result': result, 'upsert': upsert})
             
+            if upsert:
+                messages.success(request, f'导入成功，新增 {result.created} 个、更新 {result.updated} 个、'
+                                          f'无变化 {result.unchanged} 个托盘！')
+            else:
+                messages.success(request, f'导入成功，共导入 {result.created} 个托盘！')
             return redirect('drawings:pallet_list')
             
         except Exception as e:
@@ -1323,14 +1777,176 @@ def pallet_import(request):
                 'error_message': f'导入失败：{str(e)}'
             })
     
-    return render(request, 'drawings/pallet/import.html')
+    job_id = request.GET.get('job')
+    job = ImportJob.objects.filter(pk=job_id, kind='pallet').first() if job_id and job_id.isdigit() else None
+    return render(request, 'drawings/pallet/import.html', {'job': job})
+
+
+def pallet_bulk_receive(request):
+    """批量接收托盘（扫码录入托盘编码）
+
+    表单提交 codes 文本；也接受 JSON 请求 {"codes": ["TP001", ...]}，返回 JSON 结果。
+    """
+    import json
+    is_json = request.content_type == 'application/json'
+    if request.method == 'POST':
+        try:
+            if is_json:
+                try:
+                    data = json.loads(request.body or b'{}')
+                except ValueError:
+                    raise ValueError('请求内容不是有效的JSON')
+                codes = data.get('codes') if isinstance(data, dict) else None
+                if not isinstance(codes, list):
+                    raise ValueError('codes 应为托盘编码列表')
+                codes = [str(code) for code in codes]
+            else:
+                codes = parse_pallet_codes(request.POST.get('codes', ''))
+            result = receive_pallets(codes)
+        except ValueError as e:
+            if is_json:
+                return JsonResponse({'error': str(e)}, status=400)
+            messages.error(request, f'接收失败：{e}')
+            return render(request, 'drawings/pallet/receive.html', {
+                'codes_text': request.POST.get('codes', ''), 'max_codes': MAX_CODES,
+            })
+
+        if is_json:
+            return JsonResponse({
+                'received': result.received,
+                'already_received': result.already_received,
+                'unknown': result.unknown,
+            })
+        if result.received:
+            messages.success(request, f'已接收 {len(result.received)} 个托盘！')
+        return render(request, 'drawings/pallet/receive.html', {
+            'result': result,
+            # 未识别的编码留在输入框中，核对后可重新提交
+            'codes_text': '\n'.join(result.unknown),
+            'max_codes': MAX_CODES,
+        })
+
+    return render(request, 'drawings/pallet/receive.html', {'max_codes': MAX_CODES})
+
+
+def overdue_pallet_report(request):
+    """逾期/临期未接收托盘报表（按项目、分段分组，读取按天缓存的数据）"""
+    days_str = request.GET.get('days', '')
+    days = int(days_str) if days_str.isdigit() else OVERDUE_DEFAULT_DAYS
+    days = min(days, OVERDUE_MAX_DAYS)
+    project_filter = [project_id for project_id in request.GET.getlist('project') if project_id.isdigit()]
+
+    report = overdue_report(get_overdue_pallets(), days, project_filter)
+
+    # 按分段分页
+    paginator = Paginator(report['sections'], 30)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    query = request.GET.copy()
+    query.pop('page', None)
+
+    context = {
+        'report': report,
+        'page_obj': page_obj,
+        'projects': Project.objects.filter(is_active=True),
+        'project_filter': project_filter,
+        'days': days,
+        'max_days': OVERDUE_MAX_DAYS,
+        'query_string': query.urlencode(),
+    }
+    return render(request, 'drawings/pallet/overdue.html', context)
+
+
+def material_requirement_report(request):
+    """物料需求周汇总报表（读取预计算的汇总表），export=csv 时导出CSV"""
+    import csv
+    from datetime import datetime, timedelta
+    project_filter = request.GET.getlist('project')
+    week_from_str = request.GET.get('week_from', '')
+    week_to_str = request.GET.get('week_to', '')
+    part_code = request.GET.get('part_code', '').strip()
+    kind_filter = request.GET.get('kind', '')
+    outstanding_only = request.GET.get('outstanding') == '1'
+
+    # 默认显示本周起的8周，日期统一折算到所在周的周一
+    try:
+        week_from = week_start(datetime.strptime(week_from_str, '%Y-%m-%d').date()) if week_from_str else None
+        week_to = week_start(datetime.strptime(week_to_str, '%Y-%m-%d').date()) if week_to_str else None
+    except ValueError:
+        messages.error(request, '日期格式应为YYYY-MM-DD')
+        week_from = week_to = None
+    if week_from is None:
+        week_from = week_start(datetime.now().date())
+    if week_to is None or week_to < week_from:
+        week_to = week_from + timedelta(weeks=7)
+
+    requirements = MaterialRequirement.objects.select_related('project').filter(
+        week_start__gte=week_from, week_start__lte=week_to)
+    if project_filter:
+        requirements = requirements.filter(project_id__in=project_filter)
+    if part_code:
+        requirements = requirements.filter(part_code=normalize_part_code(part_code))
+    if kind_filter:
+        requirements = requirements.filter(kind=kind_filter)
+    if outstanding_only:
+        requirements = requirements.filter(received_quantity__lt=models.F('required_quantity'))
+
+    if request.GET.get('export') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = content_disposition_header(
+            True, f'物料需求_{week_from:%Y%m%d}-{week_to:%Y%m%d}.csv')
+        response.write('\ufeff')  # BOM，Excel 直接打开时按 UTF-8 识别中文
+        writer = csv.writer(response)
+        writer.writerow(['需求周', '项目', '零件编码', '类别', '需求数量', '已接收数量', '未接收数量', '托盘数'])
+        for requirement in requirements.iterator(chunk_size=2000):
+            writer.writerow([
+                requirement.week_start.isoformat(), requirement.project.project_name, requirement.part_code,
+                requirement.get_kind_display(), requirement.required_quantity, requirement.received_quantity,
+                requirement.outstanding_quantity, requirement.pallet_count,
+            ])
+        return response
+
+    # 每周每个项目的合计
+    weekly = requirements.values('week_start', 'project__project_name').annotate(
+        required=models.Sum('required_quantity'),
+        received=models.Sum('received_quantity'),
+        parts=models.Count('id'),
+    ).order_by('week_start', 'project__project_name')
+    for row in weekly:
+        row['outstanding'] = row['required'] - row['received']
+
+    paginator = Paginator(requirements, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('export', None)
+
+    context = {
+        'page_obj': page_obj,
+        'weekly': weekly,
+        'projects': Project.objects.filter(is_active=True),
+        'kind_choices': PalletItem.KIND_CHOICES,
+        'project_filter': project_filter,
+        'week_from': week_from,
+        'week_to': week_to,
+        'part_code_filter': part_code,
+        'kind_filter': kind_filter,
+        'outstanding_only': outstanding_only,
+        'query_string': query.urlencode(),
+    }
+    return render(request, 'drawings/pallet/material_requirements.html', context)
 
 # 标准工艺流程相关视图
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q
+from decimal import Decimal, InvalidOperation
 from .models import StandardProcessFlow, ProcessFlowStep, ShipType, TypicalSection, WorkProcess
+from .flow_diagram import diagram_digest, diagram_path, ensure_flow_diagram
+from .process_flow import get_compiled_flow, reconcile_flow_hours, sync_flow_steps
+from .simulation import DEFAULT_RUNS, MAX_RUNS, simulate_process_flow, simulate_project
 
 
 def standard_process_flow_list(request):
@@ -1444,32 +2060,44 @@ def standard_process_flow_edit(request, process_flow_id):
             parallel_groups = request.POST.getlist('parallel_group')
             estimated_hours = request.POST.getlist('estimated_hours')
             descriptions = request.POST.getlist('description')
+            prerequisites = request.POST.getlist('prerequisites')
+            hours_mins = request.POST.getlist('hours_min')
+            hours_modes = request.POST.getlist('hours_mode')
+            hours_maxes = request.POST.getlist('hours_max')
+            
+            def optional_decimal(values, index):
+                return Decimal(values[index]) if index < len(values) and values[index] else None
             
-            # 删除现有步骤
-            ProcessFlowStep.objects.filter(process_flow=process_flow).delete()
-            
-            # 创建新步骤
-            for i in range(len(step_ids)):
-                if step_names[i] and work_process_ids[i] and step_orders[i]:
-                    try:
-                        work_process = WorkProcess.objects.get(id=work_process_ids[i])
-                        ProcessFlowStep.objects.create(
-                            process_flow=process_flow,
-                            work_process=work_process,
-                            step_name=step_names[i],
-                            step_order=int(step_orders[i]),
-                            parallel_group=int(parallel_groups[i]) if parallel_groups[i] else 0,
-                            estimated_hours=float(estimated_hours[i]) if estimated_hours[i] else 0,
-                            description=descriptions[i]
-                        )
-                    except (WorkProcess.DoesNotExist, ValueError):
-                        continue
-            
-            messages.success(request, '工艺流程步骤更新成功！')
-            process_flow.save()  # 重新计算总工时
+            try:
+                rows = []
+                for i in range(len(step_ids)):
+                    if step_names[i] and work_process_ids[i] and step_orders[i]:
+                        prerequisite_text = prerequisites[i] if i < len(prerequisites) else ''
+                        rows.append({
+                            'step_id': int(step_ids[i]) if step_ids[i] else None,
+                            'step_name': step_names[i],
+                            'work_process_id': int(work_process_ids[i]),
+                            'step_order': int(step_orders[i]),
+                            'parallel_group': int(parallel_groups[i]) if parallel_groups[i] else 0,
+                            'estimated_hours': Decimal(estimated_hours[i]) if estimated_hours[i] else 0,
+                            'description': descriptions[i],
+                            'hours_min': optional_decimal(hours_mins, i),
+                            'hours_mode': optional_decimal(hours_modes, i),
+                            'hours_max': optional_decimal(hours_maxes, i),
+                            'prerequisite_orders': [
+                                int(order) for order in prerequisite_text.replace('，', ',').split(',') if order.strip()
+                            ],
+                        })
+                
+                # 批量同步步骤并重新计算总工时
+                sync_flow_steps(process_flow, rows)
+                process_flow.refresh_from_db()
+                messages.success(request, '工艺流程步骤更新成功！')
+            except (ValueError, InvalidOperation) as e:
+                messages.error(request, f'工艺流程步骤保存失败：{str(e)}')
     
     # 获取步骤数据
-    steps = ProcessFlowStep.objects.filter(process_flow=process_flow).order_by('step_order', 'parallel_group')
+    steps = ProcessFlowStep.objects.filter(process_flow=process_flow).prefetch_related('prerequisites').order_by('step_order', 'parallel_group')
     
     # 获取可选的作业工序
     work_processes = WorkProcess.objects.filter(is_active=True).select_related('work_type')
@@ -1483,6 +2111,57 @@ def standard_process_flow_edit(request, process_flow_id):
     return render(request, 'drawings/standard_process_flow/edit.html', context)
 
 
+def standard_process_flow_diagram(request, process_flow_id, digest):
+    """标准工艺流程图（SVG）
+
+    URL 带内容摘要，磁盘上已有对应文件时直接返回，不查询数据库；摘要过期时重定向到最新的流程图。
+    """
+    try:
+        diagram = open(diagram_path(process_flow_id, digest), 'rb')
+    except FileNotFoundError:
+        process_flow = get_object_or_404(StandardProcessFlow, id=process_flow_id)
+        compiled = get_compiled_flow(process_flow)
+        current = diagram_digest(compiled)
+        if current != digest:
+            return redirect('drawings:standard_process_flow_diagram', process_flow_id=process_flow_id, digest=current)
+        diagram = open(ensure_flow_diagram(process_flow_id, compiled, digest), 'rb')
+
+    response = FileResponse(diagram, content_type='image/svg+xml')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['ETag'] = f'"{digest}"'
+    return response
+
+
+def _simulation_runs(request):
+    """解析模拟次数参数，限制在 100 ~ MAX_RUNS 之间"""
+    try:
+        runs = int(request.GET.get('runs') or DEFAULT_RUNS)
+    except ValueError:
+        raise ValueError('模拟次数必须为整数')
+    return min(max(runs, 100), MAX_RUNS)
+
+
+def standard_process_flow_simulation(request, process_flow_id):
+    """标准工艺流程工期蒙特卡洛模拟（JSON）"""
+    process_flow = get_object_or_404(StandardProcessFlow, id=process_flow_id)
+    try:
+        result = simulate_process_flow(process_flow, runs=_simulation_runs(request))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    result['process_flow'] = process_flow.name
+    return JsonResponse(result)
+
+
+def project_simulation(request, project_id):
+    """项目分段完工日期蒙特卡洛模拟（JSON）"""
+    project = get_object_or_404(Project, id=project_id)
+    try:
+        result = simulate_project(project, runs=_simulation_runs(request))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(result)
+
+
 def standard_process_flow_delete(request, process_flow_id):
     """删除标准工艺流程"""
     process_flow = get_object_or_404(StandardProcessFlow, id=process_flow_id)
@@ -1502,12 +2181,17 @@ def standard_process_flow_delete(request, process_flow_id):
 
 def standard_process_flow_detail(request, process_flow_id):
     """查看标准工艺流程详情"""
-    process_flow = get_object_or_404(StandardProcessFlow, id=process_flow_id)
-    steps = ProcessFlowStep.objects.filter(process_flow=process_flow).order_by('step_order', 'parallel_group')
+    process_flow = get_object_or_404(
+        StandardProcessFlow.objects.select_related('ship_type', 'typical_section'), id=process_flow_id
+    )
+    # 步骤、层级、并行组和关键路径来自缓存的编译结果
+    compiled = get_compiled_flow(process_flow)
     
     context = {
         'process_flow': process_flow,
-        'steps': steps,
+        'compiled': compiled,
+        'steps': compiled.steps,
+        'diagram_digest': diagram_digest(compiled),
     }
     
     return render(request, 'drawings/standard_process_flow/detail.html', context)
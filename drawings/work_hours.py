@@ -0,0 +1,59 @@
+"""工时批量重算
+
+作业工种标准工时或作业工序系数调整后，按以下顺序以集合式 UPDATE 同步：
+1. 作业工序工时 work_hours = 工种标准工时 × 系数；
+2. 沿用工序工时的工艺流程步骤的预估工时；
+3. 受影响标准工艺流程的预估总工时和关键路径工时。
+"""
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from .models import ProcessFlowStep, WorkProcess, WorkType
+from .process_flow import reconcile_flow_hours
+
+
+def _work_type_hours():
+    return Subquery(WorkType.objects.filter(pk=OuterRef('work_type_id')).values('standard_hours')[:1])
+
+
+def _work_process_hours():
+    return Subquery(WorkProcess.objects.filter(pk=OuterRef('work_process_id')).values('work_hours')[:1])
+
+
+def propagate_work_process_hours(work_process_ids=None):
+    """同步沿用工序工时的步骤，并校正受影响流程的总工时
+
+    work_process_ids 为 None 时处理全部工序。返回 (更新步骤数, 受影响流程数)。
+    """
+    steps = ProcessFlowStep.objects.filter(hours_inherited=True, work_process__work_hours__isnull=False)
+    if work_process_ids is not None:
+        steps = steps.filter(work_process_id__in=work_process_ids)
+
+    with transaction.atomic():
+        flow_ids = set(
+            steps.exclude(estimated_hours=F('work_process__work_hours'))
+            .values_list('process_flow_id', flat=True).distinct()
+        )
+        updated_steps = steps.filter(process_flow_id__in=flow_ids).update(estimated_hours=_work_process_hours())
+        reconcile_flow_hours(flow_ids)
+    return updated_steps, len(flow_ids)
+
+
+def propagate_work_type_hours(work_type_ids=None):
+    """按工种重算作业工序工时，并继续同步步骤和流程总工时
+
+    work_type_ids 为 None 时处理全部工种（用于全量重建）。
+    返回 (更新工序数, 更新步骤数, 受影响流程数)。
+    """
+    processes = WorkProcess.objects.filter(work_type__isnull=False)
+    if work_type_ids is not None:
+        processes = processes.filter(work_type_id__in=work_type_ids)
+
+    with transaction.atomic():
+        work_process_ids = None if work_type_ids is None else list(processes.values_list('id', flat=True))
+        updated_processes = processes.update(work_hours=_work_type_hours() * F('coefficient'))
+        # 未关联工种的工序没有作业工时
+        if work_type_ids is None:
+            WorkProcess.objects.filter(work_type__isnull=True).update(work_hours=None)
+        updated_steps, updated_flows = propagate_work_process_hours(work_process_ids)
+    return updated_processes, updated_steps, updated_flows
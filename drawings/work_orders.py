@@ -0,0 +1,97 @@
+"""分段作业工单生成
+
+按项目批量将标准工艺流程实例化为各分段的作业工单：
+分段类型 + 项目船型 匹配标准工艺流程，工单和工单步骤均以批量插入方式写入。
+"""
+from django.db import transaction
+
+from .models import ProcessFlowStep, Section, SectionWorkOrder, SectionWorkStep, StandardProcessFlow
+
+BULK_BATCH_SIZE = 1000
+
+
+def match_process_flows(ship_type_id, typical_section_ids):
+    """返回 {典型分段ID: 标准工艺流程} ，同一分段类型有多个流程时取名称排序的第一个"""
+    flows = {}
+    for flow in (
+        StandardProcessFlow.objects.filter(
+            ship_type_id=ship_type_id, typical_section_id__in=typical_section_ids, is_active=True
+        ).order_by('name', 'id')
+    ):
+        flows.setdefault(flow.typical_section_id, flow)
+    return flows
+
+
+def generate_work_orders(project, replace=False):
+    """为项目下所有启用的分段生成作业工单
+
+    已有工单的分段默认跳过；replace=True 时删除后重新生成。
+    返回统计信息：created_orders、created_steps、skipped_sections、missing_flow_sections。
+    """
+    sections = list(
+        Section.objects.filter(project=project, is_active=True)
+        .values_list('id', 'section_number', 'section_type_id')
+    )
+    flows = match_process_flows(project.ship_type_id, {section_type_id for _, _, section_type_id in sections})
+
+    steps_by_flow = {}
+    for step in (
+        ProcessFlowStep.objects.filter(process_flow__in=[flow.id for flow in flows.values()], is_active=True)
+        .order_by('step_order', 'parallel_group')
+        .values('id', 'process_flow_id', 'work_process_id', 'step_name', 'step_order', 'parallel_group', 'estimated_hours')
+    ):
+        steps_by_flow.setdefault(step['process_flow_id'], []).append(step)
+
+    result = {
+        'created_orders': 0,
+        'created_steps': 0,
+        'skipped_sections': [],
+        'missing_flow_sections': [],
+    }
+
+    with transaction.atomic():
+        existing = SectionWorkOrder.objects.filter(section__project=project)
+        if replace:
+            existing.delete()
+            existing_section_ids = set()
+        else:
+            existing_section_ids = set(existing.values_list('section_id', flat=True))
+
+        orders = []
+        for section_id, section_number, section_type_id in sections:
+            flow = flows.get(section_type_id)
+            if flow is None:
+                result['missing_flow_sections'].append(section_number)
+            elif section_id in existing_section_ids:
+                result['skipped_sections'].append(section_number)
+            else:
+                orders.append(SectionWorkOrder(
+                    section_id=section_id,
+                    process_flow=flow,
+                    estimated_total_hours=flow.estimated_total_hours,
+                    critical_path_hours=flow.critical_path_hours,
+                ))
+        SectionWorkOrder.objects.bulk_create(orders, batch_size=BULK_BATCH_SIZE)
+
+        # MySQL 的 bulk_create 不回填主键，按分段取回新工单ID
+        order_ids = dict(
+            SectionWorkOrder.objects.filter(section_id__in=[order.section_id for order in orders])
+            .values_list('section_id', 'id')
+        )
+        work_steps = []
+        for order in orders:
+            for step in steps_by_flow.get(order.process_flow_id, []):
+                work_steps.append(SectionWorkStep(
+                    work_order_id=order_ids[order.section_id],
+                    flow_step_id=step['id'],
+                    work_process_id=step['work_process_id'],
+                    step_name=step['step_name'],
+                    step_order=step['step_order'],
+                    parallel_group=step['parallel_group'],
+                    estimated_hours=step['estimated_hours'],
+                ))
+        SectionWorkStep.objects.bulk_create(work_steps, batch_size=BULK_BATCH_SIZE)
+
+    result['created_orders'] = len(orders)
+    result['created_steps'] = len(work_steps)
+    return result
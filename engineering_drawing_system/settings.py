@@ -86,6 +86,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 胎架日历、负荷矩阵、逾期托盘等缓存由 Web 进程和后台导入进程（run_import_jobs）共同读写和失效，
+# 必须使用进程间共享的缓存后端；数据库缓存表由 python manage.py createcachetable 创建
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'drawings_cache',
+        'OPTIONS': {
+            # 胎架日历按胎架分别缓存，条目数随胎架数增长
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -125,6 +142,14 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# 运行时生成的文件（已在 .gitignore 中排除，部署时可改到项目目录之外）
+# 工艺流程图 SVG 缓存
+FLOW_DIAGRAM_CACHE_DIR = BASE_DIR / 'cache' / 'flow_diagrams'
+# 后台导入任务的上传文件和导入校验的错误工作簿
+IMPORT_JOB_DIR = BASE_DIR / 'uploads' / 'imports'
+# 导入中的任务超过该秒数未更新进度，run_import_jobs 启动时视为中断并回收
+IMPORT_JOB_STALE_TIMEOUT = 30 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 